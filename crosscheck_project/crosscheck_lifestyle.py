@@ -6,8 +6,34 @@ import pandas as pd
 import re
 import jaconv
 import os
+import json
+import hashlib
+
+# ==== 飲食店名標準化（パターンは事前コンパイル） ====
+# 空白・カッコ類除去
+_SPACE_BRACKET_RE = re.compile(r'[\s（）()「」『』\[\]【】]')
+# 店舗表現除去（"店", "本店", など）※従来どおり左から順に試す
+_STORE_WORD_RE = re.compile(r'店|店舗|支店|本店|支社|営業所')
+# 記号除去（長音・ダッシュ類・＆・／ など）
+_SYMBOL_RE = re.compile(r'[ー‐―\-–−＆&・／/.]')
+
+# 表記ゆれ対応（略称 → 正式名）：1 回の走査でまとめて置換
+REPLACEMENTS = {
+    "マック": "マクドナルド",
+    "ケンタ": "ケンタッキーフライドチキン",
+    "モス": "モスバーガー",
+    "すき家": "すきや",
+    "吉牛": "吉野家"
+}
+_REPLACE_RE = re.compile('|'.join(re.escape(k) for k in sorted(REPLACEMENTS, key=len, reverse=True)))
+
+# 標準化結果のディスクキャッシュ（処理内容が変わったら作り直す）
+CACHE_PATH = "cache/standardized_store_names.json"
+_VERSION = hashlib.sha1(json.dumps(
+    [_SPACE_BRACKET_RE.pattern, _STORE_WORD_RE.pattern, _SYMBOL_RE.pattern, REPLACEMENTS],
+    ensure_ascii=False).encode('utf-8')).hexdigest()
+
 
-# ==== 飲食店名標準化関数（強化版） ====
 def standardize_store_name(name):
     if not isinstance(name, str):
         return ""
@@ -18,65 +44,86 @@ def standardize_store_name(name):
     name = jaconv.z2h(name, kana=False, digit=True, ascii=True)
     # 小文字化
     name = name.lower()
-    # 空白除去
-    name = re.sub(r'\s+', '', name)
-    # カッコ類除去
-    name = re.sub(r'[（）()「」『』\[\]【】]', '', name)
-    # 店舗表現除去（"店", "本店", など）
-    name = re.sub(r'店|店舗|支店|本店|支社|営業所', '', name)
-    # 記号除去
-    name = re.sub(r'ー|‐|―|-|–|−', '', name)
-    name = re.sub(r'＆|&|・|／|/|\.', '', name)
-
-    # 表記ゆれ対応（略称 → 正式名）
-    replacements = {
-        "マック": "マクドナルド",
-        "ケンタ": "ケンタッキーフライドチキン",
-        "モス": "モスバーガー",
-        "すき家": "すきや",
-        "吉牛": "吉野家"
-    }
-    for short, full in replacements.items():
-        name = name.replace(short, full)
-
-    # 語順を並び替え（空白で分割してソート）
-    words = re.split(r'\s+', name)
-    name = ''.join(sorted(words))
-    return name
-
-# ==== ファイルパス ====
-sales_path = "data/lifestyle_sales_20250430.xlsx"
-approach_path = "data/approach_list_20250527.xlsx"
-
-# ==== データ読み込み ====
-df_sales = pd.read_excel(sales_path, sheet_name="月次【売上】", usecols="I,O")
-df_sales.columns = ["店舗名", "金額"]
-df_sales = df_sales[df_sales["金額"] != 0].copy()
-
-df_approach = pd.read_excel(approach_path, sheet_name="Sheet1", usecols="C,M,N,O,P,Q,R")
-df_approach.columns = ["店舗名", "M", "N", "O", "P", "Q", "R"]
-
-# ==== 名寄せキー作成 ====
-df_sales["キー"] = df_sales["店舗名"].apply(standardize_store_name)
-df_approach["キー"] = df_approach["店舗名"].apply(standardize_store_name)
-
-# ==== 照合 ====
-merged = df_sales.merge(df_approach.drop(columns=["店舗名"]), on="キー", how="left")
-
-# ==== 結果分割 ====
-matched = merged[merged[["M", "N", "O", "P", "Q", "R"]].notna().any(axis=1)]
-unmatched = merged[merged[["M", "N", "O", "P", "Q", "R"]].isna().all(axis=1)]
-
-# ==== 出力ディレクトリ作成 ====
-os.makedirs("results", exist_ok=True)
-
-
-# ==== 結果保存 ====
-matched.to_excel("results/matched_results.xlsx", index=False)
-unmatched.to_excel("results/unmatched_results.xlsx", index=False)
-
-# ==== 完了メッセージ ====
-print("✅ 処理完了しました")
-print(f"一致：{len(matched)} 件")
-print(f"未一致：{len(unmatched)} 件")
-print("→ results フォルダに出力しました。")
+    # 空白・カッコ類除去 → 店舗表現除去 → 記号除去（この順番で）
+    name = _SPACE_BRACKET_RE.sub('', name)
+    name = _STORE_WORD_RE.sub('', name)
+    name = _SYMBOL_RE.sub('', name)
+    # 略称 → 正式名
+    # （空白は除去済みなので、以前の「空白で分割して並べ替え」は何もしないため省略）
+    return _REPLACE_RE.sub(lambda m: REPLACEMENTS[m.group(0)], name)
+
+
+def _load_cache(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get("names", {}) if data.get("version") == _VERSION else {}
+
+
+def _save_cache(path, names):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": _VERSION, "names": names}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def standardize_store_names(s, cache_path=CACHE_PATH):
+    """
+    店舗名の列をまとめて標準化する。異なる店舗名ごとに 1 回だけ処理し、
+    結果は cache_path に保存して次回の実行でも使い回す（None なら保存しない）。
+    """
+    names = _load_cache(cache_path) if cache_path else {}
+    uniq = [v for v in s.dropna().unique() if isinstance(v, str)]
+    missing = [v for v in uniq if v not in names]
+    for v in missing:
+        names[v] = standardize_store_name(v)
+    if cache_path and missing:
+        _save_cache(cache_path, names)
+    # 文字列以外（欠損・数値など）は従来どおり空文字
+    return s.map(lambda v: names[v] if isinstance(v, str) else "")
+
+
+def main():
+    # ==== ファイルパス ====
+    sales_path = "data/lifestyle_sales_20250430.xlsx"
+    approach_path = "data/approach_list_20250527.xlsx"
+
+    # ==== データ読み込み ====
+    df_sales = pd.read_excel(sales_path, sheet_name="月次【売上】", usecols="I,O")
+    df_sales.columns = ["店舗名", "金額"]
+    df_sales = df_sales[df_sales["金額"] != 0].copy()
+
+    df_approach = pd.read_excel(approach_path, sheet_name="Sheet1", usecols="C,M,N,O,P,Q,R")
+    df_approach.columns = ["店舗名", "M", "N", "O", "P", "Q", "R"]
+
+    # ==== 名寄せキー作成 ====
+    df_sales["キー"] = standardize_store_names(df_sales["店舗名"])
+    df_approach["キー"] = standardize_store_names(df_approach["店舗名"])
+
+    # ==== 照合 ====
+    merged = df_sales.merge(df_approach.drop(columns=["店舗名"]), on="キー", how="left")
+
+    # ==== 結果分割 ====
+    matched = merged[merged[["M", "N", "O", "P", "Q", "R"]].notna().any(axis=1)]
+    unmatched = merged[merged[["M", "N", "O", "P", "Q", "R"]].isna().all(axis=1)]
+
+    # ==== 出力ディレクトリ作成 ====
+    os.makedirs("results", exist_ok=True)
+
+
+    # ==== 結果保存 ====
+    matched.to_excel("results/matched_results.xlsx", index=False)
+    unmatched.to_excel("results/unmatched_results.xlsx", index=False)
+
+    # ==== 完了メッセージ ====
+    print("✅ 処理完了しました")
+    print(f"一致：{len(matched)} 件")
+    print(f"未一致：{len(unmatched)} 件")
+    print("→ results フォルダに出力しました。")
+
+
+if __name__ == "__main__":
+    main()
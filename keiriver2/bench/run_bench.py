@@ -0,0 +1,243 @@
+# bench/run_bench.py
+"""
+processor のベンチマーク。
+
+    python keiriver2/bench/run_bench.py                  # 1k, 100k
+    python keiriver2/bench/run_bench.py --scales 1k,100k,1m
+    python keiriver2/bench/run_bench.py --compare bench/results/<前回>.json
+
+合成データは一時フォルダ（HOME を差し替え）に作るため、
+実際の帳簿アップロードフォルダには触れません。
+結果は bench/results/<日時>_<commit>.json に保存します。
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PKG_DIR   = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PKG_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or 'unknown'
+    except Exception:
+        return 'unknown'
+
+
+def _prepare_env(workdir: str) -> None:
+    """config が参照するホーム／カレントを作業用フォルダへ向ける"""
+    home = os.path.join(workdir, 'home')
+    os.makedirs(os.path.join(home, 'Desktop'), exist_ok=True)
+    os.environ['HOME'] = home
+    os.environ['USERPROFILE'] = home
+    os.environ.pop('OPENAI_API_KEY', None)
+    os.chdir(workdir)
+    if PKG_DIR not in sys.path:
+        sys.path.insert(0, PKG_DIR)
+    if BENCH_DIR not in sys.path:
+        sys.path.insert(0, BENCH_DIR)
+
+
+def _timed(fn, repeat: int = 1) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _result(seconds: float, rows: int) -> dict:
+    return {
+        'seconds':     round(seconds, 4),
+        'rows':        rows,
+        'rows_per_s':  round(rows / seconds, 1) if seconds > 0 else None,
+    }
+
+
+def _reset_caches(processor) -> None:
+    from normalization import clear_caches
+    clear_caches()
+    processor.init_mapping_store()
+
+
+def bench_scale(label: str, n_rows: int, workdir: str, args) -> dict:
+    import pandas as pd
+    import processor
+    import synth
+
+    results: dict[str, dict] = {}
+    scale_dir = os.path.join(workdir, f"data_{label}")
+    os.makedirs(scale_dir, exist_ok=True)
+
+    # LLM はスタブ（固定遅延で正式名称っぽい値を返す）
+    def fake_llm(prompt: str, *a, **kw) -> str:
+        if args.llm_latency:
+            time.sleep(args.llm_latency)
+        m = processor.re.search(r'候補: (\[.+\])', prompt)
+        if not m:
+            return ""
+        names = [f"{c}（正式）" for c in json.loads(m.group(1))]
+        return names[0] if len(names) == 1 else json.dumps(names, ensure_ascii=False)
+    processor.call_chatgpt_api = fake_llm
+    processor.init_mapping_store(os.path.join(workdir, f"mapping_store_{label}.csv"))
+
+    # ── 合成データ ──
+    t0 = time.perf_counter()
+    xlsx_path = os.path.join(scale_dir, synth.ledger_filename('営業部', '株式会社Forneeds', 2025, 1))
+    df_raw = synth.generate_ledger(n_rows, 2025, 1, seed=args.seed)
+    synth.write_ledger(xlsx_path, df_raw, sheets=args.sheets)
+    print(f"[BENCH] {label}: 合成データ {n_rows} 行 ({time.perf_counter() - t0:.1f}s)")
+
+    # ── read_with_dynamic_header ──
+    holder = {}
+    def do_read():
+        holder['df'] = processor.read_with_dynamic_header(xlsx_path)
+    results['read_with_dynamic_header'] = _result(_timed(do_read, args.repeat), n_rows)
+    results['read_with_dynamic_header']['bytes'] = os.path.getsize(xlsx_path)
+
+    # ── extract_items（handle_new_file と同じ前処理をしてから計測） ──
+    df = holder['df']
+    df.columns = [processor.normalize_header(c) for c in df.columns]
+    df = processor.normalize_columns(df)
+    meta = {'部署': '営業部', '元請け': '株式会社Forneeds', '年月': '2025-01', 'filepath': xlsx_path}
+    def do_extract():
+        _reset_caches(processor)
+        holder['recs'] = processor.extract_items(df, meta)
+    results['extract_items'] = _result(_timed(do_extract, args.repeat), n_rows)
+
+    # ── normalize_field（LLM スタブ、辞書は毎回空から） ──
+    rng = random.Random(args.seed)
+    stores = [synth.store_name(rng) for _ in range(n_rows)]
+    def do_normalize():
+        if os.path.exists(processor.MAPPING_STORE_PATH):
+            os.remove(processor.MAPPING_STORE_PATH)
+        _reset_caches(processor)
+        processor.normalize_fields(stores, '店舗名')
+    results['normalize_field'] = _result(_timed(do_normalize, args.repeat), n_rows)
+    results['normalize_field']['distinct'] = len(set(stores))
+
+    # ── 出力（CSV + XLSX） ──
+    df_final = pd.DataFrame(holder['recs'])
+    out_dir = os.path.join(scale_dir, 'out')
+    def do_write():
+        # 前回と同じ内容だと書き直さないので、毎回消してから計測（xlsx の完了まで含める）
+        shutil.rmtree(out_dir, ignore_errors=True)
+        processor.write_records(df_final, out_dir, f"bench_{label}_records")
+        processor.flush_outputs()
+    results['write_records'] = _result(_timed(do_write, args.repeat), len(df_final))
+
+    # ── handle_new_file（監視フォルダ一式を再生成） ──
+    from config import WATCH_DIR, ensure_dirs
+    ensure_dirs()
+    def do_full():
+        for name in os.listdir(WATCH_DIR):
+            p = os.path.join(WATCH_DIR, name)
+            if os.path.isdir(p):
+                shutil.rmtree(p)
+            else:
+                os.remove(p)
+        paths = synth.generate_tree(WATCH_DIR, n_rows, files=args.files,
+                                    sheets=args.sheets, seed=args.seed)
+        _reset_caches(processor)
+        t0 = time.perf_counter()
+        processor.handle_new_file(paths[0])
+        processor.flush_outputs()
+        holder['full'] = time.perf_counter() - t0
+    best = float('inf')
+    for _ in range(args.repeat):
+        do_full()
+        best = min(best, holder['full'])
+    results['handle_new_file'] = _result(best, n_rows)
+    return results
+
+
+def compare(current: dict, baseline_path: str) -> None:
+    with open(baseline_path, encoding='utf-8') as f:
+        base = json.load(f)
+    print(f"\n比較: {base.get('commit')} → {current.get('commit')}")
+    for label, benches in current['scales'].items():
+        for name, r in benches.items():
+            old = base.get('scales', {}).get(label, {}).get(name)
+            if not old or not old.get('seconds'):
+                continue
+            ratio = r['seconds'] / old['seconds']
+            print(f"  {label:>5} {name:<26} {old['seconds']:>9.3f}s → {r['seconds']:>9.3f}s  ×{ratio:.2f}")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description='keiriver2 processor ベンチマーク')
+    ap.add_argument('--scales', default='1k,100k', help=f"カンマ区切り: {','.join(SCALES)}")
+    ap.add_argument('--repeat', type=int, default=1, help='各計測の繰り返し回数（最良値を採用）')
+    ap.add_argument('--files', type=int, default=4, help='handle_new_file 用のファイル数')
+    ap.add_argument('--sheets', type=int, default=2, help='xlsx のシート数')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--llm-latency', type=float, default=0.0, help='LLM スタブの擬似遅延（秒）')
+    ap.add_argument('--out', default=RESULTS_DIR, help='結果 JSON の保存先')
+    ap.add_argument('--compare', help='比較対象の結果 JSON')
+    ap.add_argument('--keep', action='store_true', help='作業用フォルダを残す')
+    args = ap.parse_args(argv)
+
+    labels = [s.strip().lower() for s in args.scales.split(',') if s.strip()]
+    unknown = [l for l in labels if l not in SCALES]
+    if unknown:
+        ap.error(f"不明な規模: {unknown}")
+
+    out_dir = os.path.abspath(args.out)
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    commit = _git_commit()
+    workdir = tempfile.mkdtemp(prefix='keiri_bench_')
+    cwd = os.getcwd()
+    _prepare_env(workdir)
+
+    import pandas as pd
+    report = {
+        'commit':    commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python':    platform.python_version(),
+        'pandas':    pd.__version__,
+        'platform':  platform.platform(),
+        'args':      {k: v for k, v in vars(args).items() if k not in ('out', 'compare')},
+        'scales':    {},
+    }
+    try:
+        for label in labels:
+            report['scales'][label] = bench_scale(label, SCALES[label], workdir, args)
+            for name, r in report['scales'][label].items():
+                print(f"  {label:>5} {name:<26} {r['seconds']:>9.3f}s  {r['rows_per_s'] or 0:>12,.0f} rows/s")
+    finally:
+        os.chdir(cwd)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"[BENCH] 作業用フォルダ: {workdir}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(out_dir, f"{stamp}_{commit}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[BENCH] 結果: {path}")
+
+    if compare_path:
+        compare(report, compare_path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
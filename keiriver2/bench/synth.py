@@ -0,0 +1,112 @@
+# bench/synth.py
+# ベンチマーク用の合成帳簿データ生成（部署_元請け_YYYY年M月 形式のファイル群）
+
+import os
+import random
+import pandas as pd
+
+DEPARTMENTS = ['営業部', '総務部', 'ライフスタイル事業部', '物流部']
+CLIENTS     = ['株式会社Forneeds', 'GOG株式会社', '株式会社EPG', '有限会社サンプル']
+
+# 見出しのゆれ（エイリアス・全角空白・改行・装飾）
+HEADER_VARIANTS = {
+    '日付':   ['日付', '納品日', '作業日', '売上日', '出荷 日'],
+    '店舗':   ['店舗名', '納品先', '送り先', 'お届け先', 'ご依頼主'],
+    '品名':   ['商品名', '作業内容', '品名', 'サービス項目', '作業\n項目'],
+    '数量':   ['数量', '個数', '数　量'],
+    '単価':   ['単価', '単価（税込）', '値段'],
+    '金額':   ['金額', 'ご請求金額', '作業金額', '売上', '送料'],
+}
+
+STORE_BASES = ['湘南パンケーキ', '江戸蕎麦にのの', '河童ラーメン本舗', 'カフェ・ド・ソレイユ',
+               'マクドナルド', 'すき家', '吉野家', 'モスバーガー', '木下病院', 'ドラッグストアＡ']
+BRANCHES    = ['所沢', '香芝', '渋谷', '新宿', '梅田', '天神', '札幌', '仙台', '横浜', '大宮']
+ITEMS       = ['ロール紙', 'プリンター設置', 'OAタップ', 'ケーブル交換', '端末設定',
+               '保守対応', 'レクチャー', '運賃', '納品書発行', 'サポート']
+
+_Z_DIGITS = str.maketrans('0123456789', '０１２３４５６７８９')
+
+
+def _zenkaku(s: str, rng: random.Random, p: float = 0.3) -> str:
+    return s.translate(_Z_DIGITS) if rng.random() < p else s
+
+
+def store_name(rng: random.Random) -> str:
+    """同一店舗の表記ゆれ（全角/半角・空白・店 の有無）を含む店舗名"""
+    base = rng.choice(STORE_BASES)
+    branch = rng.choice(BRANCHES)
+    sep = rng.choice(['', ' ', '　'])
+    suffix = rng.choice(['店', '店', '', '支店'])
+    return f"{base}{sep}{branch}{suffix}"
+
+
+def date_value(rng: random.Random, year: int, month: int):
+    day = rng.randint(1, 28)
+    style = rng.random()
+    if style < 0.4:
+        return _zenkaku(f"{month}月{day}日", rng)
+    if style < 0.6:
+        return f"{month}/{day}"
+    if style < 0.7:
+        return f"{month}月{day}"
+    if style < 0.98:
+        return f"{year}/{month}/{day}"
+    return 'x'  # 一部は解析不能な値
+
+
+def generate_ledger(n_rows: int, year: int, month: int, seed: int = 0) -> pd.DataFrame:
+    """1 ファイル分の明細（見出しはファイルごとにランダムなゆれ）"""
+    rng = random.Random(seed)
+    headers = {k: rng.choice(v) for k, v in HEADER_VARIANTS.items()}
+    rows = []
+    for _ in range(n_rows):
+        qty = rng.randint(1, 20)
+        unit = rng.choice([100, 250, 980, 1500, 3200])
+        amount = qty * unit
+        rows.append({
+            headers['日付']: date_value(rng, year, month),
+            headers['店舗']: store_name(rng),
+            headers['品名']: rng.choice(ITEMS),
+            headers['数量']: _zenkaku(str(qty), rng),
+            headers['単価']: _zenkaku(f"{unit:,}", rng),
+            headers['金額']: amount if rng.random() < 0.7 else _zenkaku(f"¥{amount:,}", rng),
+        })
+    return pd.DataFrame(rows)
+
+
+def ledger_filename(dept: str, client: str, year: int, month: int, ext: str = '.xlsx') -> str:
+    return f"{dept}_{client}_{year}年{month}月{ext}"
+
+
+def write_ledger(path: str, df: pd.DataFrame, sheets: int = 1) -> None:
+    """xlsx は sheets 枚に分割して書き出し、csv はそのまま書き出す"""
+    if path.lower().endswith('.csv'):
+        df.to_csv(path, index=False, encoding='utf-8-sig')
+        return
+    chunk = max(1, -(-len(df) // sheets))
+    with pd.ExcelWriter(path, engine='xlsxwriter') as w:
+        for i in range(sheets):
+            part = df.iloc[i * chunk:(i + 1) * chunk]
+            if part.empty and i:
+                break
+            part.to_excel(w, index=False, sheet_name=f"Sheet{i + 1}")
+
+
+def generate_tree(root: str, total_rows: int, year: int = 2025, month: int = 1,
+                  files: int = 4, sheets: int = 2, csv_ratio: float = 0.25,
+                  seed: int = 0) -> list[str]:
+    """root 直下に total_rows 行を files 個へ振り分けた帳簿ファイルを作る"""
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    per_file = max(1, total_rows // files)
+    paths = []
+    for i in range(files):
+        dept = DEPARTMENTS[i % len(DEPARTMENTS)]
+        client = CLIENTS[(i // len(DEPARTMENTS)) % len(CLIENTS)]
+        if i >= len(DEPARTMENTS) * len(CLIENTS):
+            client = f"{client}{i}"
+        ext = '.csv' if rng.random() < csv_ratio else '.xlsx'
+        path = os.path.join(root, ledger_filename(dept, client, year, month, ext))
+        write_ledger(path, generate_ledger(per_file, year, month, seed=seed + i), sheets=sheets)
+        paths.append(path)
+    return paths
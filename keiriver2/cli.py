@@ -0,0 +1,278 @@
+# cli.py
+"""
+タスクトレイ（pystray / tkinter / keyring）を使わないヘッドレス実行用の入口。
+
+    python cli.py watch                                   # 監視（Ctrl+C / SIGTERM で停止）
+    python cli.py regen --month 2025-03                   # 1 か月分を再生成
+    python cli.py backfill --from 2024-04 --to 2025-03 --jobs 4
+    python cli.py status
+    python cli.py cube --by 部署,元請け --month 2025-03  # 集計キューブの問い合わせ
+
+API キーは環境変数 OPENAI_API_KEY を優先し、無ければ keyring を試します。
+"""
+
+import os
+import re
+import sys
+import time
+import signal
+import argparse
+from datetime import datetime
+
+from config import WATCH_DIR, OUTPUT_DIR, STATE_DB_PATH, SCHEDULER_WORKERS, ensure_dirs
+
+
+def _ensure_api_key() -> None:
+    """OPENAI_API_KEY が無ければ keyring から読み、子プロセスにも引き継ぐ"""
+    from get_api_key import init_api
+    if not init_api():
+        print("[WARN] APIキー未設定のため名寄せは辞書と候補のみで行います")
+
+
+def _parse_month(s: str) -> str:
+    m = re.fullmatch(r'(\d{4})-(\d{1,2})', s.strip())
+    if not m or not 1 <= int(m.group(2)) <= 12:
+        raise argparse.ArgumentTypeError(f"年月は YYYY-MM で指定してください: {s}")
+    return f"{m.group(1)}-{int(m.group(2)):02d}"
+
+
+def month_range(start: str, end: str) -> list[str]:
+    """'2024-04'〜'2025-03' のような両端を含む年月の一覧"""
+    y, m = map(int, start.split('-'))
+    ey, em = map(int, end.split('-'))
+    months = []
+    while (y, m) <= (ey, em):
+        months.append(f"{y}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return months
+
+
+# ─── watch ───
+def cmd_watch(args) -> int:
+    _ensure_api_key()
+    from watch_folder import run_batch_watcher, stop_batch_watcher
+
+    def _stop(signum, frame):
+        print(f"[停止] シグナル {signum} を受信、実行中のジョブ完了後に終了します")
+        stop_batch_watcher()
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    run_batch_watcher()
+    return 0
+
+
+# ─── regen / backfill ───
+def _regen_one(ym: str) -> tuple[str, float, str | None]:
+    """
+    1 か月分を再生成して (年月, 秒, エラー) を返す（backfill のワーカーからも呼ばれる）。
+    読み込めなかったファイルがあれば、その月は一部だけの反映なのでエラーとして返します
+    """
+    from processor import regenerate_month, flush_outputs
+    t0 = time.perf_counter()
+    try:
+        failed = regenerate_month(ym) or {}
+        # ワーカープロセスは atexit を通らないので、xlsx の書き出しをここで待つ
+        flush_outputs()
+    except Exception as e:
+        return ym, time.perf_counter() - t0, str(e)
+    if failed:
+        return ym, time.perf_counter() - t0, _describe_failed(failed)
+    return ym, time.perf_counter() - t0, None
+
+
+def _describe_failed(failed: dict) -> str:
+    """読み込めなかったファイルの一覧（一時的なものは閉じてから再実行するよう案内）"""
+    from retry import is_transient
+    lines = [f"{len(failed)} ファイルを読み込めず、出力はそれらを除いた一部のみです"]
+    for path, exc in sorted(failed.items()):
+        hint = '（一時的なエラー：ファイルを閉じてから再実行してください）' if is_transient(exc) else ''
+        lines.append(f"  {path}: {exc}{hint}")
+    return '\n'.join(lines)
+
+
+def _init_worker(year_locks: dict, file_locks: dict) -> None:
+    """
+    backfill のワーカープロセス初期化：年次出力と共有ファイル（名寄せ辞書・出力の索引・
+    計測履歴）のロックを親と共有し、年次集計は親に任せる
+    """
+    from processor import share_year_locks, share_file_locks, defer_rollups
+    share_year_locks(year_locks)
+    share_file_locks(file_locks)
+    defer_rollups()
+
+
+def cmd_regen(args) -> int:
+    ensure_dirs()
+    _ensure_api_key()
+    ym, seconds, error = _regen_one(args.month)
+    if error:
+        print(f"[ERROR] 年月={ym}: {error}")
+        return 1
+    print(f"[REGEN] 年月={ym} 完了 ({seconds:.1f}s)")
+    return 0
+
+
+def cmd_backfill(args) -> int:
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    months = month_range(args.start, args.end)
+    if not months:
+        print(f"[ERROR] 期間が空です: {args.start} 〜 {args.end}")
+        return 2
+    ensure_dirs()
+    _ensure_api_key()
+
+    # 同じ年の月を別プロセスで並べても、年次ファイルの書き込みは 1 本ずつ
+    year_locks = {ym[:4]: multiprocessing.Lock() for ym in months}
+    # 名寄せ辞書の追記・出力の索引・計測履歴もプロセスをまたいで 1 本ずつ
+    file_locks = {name: multiprocessing.Lock() for name in ('mapping', 'outputs', 'history')}
+    from processor import share_file_locks
+    share_file_locks(file_locks)
+    jobs = max(1, min(args.jobs, len(months)))
+    print(f"[BACKFILL] {months[0]} 〜 {months[-1]}（{len(months)} か月）を {jobs} 並列で再生成")
+
+    t0 = time.perf_counter()
+    failed: list[str] = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(year_locks, file_locks)) as pool:
+        futures = {pool.submit(_regen_one, ym): ym for ym in months}
+        for done, fut in enumerate(as_completed(futures), 1):
+            try:
+                ym, seconds, error = fut.result()
+            except Exception as e:
+                ym, seconds, error = futures[fut], 0.0, str(e)
+            if error:
+                failed.append(ym)
+                print(f"[BACKFILL] {done}/{len(months)} {ym} 失敗: {error}")
+            else:
+                print(f"[BACKFILL] {done}/{len(months)} {ym} 完了 ({seconds:.1f}s)")
+
+    # 年次はワーカーごとに書き直さず、年ごとに 1 回だけ集計
+    from processor import rollup_year, flush_outputs
+    for year in sorted(year_locks):
+        rollup_year(year)
+    flush_outputs()
+
+    elapsed = time.perf_counter() - t0
+    print(f"[BACKFILL] 完了 {len(months) - len(failed)}/{len(months)} か月 ({elapsed:.1f}s)")
+    if failed:
+        print(f"[BACKFILL] 失敗した年月: {', '.join(sorted(failed))}")
+        return 1
+    return 0
+
+
+# ─── status ───
+def cmd_status(args) -> int:
+    import metrics
+    from watch_folder import is_valid_file, is_excluded_dir
+
+    print(f"監視フォルダ: {WATCH_DIR}")
+    print(f"出力フォルダ: {OUTPUT_DIR}")
+
+    # 処理済み状態（SQLite）
+    rows: dict[str, dict] = {}
+    in_flight: list[dict] = []
+    if os.path.exists(STATE_DB_PATH):
+        from state import WatcherState
+        state = WatcherState(STATE_DB_PATH)
+        try:
+            rows = state.load()
+            in_flight = state.in_flight()
+        finally:
+            state.close()
+    outcomes: dict[str, int] = {}
+    for r in rows.values():
+        outcomes[r['outcome']] = outcomes.get(r['outcome'], 0) + 1
+    summary = '、'.join(f"{k}={v}" for k, v in sorted(outcomes.items())) or 'なし'
+    print(f"処理済みファイル: {len(rows)} 件（{summary}）")
+    if rows:
+        last = max(r['updated_at'] for r in rows.values())
+        print(f"最終処理: {datetime.fromtimestamp(last).isoformat(timespec='seconds')}")
+    errors = sorted((r for r in rows.values() if r['outcome'] != 'success'),
+                    key=lambda r: r['updated_at'], reverse=True)
+    for r in errors[:args.limit]:
+        print(f"  [エラー] {r['path']}")
+    print(f"処理中（未確定）: {len(in_flight)} 件")
+    for r in in_flight[:args.limit]:
+        print(f"  [{r['phase']}] {r['path']}")
+
+    # 監視フォルダに残っている未処理ファイル
+    waiting = []
+    for root, dirs, files in os.walk(WATCH_DIR):
+        dirs[:] = [d for d in dirs if not is_excluded_dir(os.path.join(root, d))]
+        waiting.extend(os.path.join(root, fn) for fn in files if is_valid_file(fn))
+    print(f"未処理ファイル: {len(waiting)} 件")
+    for path in waiting[:args.limit]:
+        print(f"  {path}")
+
+    # 直近の再生成（計測レポートの履歴）
+    runs = [h for h in metrics.load_history(OUTPUT_DIR) if h.get('kind') == 'regen']
+    print(f"直近の再生成: {len(runs)} 件中 最新 {min(len(runs), args.limit)} 件")
+    for h in runs[-args.limit:][::-1]:
+        ym = h.get('meta', {}).get('年月', '?')
+        print(f"  {h.get('started_at')}  年月={ym}  {h.get('wall_s', 0):.2f}s")
+    return 0
+
+
+# ─── cube ───
+def cmd_cube(args) -> int:
+    from cube import CubeStore
+    store = CubeStore(OUTPUT_DIR)
+    where = {}
+    if args.month:
+        where['年月'] = args.month
+    if args.dept:
+        where['部署'] = args.dept
+    if args.contractor:
+        where['元請け'] = args.contractor
+    by = [d.strip() for d in args.by.split(',') if d.strip()]
+    t0 = time.perf_counter()
+    try:
+        result = store.query(by=by, where=where, years=[args.year] if args.year else None)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 2
+    print(result.to_string(index=False))
+    print(f"[CUBE] {len(result)} 行 ({(time.perf_counter() - t0) * 1000:.0f}ms)")
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog='cli.py', description='keiriver2 ヘッドレス実行')
+    sub = ap.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('watch', help='監視フォルダを監視して処理')
+
+    p = sub.add_parser('regen', help='指定年月を再生成')
+    p.add_argument('--month', required=True, type=_parse_month, help='YYYY-MM')
+
+    p = sub.add_parser('backfill', help='期間内の全年月を並列で再生成')
+    p.add_argument('--from', dest='start', required=True, type=_parse_month, help='開始 YYYY-MM')
+    p.add_argument('--to', dest='end', required=True, type=_parse_month, help='終了 YYYY-MM（含む）')
+    p.add_argument('--jobs', type=int, default=SCHEDULER_WORKERS, help='並列プロセス数')
+
+    p = sub.add_parser('status', help='処理状況を表示')
+    p.add_argument('--limit', type=int, default=10, help='一覧の表示件数')
+
+    p = sub.add_parser('cube', help='年月×部署×元請け×店舗名×分類 の集計を表示')
+    p.add_argument('--by', default='部署', help='カンマ区切りの軸（年月,部署,元請け,店舗名,分類）')
+    p.add_argument('--year', help='対象年（省略時は全年）')
+    p.add_argument('--month', type=_parse_month, help='年月で絞り込み')
+    p.add_argument('--dept', help='部署で絞り込み')
+    p.add_argument('--contractor', help='元請けで絞り込み')
+
+    args = ap.parse_args(argv)
+    handlers = {
+        'watch':    cmd_watch,
+        'regen':    cmd_regen,
+        'backfill': cmd_backfill,
+        'status':   cmd_status,
+        'cube':     cmd_cube,
+    }
+    return handlers[args.command](args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
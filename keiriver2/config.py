@@ -1,25 +1,21 @@
 import os
+import hashlib
 from pathlib import Path
 
 # ── 1) 生ファイル投入フォルダ
 WATCH_DIR = str(Path.home() / "Desktop" / "帳簿アップロード")
-os.makedirs(WATCH_DIR, exist_ok=True)
 
 # ── 2) 出力結果フォルダ
 OUTPUT_DIR = os.path.join(WATCH_DIR, "output")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # ── 3) アーカイブ用フォルダ（成功時）
 PROCESSED_DIR = os.path.join(WATCH_DIR, "processed")
-os.makedirs(PROCESSED_DIR, exist_ok=True)
 
 # ── 3b) アーカイブ用フォルダ内のエラー時出力先
 ERROR_DIR = os.path.join(PROCESSED_DIR, "errors")
-os.makedirs(ERROR_DIR, exist_ok=True)
 
 # ── 4) 一時ファイル用
 TEMP_ROOT = os.path.join(os.path.dirname(__file__), 'temp')
-os.makedirs(TEMP_ROOT, exist_ok=True)
 
 # ── 5) 未マッチログ
 UNMATCHED_LOG = os.path.join(os.path.dirname(__file__), 'unmatched_final.csv')
@@ -49,13 +45,47 @@ OPENAI_API_KEY = None
 #    デフォルト間隔。settings.py から読み書きするベース値として使います
 DEFAULT_INTERVAL = 10
 
-# 起動時に settings.json があれば上書きされます
+# 起動時に settings.json があれば上書きされます（監視中も変更を自動で再読み込み）
 CHECK_INTERVAL   = DEFAULT_INTERVAL
+#    ファイル到着中・ジョブ待ちの間の間隔（秒）
+MIN_CHECK_INTERVAL = 1
+#    無変化が続いたときに伸ばす間隔の上限（秒）
+DEFAULT_MAX_INTERVAL = 120
+MAX_CHECK_INTERVAL   = DEFAULT_MAX_INTERVAL
 VALID_EXTENSIONS = ('.xlsx', '.xls', '.csv')
 
+#    監視方式：'auto'（watchdog があればイベント駆動）/ 'events' / 'polling'
+WATCH_BACKEND        = 'auto'
+#    イベント監視時の取りこぼし対策として全体を再スキャンする間隔（秒）
+RECONCILE_INTERVAL   = 300
+#    連続するイベントをまとめて扱うための待ち時間（秒）
+EVENT_SETTLE_SECONDS = 0.2
+#    書き込み完了判定：(サイズ, 更新時刻) が何回続けて同じなら安定とみなすか
+STABLE_OBSERVATIONS  = 2
+#    最終更新からこの秒数が経っていれば、2 回続けて同じ値で安定とみなす（STABLE_OBSERVATIONS より優先）
+STABLE_QUIET_SECONDS = 2.0
+#    安定待ちファイルを再観測する間隔（秒）
+STABLE_TICK          = 0.5
+#    年月ジョブ：異なる年月を並列に再生成するワーカー数
+SCHEDULER_WORKERS    = 2
+#    年月ジョブ：最後のファイル受付からこの秒数待ってまとめて再生成
+SCHEDULER_DEBOUNCE   = 2.0
+#    ポーリング時：mtime の変わらないフォルダは一覧を省略し、この回数に 1 回だけ全件を取り直す
+POLL_FULL_RESCAN_EVERY = 30
+#    一時的な読み込み失敗（ロック中・ネットワーク断・コピー途中の xlsx）の再試行
+#    RETRY_BASE_SECONDS × 2^(n-1) 秒後（上限 RETRY_MAX_SECONDS）に、最大 RETRY_MAX_ATTEMPTS 回
+RETRY_BASE_SECONDS   = 5.0
+RETRY_MAX_SECONDS    = 300.0
+RETRY_MAX_ATTEMPTS   = 6
+#    年次集計：月次の再生成が途切れてからこの秒数待って、変わった部署をまとめて集計
+ROLLUP_COOLDOWN      = 5.0
+
 # ── 10) 設定ファイルパス（ユーザーごとに隠しファイルとして保存）
 CONFIG_PATH = os.path.expanduser("~/.keiri_config.json")
 
+# ウォッチャーの処理済み状態（SQLite。ネットワークドライブを避けてアプリ側に置く）
+STATE_DB_PATH = os.path.join(os.path.dirname(__file__), 'watcher_state.sqlite3')
+
 # 辞書ファイルのパス（店舗名などの名寄せ用）
 MAPPING_STORE_PATH = '/path/to/mapping_store.csv'
 
@@ -65,5 +95,18 @@ UNMATCHED_LOG = os.path.join('log', 'unmatched.csv')
 # ウォッチャー稼働ログ（タスクトレイの「ログを見る」で開く）
 WATCH_LOG = os.path.join('log', 'watch_folder.log')
 
-# 確実に log フォルダが存在するようにアプリ起動時に呼んでください
-os.makedirs(os.path.dirname(UNMATCHED_LOG), exist_ok=True)
\ No newline at end of file
+# ── 10b) 中間キャッシュ（パーティション・抽出結果・集計キューブ）
+#    pickle を含むので、共有されうる出力フォルダではなくユーザー専用のフォルダに置く
+CACHE_DIR = os.path.join(os.environ.get('LOCALAPPDATA') or os.path.join(str(Path.home()), '.cache'), 'keiri')
+
+def cache_dir(output_dir: str) -> str:
+    """出力フォルダごとのキャッシュ置き場（フォルダは使う側で作成）"""
+    key = hashlib.sha1(os.path.abspath(output_dir).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, key)
+
+# ── 11) フォルダ作成
+#    import 時には何も作りません。監視・再生成の開始時に ensure_dirs() を呼んでください
+def ensure_dirs() -> None:
+    for d in (WATCH_DIR, OUTPUT_DIR, PROCESSED_DIR, ERROR_DIR, TEMP_ROOT,
+              os.path.dirname(UNMATCHED_LOG)):
+        os.makedirs(d, exist_ok=True)
@@ -0,0 +1,148 @@
+# cube.py
+
+import os
+import glob
+import threading
+import importlib.util
+
+import pandas as pd
+
+from config import cache_dir
+
+# 集計の軸と値
+DIMENSIONS = ['年月', '部署', '元請け', '店舗名', '分類']
+MEASURES   = ['金額_合計', '金額_件数', '数量_合計', '数量_件数']
+
+# pyarrow があれば parquet（列指向・圧縮）、無ければ pickle で保存
+CUBE_EXT = '.parquet' if importlib.util.find_spec('pyarrow') else '.pkl'
+
+
+def build_cube(df: pd.DataFrame, ym: str | None = None) -> pd.DataFrame:
+    """
+    レコード（extract_items の出力）を 年月×部署×元請け×店舗名×分類 で集計。
+    年月列が無いレコードは ym を、分類列が無ければ空文字を軸に使います。
+    """
+    d = pd.DataFrame(index=df.index)
+    for dim in DIMENSIONS:
+        if dim in df.columns:
+            d[dim] = df[dim].fillna('').astype(str)
+        elif dim == '年月' and ym is not None:
+            d[dim] = ym
+        else:
+            d[dim] = ''
+    d['金額'] = pd.to_numeric(df['金額'], errors='coerce') if '金額' in df.columns else float('nan')
+    d['数量'] = pd.to_numeric(df['数量'], errors='coerce') if '数量' in df.columns else float('nan')
+    cube = d.groupby(DIMENSIONS, sort=True).agg(
+        金額_合計=('金額', 'sum'), 金額_件数=('金額', 'count'),
+        数量_合計=('数量', 'sum'), 数量_件数=('数量', 'count'),
+    ).reset_index()
+    return _compact(cube)
+
+
+def _compact(cube: pd.DataFrame) -> pd.DataFrame:
+    for dim in DIMENSIONS:
+        cube[dim] = cube[dim].astype('category')
+    for m in ('金額_件数', '数量_件数'):
+        cube[m] = cube[m].astype('int64')
+    return cube
+
+
+def save_cube(cube: pd.DataFrame, path_base: str) -> str:
+    """path_base + CUBE_EXT に保存して、そのパスを返す"""
+    path = path_base + CUBE_EXT
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if CUBE_EXT == '.parquet':
+        cube.to_parquet(tmp, index=False)
+    else:
+        cube.to_pickle(tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def load_cube(path: str) -> pd.DataFrame:
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+def combine(cubes: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    パーティション単位のキューブを連結。
+    年月・部署が軸に入っているので、異なるパーティション同士は重ならず再集計は不要です。
+    """
+    if not cubes:
+        return _compact(pd.DataFrame({**{d: [] for d in DIMENSIONS}, **{m: [] for m in MEASURES}}))
+    cube = pd.concat([c.astype({d: str for d in DIMENSIONS}) for c in cubes], ignore_index=True)
+    return _compact(cube.sort_values(DIMENSIONS, ignore_index=True))
+
+
+# ─── 問い合わせ ───
+class CubeStore:
+    """
+    年次集計が書き出したキューブ（config.cache_dir(OUTPUT_DIR) の cube_<年>.*）への問い合わせ。
+    読み込んだキューブはファイルの mtime が変わるまでメモリに保持します。
+
+        store = CubeStore(OUTPUT_DIR)
+        store.query(by=['部署', '元請け'], where={'年月': '2025-03'})
+    """
+
+    def __init__(self, output_dir: str):
+        self.root = cache_dir(output_dir)
+        self._cache: dict[str, tuple[int, pd.DataFrame]] = {}
+        self._lock = threading.Lock()
+
+    def years(self) -> list[str]:
+        names = (os.path.basename(p) for p in glob.glob(os.path.join(self.root, 'cube_*.*')))
+        return sorted({n[len('cube_'):].split('.')[0] for n in names
+                       if n.endswith(('.parquet', '.pkl'))})
+
+    def _load_year(self, year: str) -> pd.DataFrame | None:
+        for ext in (CUBE_EXT, '.parquet', '.pkl'):
+            path = os.path.join(self.root, f"cube_{year}{ext}")
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            with self._lock:
+                hit = self._cache.get(path)
+                if hit and hit[0] == mtime:
+                    return hit[1]
+            cube = load_cube(path)
+            with self._lock:
+                self._cache[path] = (mtime, cube)
+            return cube
+        return None
+
+    def load(self, years: list[str] | None = None) -> pd.DataFrame:
+        cubes = [c for y in (years or self.years()) if (c := self._load_year(y)) is not None]
+        if len(cubes) == 1:
+            return cubes[0]
+        return combine(cubes)
+
+    def query(self, by: list[str] | tuple = ('部署',), where: dict | None = None,
+              years: list[str] | None = None) -> pd.DataFrame:
+        """
+        by の軸で 金額・数量の合計／件数を返す。
+        where は {軸: 値 or 値のリスト}（年月から年を絞れるときは読み込む年も絞ります）
+        """
+        by = list(by)
+        unknown = [d for d in by + list(where or {}) if d not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"unknown dimension: {unknown}")
+        where = dict(where or {})
+        if years is None and '年月' in where:
+            yms = where['年月'] if isinstance(where['年月'], (list, tuple, set)) else [where['年月']]
+            years = sorted({str(ym)[:4] for ym in yms})
+
+        cube = self.load(years)
+        mask = pd.Series(True, index=cube.index)
+        for dim, value in where.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= cube[dim].isin([str(v) for v in values])
+        sub = cube[mask]
+        if not by:
+            return sub[MEASURES].sum().to_frame().T
+        return (sub.groupby(by, observed=True, sort=True)[MEASURES].sum()
+                   .reset_index()
+                   .astype({d: str for d in by}))
@@ -1,20 +1,55 @@
-import keyring
-import openai
+import os
+import sys
+import threading
 
 SERVICE = "keiri_system"
 ENTRY   = "openai_api_key"
 
+# 一度見つけたキーはプロセス内で使い回す（keyring / openai は必要になるまで読み込まない）
+_api_key: str | None = None
+_api_key_lock = threading.Lock()
+
+
+def init_api(key: str | None = None) -> str | None:
+    """
+    API 設定の明示的な初期化フック。UI は出しません。
+    key を渡せばそれを、無ければ 環境変数 OPENAI_API_KEY → keyring の順に探して設定し、
+    子プロセス（backfill のワーカーなど）にも環境変数で引き継ぎます。見つからなければ None。
+    """
+    global _api_key
+    with _api_key_lock:
+        if key is None:
+            key = os.getenv("OPENAI_API_KEY") or _from_keyring()
+        _api_key = key or None
+        if _api_key:
+            os.environ["OPENAI_API_KEY"] = _api_key
+        else:
+            os.environ.pop("OPENAI_API_KEY", None)
+        # openai を読み込み済みのときだけ反映（まだなら call_chatgpt_api が使うときに設定する）
+        openai = sys.modules.get("openai")
+        if openai is not None:
+            openai.api_key = _api_key
+        return _api_key
+
+
+def _from_keyring() -> str | None:
+    try:
+        import keyring
+        return keyring.get_password(SERVICE, ENTRY)
+    except Exception as e:
+        print(f"[WARN] keyring からAPIキーを読めません: {e}")
+        return None
+
+
 def get_openai_api_key() -> str:
     """
-    keyring からシークレットを取得して
-    openai.api_key にセットし、返却する。
+    API キーを返す（初回だけ探して以後はキャッシュ）。
     未登録ならエラーを投げる。
     """
-    key = keyring.get_password(SERVICE, ENTRY)
+    key = _api_key or init_api()
     if not key:
         raise RuntimeError(
             "APIキーが登録されていません。\n"
             "まず「python register_key.py」を実行して登録してください。"
         )
-    openai.api_key = key
-    return key
\ No newline at end of file
+    return key
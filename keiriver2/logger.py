@@ -1,46 +1,218 @@
 # logger.py
 
 import os
+import re
 import csv
+import queue
+import atexit
 import logging
+import threading
 import sys
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from config import UNMATCHED_LOG, WATCH_LOG
 
-# ── CSV ログのヘッダー準備 ──
-os.makedirs(os.path.dirname(UNMATCHED_LOG), exist_ok=True)
-if not os.path.exists(UNMATCHED_LOG):
-    with open(UNMATCHED_LOG, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['カテゴリ', '値', 'エラー内容'])
+# ── ローテーション／バッファ設定 ──
+LOG_MAX_BYTES     = 5 * 1024 * 1024   # 1 ファイルあたりの上限
+LOG_BACKUP_COUNT  = 5                 # 世代数（.1 〜 .5）
+CSV_FLUSH_ROWS    = 500               # バッファ内の異なる行数がこれを超えたら書き出し
+
+CSV_HEADER = ['カテゴリ', '値', 'エラー内容', '件数']
+
+# 畳み込みのときは値の行番号（「…#行12: …」）を無視する
+_ROW_RE = re.compile(r'#行\d+')
+
+
+def _rotate(path: str, backup_count: int = LOG_BACKUP_COUNT) -> None:
+    """path → path.1 → … → path.N と世代をずらす（最古は削除）"""
+    for i in range(backup_count - 1, 0, -1):
+        src, dst = f"{path}.{i}", f"{path}.{i + 1}"
+        if os.path.exists(src):
+            os.replace(src, dst)
+    if os.path.exists(path):
+        os.replace(path, f"{path}.1")
+
+
+def _prepare_csv(path: str) -> None:
+    """ヘッダーが無い／旧形式なら新しいヘッダーで作り直す（旧ファイルは世代送り）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            header = next(csv.reader(f), None)
+        if header == CSV_HEADER:
+            return
+        _rotate(path)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerow(CSV_HEADER)
+
+
+class UnmatchedCsvHandler(logging.Handler):
+    """
+    log_unmatched のレコードをバッファし、まとめて CSV に追記するハンドラ。
+    同じ (カテゴリ, 値) は行番号を除いて比べて 1 行に畳み込み、件数を数えます
+    （1 件だけなら値は元のまま）。書き出しは行数が max_rows に達したときと flush() のときだけ。
+    flush() は 1 回の処理（再生成）の区切りで flush_logs() から呼ばれるので、
+    同じ処理の中で繰り返し出たエラーは 1 行にまとまります。
+    書き出し時にテキストログ（forward_to）へも warning を 1 行ずつ流します。
+    """
+
+    def __init__(self, path: str, forward_to: list[logging.Handler],
+                 max_rows: int = CSV_FLUSH_ROWS,
+                 max_bytes: int = LOG_MAX_BYTES):
+        super().__init__()
+        self.path = path
+        self.forward_to = forward_to
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self._buffer: OrderedDict[tuple[str, str], list] = OrderedDict()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        key = (record.category, _ROW_RE.sub('', record.value))
+        entry = self._buffer.get(key)
+        if entry is None:
+            self._buffer[key] = [record.note, 1, record]
+        else:
+            entry[1] += 1
+        if len(self._buffer) >= self.max_rows:
+            self._write()
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            self._write()
+        finally:
+            self.release()
+
+    def _write(self) -> None:
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, OrderedDict()
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                _rotate(self.path)
+            if not os.path.exists(self.path):
+                _prepare_csv(self.path)
+            with open(self.path, 'a', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                for (category, value), (note, count, record) in rows.items():
+                    writer.writerow([category, record.value if count == 1 else value, note, count])
+        except Exception:
+            self.handleError(next(iter(rows.values()))[2])
+
+        for (category, value), (note, count, record) in rows.items():
+            msg = f"{category} | {record.value if count == 1 else value} | {note}"
+            if count > 1:
+                msg += f" (×{count})"
+            fwd = logging.makeLogRecord({**record.__dict__, 'msg': msg, 'args': None})
+            for h in self.forward_to:
+                if fwd.levelno >= h.level:
+                    h.handle(fwd)
+
+
+class _Listener(QueueListener):
+    """キュー内の区切り（flush_logs の印）まで処理したら、ハンドラを flush して知らせる"""
+
+    def handle(self, record: logging.LogRecord) -> None:
+        done = getattr(record, 'flush_done', None)
+        if done is None:
+            super().handle(record)
+            return
+        try:
+            for h in self.handlers:
+                h.flush()
+        finally:
+            done.set()
+
+
+class _OnlyUnmatched(logging.Filter):
+    def __init__(self, wanted: bool):
+        super().__init__()
+        self.wanted = wanted
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return hasattr(record, 'category') == self.wanted
+
+
+# ─── 初期化（初回のログ出力時に 1 回だけ） ───
+# import しただけではファイルもスレッドも作らない
+fh: RotatingFileHandler | None = None
+ch: logging.StreamHandler | None = None
+csvh: UnmatchedCsvHandler | None = None
+_listener: QueueListener | None = None
+_log_queue: queue.SimpleQueue | None = None
+_init_lock = threading.Lock()
 
-# ── テキスト稼働ログの設定 ──
-os.makedirs(os.path.dirname(WATCH_LOG), exist_ok=True)
 logger = logging.getLogger("keiri")
-logger.setLevel(logging.INFO)
 
-# ファイル出力ハンドラ
-fh = logging.FileHandler(WATCH_LOG, encoding='utf-8')
-fh.setFormatter(logging.Formatter('[%(asctime)s][%(levelname)s] %(message)s'))
-logger.addHandler(fh)
 
-# コンソールハンドラ（開発時のデバッグ用）
-ch = logging.StreamHandler(sys.stdout)
-ch.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
-logger.addHandler(ch)
+def init_logging() -> logging.Logger:
+    """CSV／テキストログのハンドラとバックグラウンドのリスナーを起動（2 回目以降は何もしない）"""
+    global fh, ch, csvh, _listener, _log_queue
+    if _listener is not None:
+        return logger
+    with _init_lock:
+        if _listener is not None:
+            return logger
+
+        # ── CSV ログのヘッダー準備 ──
+        _prepare_csv(UNMATCHED_LOG)
+
+        # ── テキスト稼働ログの設定 ──
+        os.makedirs(os.path.dirname(WATCH_LOG), exist_ok=True)
+
+        # ファイル出力ハンドラ（サイズでローテーション）
+        fh = RotatingFileHandler(WATCH_LOG, maxBytes=LOG_MAX_BYTES,
+                                 backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+        fh.setFormatter(logging.Formatter('[%(asctime)s][%(levelname)s] %(message)s'))
+
+        # コンソールハンドラ（開発時のデバッグ用）
+        ch = logging.StreamHandler(sys.stdout)
+        ch.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+
+        # 未マッチ CSV ハンドラ（バッファ＋畳み込み）
+        csvh = UnmatchedCsvHandler(UNMATCHED_LOG, forward_to=[fh, ch])
+
+        fh.addFilter(_OnlyUnmatched(False))
+        ch.addFilter(_OnlyUnmatched(False))
+        csvh.addFilter(_OnlyUnmatched(True))
+
+        # 呼び出し側はキューに積むだけ。書き込みはバックグラウンドのリスナーが担当
+        # CSV は flush_logs()（処理の区切り）か行数の上限でまとめて書き出す
+        _log_queue = queue.SimpleQueue()
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(QueueHandler(_log_queue))
+        atexit.register(_shutdown)
+
+        _listener = _Listener(_log_queue, fh, ch, csvh, respect_handler_level=True)
+        _listener.start()
+    return logger
+
 
 def log_unmatched(category: str, value: str, note: str = ""):
     """
     エラー／未整形情報は CSV へ、
-    稼働ログはテキストファイルへ同時に出力します。
+    稼働ログはテキストファイルへ出力します（キュー経由・非同期）。
     """
-    # 1) CSV 追記
-    with open(UNMATCHED_LOG, 'a', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow([category, value, note])
-
-    # 2) テキストログ warning レベルで残す
-    logger.warning(f"{category} | {value} | {note}")
+    init_logging().warning("%s | %s | %s", category, value, note,
+                           extra={'category': category, 'value': value, 'note': note})
 
 # 例：ウォッチャー開始・停止などの稼働イベントも記録可能
 def log_info(message: str):
-    logger.info(message)
+    init_logging().info(message)
+
+def flush_logs(timeout: float | None = 30.0) -> bool:
+    """
+    キュー内のログを書き出し切る（1 回の処理の区切りで呼ぶ）。
+    キューに印を積み、リスナーがそこまで処理して flush したら戻ります
+    """
+    if _listener is None:
+        return True
+    done = threading.Event()
+    _log_queue.put_nowait(logging.makeLogRecord({'flush_done': done}))
+    return done.wait(timeout)
+
+def _shutdown():
+    _listener.stop()
+    csvh.flush()
+    fh.flush()
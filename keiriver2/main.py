@@ -1,7 +1,4 @@
 from get_api_key import get_openai_api_key
-from tray import show_tray_icon
-from watch_folder import run_batch_watcher
-from tray import show_tray_icon
 def main():
     try:
          get_openai_api_key()
@@ -10,7 +7,8 @@ def main():
          return
 
     # 問題なければタスクトレイ＋監視を起動
-    
+    # （pystray / PIL は重いので、ここで初めて読み込む）
+    from tray import show_tray_icon
     show_tray_icon()
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+# matcher.py
+
+from collections import deque
+from typing import Callable, Iterable
+
+
+class KeywordMatcher:
+    """
+    役割名 → キーワード一覧 の辞書から一度だけ構築する複数パターン照合器。
+    Aho-Corasick オートマトンで、文字列 1 回の走査で
+    部分一致した全ての役割を返します。
+    """
+
+    # 照合結果メモの上限（見出し・品名の種類数を想定）
+    MEMO_LIMIT = 65536
+
+    def __init__(self,
+                 table: dict[str, Iterable[str]],
+                 normalizer: Callable[[str], str] | None = None):
+        self.normalizer = normalizer
+        self.role_order = list(table.keys())
+        self._rank = {role: i for i, role in enumerate(self.role_order)}
+
+        # ノード: goto 遷移 / fail リンク / 出力（役割の集合）
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[frozenset[str]] = [frozenset()]
+
+        outputs: list[set[str]] = [set()]
+        for role, keywords in table.items():
+            for kw in keywords:
+                if normalizer is not None:
+                    kw = normalizer(kw)
+                if not kw:
+                    continue
+                node = 0
+                for ch in kw:
+                    nxt = self._goto[node].get(ch)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[node][ch] = nxt
+                        self._goto.append({})
+                        self._fail.append(0)
+                        outputs.append(set())
+                    node = nxt
+                outputs[node].add(role)
+
+        # BFS で fail リンクを張り、出力を伝播
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                outputs[nxt] |= outputs[self._fail[nxt]]
+                queue.append(nxt)
+        self._out = [frozenset(o) for o in outputs]
+        self._memo: dict[str, tuple[str, ...]] = {}
+
+    def _scan(self, text: str) -> tuple[str, ...]:
+        found: set[str] = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found |= out[node]
+        return tuple(sorted(found, key=self._rank.__getitem__))
+
+    def roles(self, text) -> tuple[str, ...]:
+        """text に部分一致した役割を、辞書の定義順で返す"""
+        if not isinstance(text, str):
+            text = str(text)
+        if self.normalizer is not None:
+            text = self.normalizer(text)
+        hit = self._memo.get(text)
+        if hit is None:
+            if len(self._memo) >= self.MEMO_LIMIT:
+                self._memo.clear()
+            hit = self._memo[text] = self._scan(text)
+        return hit
+
+    def matches(self, text, role: str | None = None) -> bool:
+        """いずれか（role 指定時はその役割）に一致するか"""
+        found = self.roles(text)
+        return bool(found) if role is None else role in found
+
+    def last_role(self, text) -> str | None:
+        """一致した役割のうち定義順で最後のもの（後勝ちの置換規則用）"""
+        found = self.roles(text)
+        return found[-1] if found else None
+
+    def roles_series(self, s):
+        """Series 版：ユニーク値だけ照合して map で戻す"""
+        uniq = s.dropna().unique()
+        lookup = {v: self.roles(v) for v in uniq}
+        return s.map(lookup).apply(lambda r: r if isinstance(r, tuple) else ())
+
+    def matches_series(self, s, role: str | None = None):
+        """Series 版の matches（bool Series を返す）"""
+        uniq = s.dropna().unique()
+        lookup = {v: self.matches(v, role) for v in uniq}
+        return s.map(lookup).fillna(False).astype(bool)
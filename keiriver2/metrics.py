@@ -0,0 +1,298 @@
+# metrics.py
+
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from statistics import median
+
+# 履歴（history.jsonl）と _reports/*.json に残す実行数
+HISTORY_LIMIT = 500
+# 直近履歴の中央値に対してこの倍率を超えたステージを遅延として警告
+REGRESSION_FACTOR = 1.5
+REGRESSION_MIN_SECONDS = 0.5
+
+_COUNT_FIELDS = ('rows_in', 'rows_out', 'bytes_read', 'bytes_written')
+
+# history.jsonl の読み書きの排他（backfill では share_history_lock でプロセス間のロックに差し替え）
+_history_lock = threading.Lock()
+
+
+def share_history_lock(lock) -> None:
+    global _history_lock
+    _history_lock = lock
+
+
+def _empty_stage() -> dict:
+    return {'calls': 0, 'wall_s': 0.0, **{k: 0 for k in _COUNT_FIELDS}}
+
+
+class RunReport:
+    """1 回の再生成（run）のステージ別・ファイル別計測結果"""
+
+    def __init__(self, kind: str, **meta):
+        self.kind = kind
+        self.meta = meta
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self.wall_s = 0.0
+        self.stages: dict[str, dict] = {}
+        self.files: dict[str, dict[str, dict]] = {}
+        self.counters: dict[str, float] = {}
+        self.extra: dict = {}
+        # まだ終わっていないバックグラウンド処理（xlsx の書き出しなど）の数。
+        # run の終了時に残っていれば、最後の 1 つが終わったところでレポートを書き直す
+        self.pending = 0
+        self._out_dir: str | None = None
+        self._path: str | None = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def add_stage(self, name: str, wall_s: float, file: str | None = None, **counts) -> None:
+        with self._lock:
+            targets = [self.stages.setdefault(name, _empty_stage())]
+            if file is not None:
+                per_file = self.files.setdefault(file, {})
+                targets.append(per_file.setdefault(name, _empty_stage()))
+            for st in targets:
+                st['calls'] += 1
+                st['wall_s'] += wall_s
+                for k, v in counts.items():
+                    st[k] = st.get(k, 0) + (v or 0)
+
+    def count(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self) -> None:
+        self.wall_s = time.perf_counter() - self._t0
+
+    def to_dict(self) -> dict:
+        def rounded(st: dict) -> dict:
+            return {k: round(v, 4) if isinstance(v, float) else v for k, v in st.items()}
+        return {
+            'kind':       self.kind,
+            'meta':       self.meta,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'wall_s':     round(self.wall_s, 4),
+            'stages':     {k: rounded(v) for k, v in self.stages.items()},
+            'files':      {f: {k: rounded(v) for k, v in st.items()} for f, st in self.files.items()},
+            'counters':   {k: round(v, 4) if isinstance(v, float) else v for k, v in self.counters.items()},
+            **self.extra,
+        }
+
+    def hold(self):
+        """バックグラウンド処理を 1 つ登録し、終わったら呼ぶ release() を返す"""
+        with self._lock:
+            self.pending += 1
+        released = threading.Event()
+
+        def release():
+            if released.is_set():
+                return
+            released.set()
+            with self._lock:
+                self.pending -= 1
+                ready = self._closed and self.pending == 0 and self._out_dir is not None
+            if ready:
+                try:
+                    self.save(self._out_dir)
+                except Exception as e:
+                    print(f"[WARN] 計測レポート保存失敗: {e}")
+        return release
+
+    def close(self, out_dir: str | None) -> str | None:
+        """
+        run の終了。レポートをすぐ保存し、バックグラウンド処理が残っていれば
+        履歴への追記はそれが全部終わってからにします（その時点でレポートも書き直す）
+        """
+        self.finish()
+        with self._lock:
+            self._closed = True
+            self._out_dir = out_dir
+            waiting = self.pending
+        if not out_dir:
+            return None
+        return self.save(out_dir, history=not waiting)
+
+    def save(self, out_dir: str, history: bool = True) -> str:
+        """
+        out_dir/_reports/<kind>_<ラベル>_<日時>.json に保存し、
+        history.jsonl に 1 行追記します（どちらも直近 HISTORY_LIMIT 件を保持）。
+        2 回目以降は同じファイルを書き直します。
+        """
+        with self._save_lock:
+            return self._save(out_dir, history)
+
+    def _save(self, out_dir: str, history: bool) -> str:
+        report_dir = os.path.join(out_dir, '_reports')
+        os.makedirs(report_dir, exist_ok=True)
+        with self._lock:
+            data = self.to_dict()
+            if self.pending:
+                data['pending_writes'] = self.pending
+        if self._path is None:
+            label = '_'.join(str(v) for v in self.meta.values())
+            stamp = self.started_at.strftime('%Y%m%d_%H%M%S')
+            name = f"{self.kind}_{label}_{stamp}.json" if label else f"{self.kind}_{stamp}.json"
+            self._path = os.path.join(report_dir, name)
+        path = self._path
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        if not history:
+            return path
+
+        history_path = os.path.join(report_dir, 'history.jsonl')
+        summary = {k: data[k] for k in ('kind', 'meta', 'started_at', 'wall_s', 'counters')}
+        summary['stages'] = {k: v['wall_s'] for k, v in data['stages'].items()}
+        # 並列ジョブ（スレッド／backfill のプロセス）が同時に書いても壊れないよう
+        # スレッド間はロック、プロセス間は一時ファイル名を分けて置き換える
+        with _history_lock:
+            history = load_history(out_dir)
+            for msg in detect_regressions(data, history):
+                print(f"[WARN] 処理時間の悪化: {msg}")
+            lines = [json.dumps(h, ensure_ascii=False) for h in history[-(HISTORY_LIMIT - 1):]]
+            lines.append(json.dumps(summary, ensure_ascii=False))
+            tmp = f"{history_path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            os.replace(tmp, history_path)
+            _prune_reports(report_dir)
+        return path
+
+
+def _prune_reports(report_dir: str, keep: int = HISTORY_LIMIT) -> None:
+    """_reports/*.json を新しい順に keep 件だけ残す"""
+    reports = []
+    for e in os.scandir(report_dir):
+        if e.name.endswith('.json') and e.is_file():
+            try:
+                reports.append((e.stat().st_mtime_ns, e.path))
+            except OSError:
+                continue
+    reports.sort(reverse=True)
+    for _, path in reports[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def load_history(out_dir: str) -> list[dict]:
+    path = os.path.join(out_dir, '_reports', 'history.jsonl')
+    if not os.path.exists(path):
+        return []
+    history = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    history.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return history
+
+
+def detect_regressions(report: dict, history: list[dict], window: int = 20) -> list[str]:
+    """同じ kind の直近 window 件の中央値と比べて遅くなったステージを列挙"""
+    past = [h for h in history if h.get('kind') == report['kind']][-window:]
+    if len(past) < 3:
+        return []
+    found = []
+    checks = {'(全体)': report['wall_s'],
+              **{k: v['wall_s'] for k, v in report['stages'].items()}}
+    for name, wall in checks.items():
+        samples = [h['wall_s'] if name == '(全体)' else h.get('stages', {}).get(name)
+                   for h in past]
+        samples = [s for s in samples if s is not None]
+        if len(samples) < 3:
+            continue
+        base = median(samples)
+        if wall >= REGRESSION_MIN_SECONDS and wall > base * REGRESSION_FACTOR:
+            found.append(f"{name}: {wall:.2f}s（中央値 {base:.2f}s）")
+    return found
+
+
+# ─── 実行中レポートの受け渡し ───
+_current: contextvars.ContextVar[RunReport | None] = contextvars.ContextVar('keiri_run', default=None)
+
+
+def current() -> RunReport | None:
+    return _current.get()
+
+
+@contextmanager
+def run(kind: str, out_dir: str | None = None, **meta):
+    """
+    with metrics.run('regen', OUTPUT_DIR, 年月=ym) as rep: ...
+    ブロック内の stage()/count() を集計し、終了時に out_dir へ保存します。
+    """
+    rep = RunReport(kind, **meta)
+    token = _current.set(rep)
+    try:
+        yield rep
+    finally:
+        _current.reset(token)
+        # バックグラウンドの書き出しは待たない（終わった時点でレポートへ追記される）
+        try:
+            path = rep.close(out_dir)
+            if path:
+                print(f"[METRICS] {rep.kind} {rep.wall_s:.2f}s → {path}")
+        except Exception as e:
+            print(f"[WARN] 計測レポート保存失敗: {e}")
+
+
+class _StageTimer:
+    __slots__ = ('file',) + _COUNT_FIELDS
+
+    def __init__(self, file):
+        self.file = file
+        for k in _COUNT_FIELDS:
+            setattr(self, k, 0)
+
+
+@contextmanager
+def stage(name: str, file: str | None = None):
+    """
+    with metrics.stage('read', file=path) as st:
+        st.rows_out = len(df)
+    実行中レポートが無ければ計測だけして捨てます。
+    """
+    st = _StageTimer(file)
+    t0 = time.perf_counter()
+    try:
+        yield st
+    finally:
+        rep = _current.get()
+        if rep is not None:
+            rep.add_stage(name, time.perf_counter() - t0, file,
+                          **{k: getattr(st, k) for k in _COUNT_FIELDS})
+
+
+def hold():
+    """
+    実行中レポートにバックグラウンド処理を登録し、終わったら呼ぶ release() を返す
+    （レポートが無ければ何もしない関数）。処理の中の stage() は同じレポートに載ります
+    """
+    rep = _current.get()
+    if rep is None:
+        return lambda: None
+    return rep.hold()
+
+
+def add_stage(name: str, wall_s: float, file: str | None = None, **counts) -> None:
+    """ループ内で積算した時間をまとめて記録する用"""
+    rep = _current.get()
+    if rep is not None:
+        rep.add_stage(name, wall_s, file, **counts)
+
+
+def count(name: str, n: float = 1) -> None:
+    rep = _current.get()
+    if rep is not None:
+        rep.count(name, n)
@@ -0,0 +1,103 @@
+# normalization.py
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# ─── 事前コンパイル済みパターン ───
+_WS_RE       = re.compile(r'\s+')
+_DASH_TABLE  = str.maketrans({'‐': '-', '–': '-', '—': '-', '―': '-'})
+_COL_TABLE   = str.maketrans({'　': ' ', '（': '(', '）': ')'})
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+_HONORIFICS  = ('様', 'さん', '殿', '先生', '御中')
+
+# メモ化の上限（名寄せ対象の種類数を十分に上回る値）
+CACHE_SIZE = 65536
+
+
+def _nfkc(s: str) -> str:
+    # ASCII のみなら NFKC は恒等変換なのでスキップ
+    return s if s.isascii() else unicodedata.normalize('NFKC', s)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _clean_text(s: str, unify_dashes: bool) -> str:
+    s = _nfkc(s)
+    if unify_dashes:
+        s = s.translate(_DASH_TABLE)
+    return _WS_RE.sub(' ', s).strip()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize_header(h: str) -> str:
+    return _WS_RE.sub('', _nfkc(h)).lower()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize_column_key(col: str) -> str:
+    s = col.lower().translate(_COL_TABLE)
+    s = _NON_WORD_RE.sub('', s).replace(' ', '')
+    for honorific in _HONORIFICS:
+        s = s.replace(honorific, '')
+    return s
+
+
+# ─── 単一値 ───
+def clean_text(s, unify_dashes: bool = False) -> str:
+    """
+    NFKC 正規化＋連続空白（改行含む）を 1 スペースに＋前後空白除去。
+    unify_dashes=True ならダッシュ類を '-' に統一します。
+    文字列以外は '' を返します。
+    """
+    if not isinstance(s, str):
+        return ''
+    return _clean_text(s, unify_dashes)
+
+
+def normalize_header(h) -> str:
+    """NFKC 正規化＋空白・改行の除去＋小文字化（見出し照合用）"""
+    if not isinstance(h, str):
+        return ''
+    return _normalize_header(h)
+
+
+def normalize_column_key(col: str) -> str:
+    """列名の照合キー：小文字化・記号/空白除去・敬称除去"""
+    return _normalize_column_key(col)
+
+
+# ─── Series（ユニーク値だけ正規化して map で戻す） ───
+def map_unique(s, func):
+    uniq = s.dropna().unique()
+    return s.map({v: func(v) for v in uniq})
+
+
+def clean_text_series(s, unify_dashes: bool = False):
+    return map_unique(s, lambda v: clean_text(v, unify_dashes)).fillna('')
+
+
+def normalize_header_series(s):
+    return map_unique(s, normalize_header).fillna('')
+
+
+# ─── 統計 ───
+def cache_stats() -> dict[str, dict]:
+    """各メモのヒット数・ミス数・ヒット率を返す"""
+    stats = {}
+    for name, fn in (('clean_text', _clean_text),
+                     ('normalize_header', _normalize_header),
+                     ('normalize_column_key', _normalize_column_key)):
+        info = fn.cache_info()
+        total = info.hits + info.misses
+        stats[name] = {
+            'hits':     info.hits,
+            'misses':   info.misses,
+            'size':     info.currsize,
+            'hit_rate': round(info.hits / total, 4) if total else 0.0,
+        }
+    return stats
+
+
+def clear_caches() -> None:
+    for fn in (_clean_text, _normalize_header, _normalize_column_key):
+        fn.cache_clear()
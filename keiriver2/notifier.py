@@ -0,0 +1,74 @@
+# notifier.py
+
+import time
+import threading
+from typing import Callable
+
+
+class ChangeNotifier:
+    """
+    プロセス内の変更通知チャネル（ファイルのポーリングを使わない）。
+
+    publish(key, changes) で変更を積むと、同じ key への通知が cooldown 秒
+    途切れたところで handler(key, まとめた changes) を 1 回だけ呼びます。
+    handler 実行中に届いた通知は、終了後の次の呼び出しにまとめます。
+    """
+
+    def __init__(self, handler: Callable[[str, set], None], cooldown: float = 5.0,
+                 name: str = 'keiri-notifier'):
+        self.handler = handler
+        self.cooldown = cooldown
+        self._cond = threading.Condition()
+        self._pending: dict[str, set] = {}    # key → 変更のまとめ
+        self._due: dict[str, float] = {}      # key → 実行予定時刻
+        self._running: set[str] = set()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def publish(self, key: str, changes=()) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('notifier is closed')
+            self._pending.setdefault(key, set()).update(changes)
+            self._due[key] = time.monotonic() + self.cooldown
+            self._cond.notify()
+
+    def pending(self) -> dict[str, set]:
+        with self._cond:
+            return {k: set(v) for k, v in self._pending.items()}
+
+    def _loop(self) -> None:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = [k for k, due in self._due.items()
+                         if (due <= now or self._closed) and k not in self._running]
+                for key in sorted(ready):
+                    changes = self._pending.pop(key)
+                    del self._due[key]
+                    self._running.add(key)
+                    self._cond.release()
+                    try:
+                        self.handler(key, changes)
+                    except Exception as e:
+                        print(f"[ERROR] 変更通知の処理に失敗: {key}: {e}")
+                    finally:
+                        self._cond.acquire()
+                        self._running.discard(key)
+                        self._cond.notify_all()
+                if ready:
+                    # handler 実行中に届いた通知を取りこぼさないよう、待つ前に見直す
+                    continue
+                if self._closed and not self._due:
+                    return
+                waiting = [due for k, due in self._due.items() if k not in self._running]
+                timeout = max(0.0, min(waiting) - now) if waiting else None
+                self._cond.wait(timeout)
+
+    def close(self, timeout: float | None = None) -> None:
+        """新規通知を止め、保留分を待たずにすぐ実行して終了を待つ"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
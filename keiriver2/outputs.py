@@ -0,0 +1,200 @@
+# outputs.py
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import contextvars
+from typing import Callable
+
+import pandas as pd
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """DataFrame の内容（列名・型・値）の指紋。同じなら出力ファイルも同じ内容になる"""
+    h = hashlib.sha1()
+    h.update(json.dumps([str(c) for c in df.columns], ensure_ascii=False).encode('utf-8'))
+    h.update(str(df.dtypes.tolist()).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def replace_with_link(src: str, dest: str) -> None:
+    """dest を src と同じ内容にする（ハードリンク、できなければコピー）。置き換えは原子的"""
+    tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+class OutputIndex:
+    """
+    書き出したファイルの 内容指紋 / mtime / サイズ を覚えておく（<OUTPUT_DIR>/_rollup/outputs.json）。
+
+    ・前回と同じ内容で、ファイルもそのまま残っていれば書き直さない（unchanged）
+    ・同じ内容を別の名前で書いたばかりなら、シリアライズせずにリンクする（same_content）
+
+    ファイルの中身を後から手で編集された場合は mtime・サイズが変わるので書き直します。
+
+    save() は自分が変えた分だけをファイルの最新の内容に重ねて書くので、
+    別プロセス（backfill のワーカー）が同じ索引を更新しても互いの分を消しません。
+    プロセス間の排他には file_lock を共有のロックに差し替えてください。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] | None = None
+        self._changes: dict[str, dict | None] = {}   # 前回の save 以降の変更（None は削除）
+
+    def _read(self) -> dict[str, dict]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f).get('files', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _load(self) -> dict[str, dict]:
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    @staticmethod
+    def _matches(e: dict | None, path: str) -> bool:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return bool(e) and e['mtime_ns'] == st.st_mtime_ns and e['size'] == st.st_size
+
+    def unchanged(self, path: str, digest: str) -> bool:
+        with self._lock:
+            e = self._load().get(path)
+            return bool(e) and e['digest'] == digest and self._matches(e, path)
+
+    def same_content(self, path: str, digest: str) -> str | None:
+        """同じ拡張子・同じ内容で、いまも手つかずの別ファイル"""
+        ext = os.path.splitext(path)[1]
+        with self._lock:
+            for other, e in self._load().items():
+                if (other != path and e['digest'] == digest
+                        and other.endswith(ext) and self._matches(e, other)):
+                    return other
+        return None
+
+    def record(self, path: str, digest: str) -> None:
+        st = os.stat(path)
+        entry = {'digest': digest, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+        with self._lock:
+            self._load()[path] = entry
+            self._changes[path] = entry
+
+    def forget(self, path: str) -> None:
+        with self._lock:
+            self._load().pop(path, None)
+            self._changes[path] = None
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._changes:
+                return
+            changes, self._changes = self._changes, {}
+        with self.file_lock:
+            files = self._read()
+            for path, entry in changes.items():
+                if entry is None:
+                    files.pop(path, None)
+                else:
+                    files[path] = entry
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'updated_at': time.time(), 'files': files},
+                          f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+        with self._lock:
+            # 他プロセスの分も取り込み、書いている間の変更は重ね直す
+            for path, entry in self._changes.items():
+                if entry is None:
+                    files.pop(path, None)
+                else:
+                    files[path] = entry
+            self._entries = files
+
+
+class BackgroundWriter:
+    """
+    時間のかかる書き出し（xlsx）を 1 本のスレッドで順に実行する。
+
+    同じパスへの書き出しが待ち行列に残っていれば最新の 1 つにまとめます。
+    on_done はそのパスの書き出しが終わったら（まとめられた場合は最新の分が終わったら）呼ばれます。
+    submit() した DataFrame は書き終わるまで変更しないでください。
+    プロセスを抜ける前（CLI の終了・ウォッチャー停止・ワーカー終了）に flush() で待ちます。
+    """
+
+    def __init__(self, name: str = 'keiri-writer'):
+        self.name = name
+        self._cond = threading.Condition()
+        self._pending: dict[str, tuple] = {}    # パス → (処理, 呼び出し元のコンテキスト, 完了時の呼び出し)
+        self._order: list[str] = []
+        self._busy = False
+        self._thread: threading.Thread | None = None
+
+    def submit(self, path: str, task: Callable[[], None],
+               on_done: Callable[[], None] | None = None) -> None:
+        with self._cond:
+            if path in self._pending:
+                callbacks = self._pending[path][2]
+            else:
+                callbacks = []
+                self._order.append(path)
+            if on_done is not None:
+                callbacks.append(on_done)
+            # 呼び出し元の計測レポートに書き出し時間を載せる
+            self._pending[path] = (task, contextvars.copy_context(), callbacks)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._order:
+                    self._cond.wait()
+                path = self._order.pop(0)
+                task, ctx, callbacks = self._pending.pop(path)
+                self._busy = True
+            try:
+                ctx.run(task)
+            except Exception as e:
+                print(f"[ERROR] 書き出し失敗: {path}: {e}")
+            finally:
+                for on_done in callbacks:
+                    try:
+                        on_done()
+                    except Exception as e:
+                        print(f"[WARN] 書き出し完了の処理に失敗: {path}: {e}")
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._order) + (1 if self._busy else 0)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """待ち行列が空になるまで待つ（timeout で打ち切ったら False）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._order or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
@@ -1,13 +1,22 @@
 import os
 import re
-import unicodedata
+import atexit
 import pandas as pd
 import csv
+import json
+import time
+import hashlib
+import threading
 from datetime import datetime
-import openai
 from typing import List
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
+import metrics
+from matcher import KeywordMatcher
+from rollup import YearRollup
+from sources import SourceCache
+from outputs import OutputIndex, BackgroundWriter, frame_digest, replace_with_link
+from notifier import ChangeNotifier
+from normalization import clean_text, normalize_column_key, cache_stats, map_unique
+from normalization import normalize_header as _normalize_header
 def call_chatgpt_api(prompt: str,
                      model: str = "gpt-3.5-turbo",
                      temperature: float = 0.0,
@@ -18,17 +27,22 @@ def call_chatgpt_api(prompt: str,
         m = re.search(r'候補: \["(.+)"\]', prompt)
         return m.group(1) if m else ""
 
+    # openai は読み込みが重いので、実際に問い合わせるときだけ import
+    import openai
+    openai.api_key = api_key
+    metrics.count('llm_calls')
     try:
-        response = openai.ChatCompletion.create(
-            model=model,
-            messages=[
-                {"role": "system",  "content": "あなたは正規化アシスタントです。"},
-                {"role": "user",    "content": prompt}
-            ],
-            temperature=temperature,
-            max_tokens=max_tokens,
-            n=1,
-        )
+        with metrics.stage('llm'):
+            response = openai.ChatCompletion.create(
+                model=model,
+                messages=[
+                    {"role": "system",  "content": "あなたは正規化アシスタントです。"},
+                    {"role": "user",    "content": prompt}
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                n=1,
+            )
         return response.choices[0].message.content.strip()
     except openai.error.APIConnectionError as e:
         log_unmatched('ChatGPT APIエラー', f"接続エラー: {e}")
@@ -42,33 +56,103 @@ def call_chatgpt_api(prompt: str,
     # 何らかのエラーが起きた場合はフォールバック
     m = re.search(r'候補: \["(.+)"\]', prompt)
     return m.group(1) if m else ""
+
+# 1 回の問い合わせにまとめる候補数の上限
+LLM_BATCH_SIZE = 50
+
+def call_chatgpt_batch(candidates: list[str], field_name: str) -> dict[str, str]:
+    """
+    未知の表記ゆれをまとめて問い合わせ、{候補: 正式名称} を返す。
+    応答が JSON 配列として読めない・数が合わない塊は半分に分けて問い直し、
+    最後は 1 件ずつ（従来の問い合わせ）にします。
+    """
+    answers: dict[str, str] = {}
+    for i in range(0, len(candidates), LLM_BATCH_SIZE):
+        _ask_chunk(candidates[i:i + LLM_BATCH_SIZE], field_name, answers)
+    return answers
+
+def _ask_chunk(chunk: list[str], field_name: str, answers: dict[str, str]) -> None:
+    if len(chunk) == 1:
+        prompt = (
+            f"以下は「{field_name}」の表記ゆれ例です。\n"
+            f"– 候補: [\"{chunk[0]}\"]\n"
+            "正式名称を一つだけ日本語で返してください。"
+        )
+        answers[chunk[0]] = call_chatgpt_api(prompt)
+        return
+    prompt = (
+        f"以下は「{field_name}」の表記ゆれ例です。\n"
+        f"– 候補: {json.dumps(chunk, ensure_ascii=False)}\n"
+        "それぞれの正式名称を日本語で、候補と同じ順番・同じ個数の JSON 配列（文字列のみ）で返してください。"
+    )
+    response = call_chatgpt_api(prompt, max_tokens=40 * len(chunk) + 20)
+    try:
+        names = json.loads(response[response.index('['):response.rindex(']') + 1])
+    except ValueError:
+        names = None
+    if not isinstance(names, list) or len(names) != len(chunk):
+        # 対応が取れない応答は捨てて、小さく分けて問い直す
+        metrics.count('llm_batch_splits')
+        mid = len(chunk) // 2
+        _ask_chunk(chunk[:mid], field_name, answers)
+        _ask_chunk(chunk[mid:], field_name, answers)
+        return
+    answers.update((c, str(n)) for c, n in zip(chunk, names))
+
+# 名寄せ辞書は最初に使うときに読み込み、以後はメモリ上のものを使う
 _mapping_store: dict[str, str] = {}
+_mapping_loaded = False
+
+# 複数の年月ジョブが並列に辞書へ追記しても行が混ざらないように
+_mapping_lock = threading.Lock()
+
+def init_mapping_store(path: str | None = None) -> dict[str, str]:
+    """名寄せ辞書の明示的な初期化フック：path（省略時は MAPPING_STORE_PATH）から読み直す"""
+    global MAPPING_STORE_PATH, _mapping_loaded
+    with _mapping_lock:
+        if path is not None:
+            MAPPING_STORE_PATH = path
+        _mapping_store.clear()
+        if os.path.exists(MAPPING_STORE_PATH):
+            with open(MAPPING_STORE_PATH, encoding='utf-8-sig') as f:
+                reader = csv.DictReader(f)
+                for row in reader:
+                    _mapping_store[row['cleaned']] = row['normalized']
+        _mapping_loaded = True
+    return _mapping_store
 
 def load_mapping_store() -> dict[str, str]:
-    global _mapping_store
-    if not _mapping_store and os.path.exists(MAPPING_STORE_PATH):
-        with open(MAPPING_STORE_PATH, encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                _mapping_store[row['cleaned']] = row['normalized']
+    if not _mapping_loaded:
+        init_mapping_store()
     return _mapping_store
 
 def append_mapping(cleaned: str, normalized: str, field_name: str):
-    header = not os.path.exists(MAPPING_STORE_PATH)
-    with open(MAPPING_STORE_PATH, 'a', newline='', encoding='utf-8-sig') as f:
-        w = csv.writer(f)
-        if header:
-            w.writerow(['cleaned','normalized','field_name','created_at'])
-        w.writerow([cleaned, normalized, field_name, datetime.utcnow().isoformat()])
-    
+    append_mappings({cleaned: normalized}, field_name)
+
+def append_mappings(entries: dict[str, str], field_name: str):
+    """新しい辞書エントリをまとめて 1 回で追記"""
+    if not entries:
+        return
+    created_at = datetime.utcnow().isoformat()
+    with _mapping_lock:
+        header = not os.path.exists(MAPPING_STORE_PATH)
+        with open(MAPPING_STORE_PATH, 'a', newline='', encoding='utf-8-sig') as f:
+            w = csv.writer(f)
+            if header:
+                w.writerow(['cleaned','normalized','field_name','created_at'])
+            w.writerows([c, n, field_name, created_at] for c, n in entries.items())
+
 
 # ─── 外部ユーティリティ／設定読み込み ───
 try:
-    from logger import log_unmatched
+    from logger import log_unmatched, flush_logs
 except ImportError:
     def log_unmatched(tag: str, message: str):
         print(f"[UNMATCHED][{tag}] {message}")
 
+    def flush_logs():
+        pass
+
 try:
     from parser import parse_filename
 except ImportError:
@@ -110,49 +194,44 @@ except ImportError:
 
 # ─── 文字列クリーニング ───
 def clean_string(s: str) -> str:
-    if not isinstance(s, str):
-        return ''
-    # Unicode NFKC 正規化
-    s = unicodedata.normalize('NFKC', s)
-    # 改行をスペースに
-    s = s.replace('\n', ' ')
-    # 連続空白を 1 スペースに
-    s = re.sub(r'\s+', ' ', s)
-    return s.strip()
-
-# ─── フィールド正規化スタブ ───
+    # NFKC 正規化＋改行・連続空白を 1 スペースに（normalization でメモ化）
+    return clean_text(s)
+
 # ─── フィールド正規化（名寄せ） ───
 def normalize_field(orig: str, mapping: dict, dict_path: str, field_name: str) -> str:
+    return normalize_fields([orig], field_name)[orig]
+
+def normalize_fields(values, field_name: str) -> dict:
+    """
+    異なる値ごとに 1 回だけ名寄せして {元の値: 正式名称} を返す。
+    辞書に無いものはまとめて ChatGPT に問い合わせ、新しいエントリは 1 回で追記します。
+    """
     # 1) 前処理済みテキストをキー化
-    cleaned = clean_string(orig)
+    cleaned = {v: clean_string(v) for v in set(values)}
     # 2) 辞書参照
     store = load_mapping_store()
-    if cleaned in store:
-        return store[cleaned]
-    # 3) ChatGPT補完（仮の呼び出し例）
-    prompt = (
-        f"以下は「{field_name}」の表記ゆれ例です。\n"
-        f"– 候補: [\"{cleaned}\"]\n"
-        "正式名称を一つだけ日本語で返してください。"
-    )
-    response = call_chatgpt_api(prompt)
-    normalized = response.strip()
-
-    # 6) API自体は成功しても「そのまま返し」や空文字なら名寄せ失敗扱い
-    if not normalized or normalized == cleaned:
-        log_unmatched(
-            '名寄せ失敗',
-            f"{field_name}: 候補={cleaned} → 正式名称取得失敗"
-        )
-        return cleaned
-
-    # 4) 辞書追加
-    if normalized and normalized != cleaned:
-        append_mapping(cleaned, normalized, field_name)
-        store[cleaned] = normalized
-
-    # 5) フォールバック
-    return normalized or cleaned
+    keys = set(cleaned.values())
+    unknown = sorted(k for k in keys if k not in store)
+    metrics.count('mapping_hits', len(keys) - len(unknown))
+    metrics.count('mapping_misses', len(unknown))
+
+    # 3) 未知のものだけ ChatGPT 補完（空文字は問い合わせない）
+    answers = call_chatgpt_batch([k for k in unknown if k], field_name) if unknown else {}
+    resolved: dict[str, str] = {}
+    new_entries: dict[str, str] = {}
+    for k in unknown:
+        normalized = answers.get(k, '').strip()
+        # API自体は成功しても「そのまま返し」や空文字なら名寄せ失敗扱い
+        if not normalized or normalized == k:
+            log_unmatched('名寄せ失敗', f"{field_name}: 候補={k} → 正式名称取得失敗")
+            resolved[k] = k
+        else:
+            resolved[k] = new_entries[k] = normalized
+
+    # 4) 辞書追加（まとめて 1 回）
+    append_mappings(new_entries, field_name)
+    store.update(new_entries)
+    return {v: store.get(k, resolved.get(k, k)) for v, k in cleaned.items()}
 
 
 # ─── ヘッダ正規化強化 ───
@@ -162,12 +241,7 @@ def normalize_header(h: str) -> str:
     ・改行・全角/半角スペースを削除
     ・小文字化
     """
-    if not isinstance(h, str):
-        return ''
-    s = unicodedata.normalize('NFKC', h)
-    # 改行除去 & 全角／半角スペースをまとめて削除
-    s = re.sub(r'\s+', '', s)
-    return s.lower()
+    return _normalize_header(h)
 
 # ─── 数値正規化＆パース ───
 def normalize_numeric_text(s) -> str:
@@ -197,19 +271,39 @@ AMOUNT_KEYWORDS = [
 ]
 AMOUNT_PATTERN = re.compile(r'.*費$')
 
+# ─── キーワード照合器（設定から一度だけ構築） ───
+_matchers: dict[str, KeywordMatcher] = {}
+
+def get_matcher(name: str) -> KeywordMatcher:
+    """
+    'amount'  : AMOUNT_KEYWORDS（役割は '金額' のみ）
+    'columns' : COLUMN_ALIASES（役割 = 標準列名）
+    いずれも normalize_header 済みの文字列同士で照合します。
+    """
+    m = _matchers.get(name)
+    if m is None:
+        if name == 'amount':
+            table = {'金額': AMOUNT_KEYWORDS}
+        elif name == 'columns':
+            table = COLUMN_ALIASES
+        else:
+            raise KeyError(name)
+        m = _matchers[name] = KeywordMatcher(table, normalizer=normalize_header)
+    return m
+
 def is_amount_header(hdr: str) -> bool:
     h = normalize_header(hdr)
-    return any(kw in h for kw in AMOUNT_KEYWORDS) or bool(AMOUNT_PATTERN.match(h))
+    return get_matcher('amount').matches(h) or bool(AMOUNT_PATTERN.match(h))
 
 # ─── 列名正規化 ───
 def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # 複数の標準列に一致した場合は COLUMN_ALIASES の後勝ち（従来通り）
+    matcher = get_matcher('columns')
     rename_map: dict[str, str] = {}
-    for std_col, aliases in COLUMN_ALIASES.items():
-        norm_aliases = [normalize_header(a) for a in aliases]
-        for orig in df.columns:
-            norm_orig = normalize_header(orig)
-            if any(alias in norm_orig for alias in norm_aliases):
-                rename_map[orig] = std_col
+    for orig in df.columns:
+        std_col = matcher.last_role(normalize_header(orig))
+        if std_col is not None:
+            rename_map[orig] = std_col
     return df.rename(columns=rename_map)
 
 # ─── 動的ヘッダ検出付き読み込み ───
@@ -264,51 +358,73 @@ def parse_flexible_date(raw_date, year_hint: str) -> str:
         pass
     return ''
 def normalize(col: str) -> str:
-    s = col.lower()
-    s = s.translate(str.maketrans({'　':' ', '（':'(', '）':')'}))
-    s = re.sub(r'[^\w\s]', '', s)
-    s = s.replace(' ', '')
-    for honorific in ['様','さん','殿','先生','御中']:
-        s = s.replace(honorific, '')
-    return s
-
-def pick_store_column(row: pd.Series, raw_cols: List[str]) -> str:
+    return normalize_column_key(col)
+
+# 店舗名とみなす列名のパターン（優先順）
+STORE_COLUMN_PATTERNS = [re.compile(p) for p in (
+    r'^依頼.*',        # 依頼主、依頼者、依頼先...
+    r'^ご?依頼.*',     # ご依頼主、ご依頼人...
+    r'^お客様.*',      # お客様、お客様名...
+    r'顧客.*',         # 顧客、顧客名...
+    r'(得意先|クライアント)',  # 得意先、クライアント
+    r'(送|発|配)送.*先',  # 送り先、発送先、配送先
+    r'宛先',           # 宛先
+    r'店舗.*',         # 店舗、店舗名
+    r'ショップ.*',     # ショップ、ショップ名
+)]
+
+def store_column(raw_cols: List[str]) -> str | None:
+    """店舗名を取る列（列名だけで決まるので表ごとに 1 回）"""
     # 正規化済みカラム名リスト
     norm_map = {normalize(c): c for c in raw_cols}
-    norm_cols = list(norm_map.keys())
-
-    # マッチング用パターン
-    patterns = [
-        r'^依頼.*',        # 依頼主、依頼者、依頼先...
-        r'^ご?依頼.*',     # ご依頼主、ご依頼人...
-        r'^お客様.*',      # お客様、お客様名...
-        r'顧客.*',         # 顧客、顧客名...
-        r'(得意先|クライアント)',  # 得意先、クライアント
-        r'(送|発|配)送.*先',  # 送り先、発送先、配送先
-        r'宛先',           # 宛先
-        r'店舗.*',         # 店舗、店舗名
-        r'ショップ.*',     # ショップ、ショップ名
-    ]
 
     # 1) パターンマッチ最優先
-    for pat in patterns:
-        regex = re.compile(pat)
-        for nc in norm_cols:
+    for regex in STORE_COLUMN_PATTERNS:
+        for nc, orig in norm_map.items():
             if regex.search(nc):
-                orig = norm_map[nc]
-                return str(row.get(orig, ''))
+                return orig
 
     # 2) 部分一致フォールバック
     for nc, orig in norm_map.items():
         if any(key in nc for key in ['主','客','先','店']):
-            return str(row.get(orig, ''))
+            return orig
 
     # 3) それでもなければ「店舗」列
-    return str(row.get('店舗', ''))
+    return '店舗' if '店舗' in raw_cols else None
+
+def pick_store_column(row: pd.Series, raw_cols: List[str]) -> str:
+    col = store_column(raw_cols)
+    return str(row.get(col, '')) if col is not None else ''
+
+
+def _map_values(s: pd.Series, func) -> pd.Series:
+    """異なる値ごとに 1 回だけ func を呼ぶ（欠損値にも func を適用）"""
+    out = map_unique(s, func).astype(object)
+    na = s.isna()
+    if na.any():
+        out[na] = func(s[na].iloc[0])
+    return out
+
+def _first_column(df: pd.DataFrame, name: str, default='') -> pd.Series:
+    """列 name（重複していれば先頭）。無ければ default で埋めた列"""
+    if name not in df.columns:
+        return pd.Series(default, index=df.index, dtype=object)
+    col = df[name]
+    return col.iloc[:, 0] if isinstance(col, pd.DataFrame) else col
+
+
+def normalize_store_names(raw: pd.Series) -> pd.Series:
+    """店舗名の列を、異なる値ごとに 1 回だけ名寄せして戻す"""
+    names = normalize_fields(raw.unique(), '店舗名')
+    return raw.map(names)
 
 
 # ─── レコード抽出 ───
-def extract_items(df: pd.DataFrame, meta: dict) -> list[dict]:
+def extract_items(df: pd.DataFrame, meta: dict, normalize_stores: bool = True) -> list[dict]:
+    """
+    表からレコードを抽出。normalize_stores=False なら店舗名は名寄せ前の値のまま返すので、
+    呼び出し側で複数ファイル分をまとめて normalize_store_names() してください。
+    """
     raw_cols  = list(df.columns)
     norm_cols = [normalize_header(c) for c in raw_cols]
 
@@ -325,199 +441,400 @@ def extract_items(df: pd.DataFrame, meta: dict) -> list[dict]:
     if idx_amount is None:
         log_unmatched('列検出エラー', f"{meta['filepath']}: 金額列が見つかりません")
         return []
+    if df.empty:
+        return []
 
-    recs: list[dict] = []
-    for row_i, row in df.iterrows():
-        raw_date = row.get('日付')
-        year_hint = meta.get('年月', '').split('-')[0]  # 例: "2025"
-        date_str = parse_flexible_date(raw_date, year_hint)
-        if not date_str:
-            # date_str が空ならログ出力してスキップ
-            log_unmatched(
-                '日付抽出失敗',
-                f"{meta['filepath']}#行{row_i}: 元値={raw_date}"
-            )
-            continue
-        q = try_parse(row.iloc[idx_qty])  if idx_qty  is not None else None
-        p = try_parse(row.iloc[idx_unit]) if idx_unit is not None else None
-        a = try_parse(row.iloc[idx_amount])
-        if p is not None:
-            p = round(p, 1)
-        if a is None:
-            log_unmatched(
-                '金額欠損',
-                f"{meta['filepath']}#行{row_i}: 列={raw_cols[idx_amount]}, 値={row.iloc[idx_amount]}"
-            )
-            continue
-
-        #if q is not None and p is not None and pd.isna(row.iloc[idx_amount]):
-            #a = q * p
-        #if q is not None and a is not None and p is None:
-            #p = a / q if q else None
-        #if p is not None and a is not None and q is None:
-            #q = a / p if p else None
-        #if None not in (q, p, a) and abs(q * p - a) / max(a, 1) > 0.01:
-            #log_unmatched(
-                #'不整合',
-                #f"{meta['filepath']}#行{row_i}: {q}×{p} ≠ {a}"
-            #)
-
-        #company = normalize_field(str(row.get('企業','')), {}, '', '企業名')
-        raw_store = pick_store_column(row, raw_cols)
-        store = normalize_field(raw_store, {}, MAPPING_STORE_PATH, '店舗名')
-        item    = clean_string(row.get('作業項目/商品名', ''))
-
-        recs.append({
-            '部署':             meta.get('部署',''),
-            '元請け':           meta.get('元請け',''),
-            '日付':             date_str,
-            #'企業名':           company,
-            '店舗名':           store,
-            '作業項目/商品名':  item,
-            '数量':             q,
-            '単価':             p,
-            '金額':             a
-        })
-
+    # 列ごとに、異なる値だけ解析して行へ戻す
+    year_hint = meta.get('年月', '').split('-')[0]  # 例: "2025"
+    t0 = time.perf_counter()
+    raw_date = _first_column(df, '日付', None)
+    dates = _map_values(raw_date, lambda v: parse_flexible_date(v, year_hint))
+    t_date = time.perf_counter() - t0
+
+    none = pd.Series(None, index=df.index, dtype=object)
+    q = _map_values(df.iloc[:, idx_qty], try_parse) if idx_qty is not None else none
+    p = _map_values(df.iloc[:, idx_unit], try_parse) if idx_unit is not None else none
+    a = _map_values(df.iloc[:, idx_amount], try_parse)
+    p = p.map(lambda v: round(v, 1) if v is not None else None)
+
+    # 日付が取れない行・金額が無い行はログを出してスキップ
+    no_date = (dates == '').to_numpy()
+    no_amount = ~no_date & a.isna().to_numpy()
+    for pos in no_date.nonzero()[0]:
+        log_unmatched('日付抽出失敗', f"{meta['filepath']}#行{df.index[pos]}: 元値={raw_date.iat[pos]}")
+    for pos in no_amount.nonzero()[0]:
+        log_unmatched(
+            '金額欠損',
+            f"{meta['filepath']}#行{df.index[pos]}: 列={raw_cols[idx_amount]}, 値={df.iat[pos, idx_amount]}"
+        )
+    keep = ~no_date & ~no_amount
+
+    #company = normalize_field(str(row.get('企業','')), {}, '', '企業名')
+    t0 = time.perf_counter()
+    col = store_column(raw_cols)
+    raw_store = (_map_values(_first_column(df, col), str) if col is not None
+                 else pd.Series('', index=df.index, dtype=object))[keep]
+    store = normalize_store_names(raw_store) if normalize_stores else raw_store
+    t_norm = time.perf_counter() - t0
+    item = _map_values(_first_column(df, '作業項目/商品名'), clean_string)[keep]
+
+    recs = pd.DataFrame({
+        '部署':             meta.get('部署',''),
+        '元請け':           meta.get('元請け',''),
+        '日付':             dates[keep],
+        #'企業名':           company,
+        '店舗名':           store,
+        '作業項目/商品名':  item,
+        '数量':             q[keep],
+        '単価':             p[keep],
+        '金額':             a[keep],
+    }).to_dict('records')
+
+    metrics.add_stage('date_parse', t_date, meta.get('filepath'), rows_in=len(df))
+    metrics.add_stage('normalize', t_norm, meta.get('filepath'), rows_out=len(recs))
     return recs
 
+# ─── 出力 ───
+# 列幅設定
+COL_WIDTHS = {
+    '部署':8, '元請け':20, '日付':20,
+    '企業名':20, '店舗名':45, '作業項目/商品名':60,
+    '数量':8, '単価':15, '金額':20
+}
+
+def _write_csv(df: pd.DataFrame, path: str) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    df.to_csv(tmp, index=False, encoding='utf-8-sig')
+    os.replace(tmp, path)
+
+def _write_xlsx(df: pd.DataFrame, path: str) -> None:
+    # pandas は拡張子を見るので、一時ファイルも .xlsx で終える
+    tmp = f"{path[:-len('.xlsx')]}.{os.getpid()}.{threading.get_ident()}.tmp.xlsx"
+    with pd.ExcelWriter(tmp, engine='xlsxwriter') as w:
+        df.to_excel(w, index=False, sheet_name='Sheet1')
+        ws = w.sheets['Sheet1']
+        for i, col in enumerate(df.columns):
+            ws.set_column(i, i, COL_WIDTHS.get(col, 15))
+    os.replace(tmp, path)
+
+# 出力済みファイルの内容指紋と、xlsx 書き出し用のバックグラウンドスレッド
+_outputs: OutputIndex | None = None
+_xlsx_writer = BackgroundWriter('keiri-xlsx')
+
+def _output_index() -> OutputIndex:
+    global _outputs
+    if _outputs is None:
+        _outputs = OutputIndex(os.path.join(OUTPUT_DIR, '_rollup', 'outputs.json'))
+    return _outputs
+
+def _materialize(df: pd.DataFrame, path: str, digest: str, serialize) -> bool:
+    """
+    path を内容 digest のファイルにする。前回と同じなら何もせず、同じ内容の別ファイルが
+    あればリンクし、どちらでもなければ serialize で書き出す。書き出したら True
+    """
+    index = _output_index()
+    if index.unchanged(path, digest):
+        metrics.count('outputs_unchanged')
+        return False
+    src = index.same_content(path, digest)
+    if src is not None:
+        replace_with_link(src, path)
+        metrics.count('outputs_linked')
+        written = False
+    else:
+        serialize(df, path)
+        written = True
+    index.record(path, digest)
+    return written
+
+def write_records(df: pd.DataFrame, out_dir: str, base_name: str) -> None:
+    """
+    <out_dir>/<base_name>.csv と .xlsx を書き出す（列幅は COL_WIDTHS）。
+    内容が前回と同じなら書き直さず、xlsx はバックグラウンドで書きます
+    （待つ必要があるときは flush_outputs）。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    digest = frame_digest(df)
+    csv_path = os.path.join(out_dir, f"{base_name}.csv")
+    with metrics.stage('write_csv', file=csv_path) as st:
+        st.rows_in = len(df)
+        if _materialize(df, csv_path, digest, _write_csv):
+            st.bytes_written = os.path.getsize(csv_path)
+
+    xlsx_path = os.path.join(out_dir, f"{base_name}.xlsx")
+    # 計測レポートは待たずに保存し、write_xlsx ステージは書き終わったところで追記される
+    release = metrics.hold()
+    def write_xlsx():
+        # xlsx は CSV の写し。待っている間に CSV ごと削除された（出力が無くなった）なら作らない
+        if not os.path.exists(csv_path):
+            return
+        with metrics.stage('write_xlsx', file=xlsx_path) as st:
+            st.rows_in = len(df)
+            if _materialize(df, xlsx_path, digest, _write_xlsx):
+                st.bytes_written = os.path.getsize(xlsx_path)
+        _output_index().save()
+    _xlsx_writer.submit(xlsx_path, write_xlsx, on_done=release)
+    _output_index().save()
+
+def flush_outputs(timeout: float | None = None) -> bool:
+    """バックグラウンドの xlsx 書き出しが終わるまで待つ"""
+    return _xlsx_writer.flush(timeout)
+
+atexit.register(flush_outputs)
+
+# 年次ファイルは同じ年の別の月と共有するため、年単位で書き込みを直列化
+_year_locks: dict[str, threading.Lock] = {}
+_year_locks_guard = threading.Lock()
+
+def year_lock(year: str) -> threading.Lock:
+    with _year_locks_guard:
+        return _year_locks.setdefault(year, threading.Lock())
+
+# ─── 年次集計の起動 ───
+# 通知チャネルがあれば（ウォッチャー稼働中）変更を積んで、落ち着いてからまとめて集計。
+# 無ければ（cli の regen など）その場で集計。backfill のワーカーは最後に親がまとめて集計。
+_rollup_notifier: ChangeNotifier | None = None
+_defer_rollups = False
+
+def rollup_year(year: str, changed: set = frozenset(), force: bool = False,
+                cancel=None) -> dict[str, float]:
+    """
+    年 year の年次出力を更新（changed は変わった (部署, 年月)、force なら全部署を書き直し）。
+    ステージ別の所要秒数を返します。cancel() が True なら部署の区切りで中止（rollup.Cancelled）
+    """
+    with metrics.run('rollup', OUTPUT_DIR, 年=year) as rep, year_lock(year):
+        rollup = YearRollup(OUTPUT_DIR, year)
+        rollup.changed_depts.update(dept for dept, _ in changed)
+        with metrics.stage('rollup_refresh') as st:
+            rollup.refresh()
+            st.rows_in = len(rollup.manifest)
+        if force:
+            rollup.changed_depts.update(e['dept'] for e in rollup.manifest.values())
+        depts = sorted(rollup.changed_depts)
+        with metrics.stage('rollup_write'):
+            rollup.write(write_records, cancel=cancel)
+    print(f"[ROLLUP] {year} 年次更新: {', '.join(depts) or '変更なし'}")
+    return {name: st['wall_s'] for name, st in rep.stages.items()}
+
+def publish_rollup(year: str, changed: set) -> None:
+    if _defer_rollups:
+        return
+    if _rollup_notifier is not None:
+        _rollup_notifier.publish(year, changed)
+    else:
+        rollup_year(year, changed)
+
+def start_rollup_notifier(cooldown: float) -> None:
+    """年次集計をまとめて行う通知チャネルを開始（ウォッチャー開始時に呼ぶ）"""
+    global _rollup_notifier
+    if _rollup_notifier is None:
+        _rollup_notifier = ChangeNotifier(rollup_year, cooldown, name='keiri-rollup')
+
+def stop_rollup_notifier() -> None:
+    """保留中の集計を実行してから通知チャネルを閉じる"""
+    global _rollup_notifier
+    notifier, _rollup_notifier = _rollup_notifier, None
+    if notifier is not None:
+        notifier.close()
+
+def defer_rollups(flag: bool = True) -> None:
+    """年次集計を呼び出し側でまとめて行う（backfill のワーカー用）"""
+    global _defer_rollups
+    _defer_rollups = flag
+
+def share_year_locks(locks: dict) -> None:
+    """別プロセスのワーカーと年次出力のロックを共有する（cli の backfill 用）"""
+    with _year_locks_guard:
+        _year_locks.update(locks)
+
+def share_file_locks(locks: dict) -> None:
+    """
+    別プロセスのワーカーと共有ファイルのロックを共有する（cli の backfill 用）。
+    locks は 'mapping'（名寄せ辞書の追記）/ 'outputs'（出力の索引）/ 'history'（計測履歴）
+    """
+    global _mapping_lock
+    _mapping_lock = locks['mapping']
+    _output_index().file_lock = locks['outputs']
+    metrics.share_history_lock(locks['history'])
+
 # ─── メイン処理 ───
 def handle_new_file(filepath: str) -> None:
     meta = parse_filename(filepath)
     if 'エラー' in meta:
         log_unmatched('ファイル名', filepath)
+        flush_logs()
         return
+    regenerate_month(meta['年月'])
 
-    ym   = meta['年月']
+def regenerate_month(ym: str) -> dict[str, Exception]:
+    """
+    年月 ym の全ファイルから月次・年次の出力を再生成（計測レポート付き）。
+    読み込めなかったファイルを {パス: 例外} で返します（再試行か隔離かは呼び出し側で判断）。
+    ファイルの移動（アーカイブ）も呼び出し側の担当。
+    """
+    with metrics.run('regen', OUTPUT_DIR, 年月=ym) as rep:
+        failed = _regenerate_month(ym)
+        rep.extra['normalization_cache'] = cache_stats()
+    return failed
+
+def _drop_month_outputs(ym: str) -> None:
+    """対象ファイルが無くなった年月の月次出力（全社統合・部署別パーティション）を消し、年次に反映"""
+    year = ym.split('-')[0]
+    all_mon = os.path.join(OUTPUT_DIR, '_全社統合')
+    _xlsx_writer.flush()    # 書きかけの xlsx が後から戻ってこないように
+    for ext in ('.csv', '.xlsx'):
+        p = os.path.join(all_mon, f"全社統合_{ym}_records{ext}")
+        if os.path.exists(p):
+            os.remove(p)
+            _output_index().forget(p)
+    _output_index().save()
+    with year_lock(year):
+        rollup = YearRollup(OUTPUT_DIR, year)
+        dropped = rollup.drop_month(ym, set())
+        rollup.save()
+    for dept in dropped:
+        print(f"[ROLLUP] {dept}_{ym} は対象ファイルが無くなったため削除")
+    if dropped:
+        publish_rollup(year, {(dept, ym) for dept in dropped})
+
+def _extract_file(path: str, m: dict) -> pd.DataFrame:
+    """元ファイル 1 つを読み込み、抽出レコード（店舗名は名寄せ前）を返す"""
+    # データ読み込み
+    with metrics.stage('read', file=path) as st:
+        st.bytes_read = os.path.getsize(path)
+        if path.lower().endswith('.csv'):
+            df = pd.read_csv(path)
+        else:
+            df = read_with_dynamic_header(path)
+        st.rows_out = len(df)
+
+    with metrics.stage('columns', file=path):
+        # ヘッダ強化正規化＆エイリアスマッチ
+        df.columns = [normalize_header(c) for c in df.columns]
+        df = normalize_columns(df)
+
+        # 部分一致による強制リネーム（旧ロジック併用）
+        matcher = get_matcher('columns')
+        for orig in list(df.columns):
+            if matcher.matches(orig, '作業項目/商品名'):
+                df.rename(columns={orig: '作業項目/商品名'}, inplace=True)
+                break
+
+        # 日付列自動検出
+        date_cols = [c for c in df.columns if c.endswith('日')]
+        if date_cols:
+            for c in date_cols:
+                df[c] = pd.to_datetime(df[c], errors='coerce')
+            if '日付' not in df.columns:
+                df = df.rename(columns={date_cols[0]: '日付'})
+        else:
+            log_unmatched('列検出エラー', f"{path}: 日付列が見つかりません")
+
+    m['filepath'] = path
+    with metrics.stage('extract', file=path) as st:
+        st.rows_in = len(df)
+        # 店舗名の名寄せは _regenerate_month で月全体まとめて行う
+        extract_list = extract_items(df, m, normalize_stores=False)
+        st.rows_out = len(extract_list)
+    return pd.DataFrame(extract_list)
+
+def _extract_fingerprint() -> str:
+    """抽出結果を左右する設定の指紋（変わったらファイル単位のキャッシュを使わない）"""
+    raw = json.dumps([COLUMN_ALIASES, AMOUNT_KEYWORDS], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def _regenerate_month(ym: str) -> dict[str, Exception]:
     year = ym.split('-')[0]
     print(f"[REGEN] 全社再生成開始: 年月={ym}")
 
     # 1) 対象ファイル収集
     seen_paths = set()
     candidates: list[tuple[str, dict]] = []
-    for base in (WATCH_DIR, PROCESSED_DIR):
-        for root, _, files in os.walk(base):
-            for fn in files:
-                if not fn.lower().endswith(VALID_EXTENSIONS):
-                    continue
-                fullpath = os.path.join(root, fn)
-                if fullpath in seen_paths:
-                    continue
-                m = parse_filename(fullpath)
-                if 'エラー' in m or m.get('年月') != ym:
-                    continue
-                seen_paths.add(fullpath)
-                candidates.append((os.path.join(root, fn), m))
+    with metrics.stage('scan') as st:
+        for base in (WATCH_DIR, PROCESSED_DIR):
+            for root, _, files in os.walk(base):
+                for fn in files:
+                    if not fn.lower().endswith(VALID_EXTENSIONS):
+                        continue
+                    fullpath = os.path.join(root, fn)
+                    if fullpath in seen_paths:
+                        continue
+                    m = parse_filename(fullpath)
+                    if 'エラー' in m or m.get('年月') != ym:
+                        continue
+                    seen_paths.add(fullpath)
+                    candidates.append((os.path.join(root, fn), m))
+        st.rows_out = len(candidates)
     print(f"[DEBUG] 対象ファイル数: {len(candidates)}")
 
-    all_records: list[dict] = []
+    # 2) ファイル単位の抽出（内容が変わっていないファイルはキャッシュしたパーティションを使う）
+    sources = SourceCache(OUTPUT_DIR, ym, _extract_fingerprint())
+    frames: list[pd.DataFrame] = []
+    failed: dict[str, Exception] = {}
     for path, m in candidates:
         try:
-            # データ読み込み
-            if path.lower().endswith('.csv'):
-                df = pd.read_csv(path)
-            else:
-                df = read_with_dynamic_header(path)
-
-            # ヘッダ強化正規化＆エイリアスマッチ
-            df.columns = [normalize_header(c) for c in df.columns]
-            df = normalize_columns(df)
-
-            # 部分一致による強制リネーム（旧ロジック併用）
-            keywords = [normalize_header(k) for k in COLUMN_ALIASES.get('作業項目/商品名', [])]
-            for orig in list(df.columns):
-                if any(kw in orig for kw in keywords):
-                    df.rename(columns={orig: '作業項目/商品名'}, inplace=True)
-                    break
-
-            # 日付列自動検出
-            date_cols = [c for c in df.columns if c.endswith('日')]
-            if date_cols:
-                for c in date_cols:
-                    df[c] = pd.to_datetime(df[c], errors='coerce')
-                if '日付' not in df.columns:
-                    df = df.rename(columns={date_cols[0]: '日付'})
+            part = sources.get(path)
+            if part is None:
+                part = _extract_file(path, m)
+                sources.put(path, part)
+                print(f"[DEBUG] {os.path.basename(path)} → {len(part)} 件抽出")
             else:
-                log_unmatched('列検出エラー', f"{path}: 日付列が見つかりません")
-
-            m['filepath'] = path
-            extract_list = extract_items(df, m)
-            print(f"[DEBUG] {os.path.basename(path)} → {len(extract_list)} 件抽出")
-            all_records.extend(extract_list)
-
-            from watch_folder import archive_file
-            archive_file(path, success=True)
+                metrics.count('source_cache_hits')
+                print(f"[DEBUG] {os.path.basename(path)} → {len(part)} 件（前回の抽出結果）")
+            frames.append(part)
 
         except Exception as e:
             log_unmatched('読込エラー', f"{path}: {e}")
-            from watch_folder import archive_file
-            archive_file(path, success=False)
+            failed[path] = e
+
+    # 削除・リネームされたファイルのパーティションを外す
+    for name in sources.prune(path for path, _ in candidates):
+        print(f"[DEBUG] {name} は対象から外れたため除外")
+    sources.save()
 
-    if not all_records:
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        flush_logs()
         print("[ERROR] 処理可能なレコードがありません")
-        return
+        # 読めなかったファイルがあれば（一時的なロック等）前回の出力を残して再試行を待つ
+        if not failed:
+            _drop_month_outputs(ym)
+        return failed
 
-    df_final = pd.DataFrame(all_records)
+    df_final = pd.concat(frames, ignore_index=True).infer_objects()
     print(f"[EXTRACT] 総レコード数: {len(df_final)}")
 
+    # 店舗名の名寄せ：月内の異なる値ごとに 1 回、新しい辞書エントリの追記も 1 回
+    with metrics.stage('normalize') as st:
+        st.rows_in = len(df_final)
+        df_final['店舗名'] = normalize_store_names(df_final['店舗名'])
+        st.rows_out = df_final['店舗名'].nunique()
 
-    # 列幅設定
-    col_widths = {
-        '部署':8, '元請け':20, '日付':20,
-        '企業名':20, '店舗名':45, '作業項目/商品名':60,
-        '数量':8, '単価':15, '金額':20
-    }
-
-    # ── 月次部署別出力 ──
-    for dept, grp in df_final.groupby('部署'):
-        out_dir = os.path.join(OUTPUT_DIR, dept)
-        os.makedirs(out_dir, exist_ok=True)
-        base_month = f"{ym}_records"
-        grp.to_csv(os.path.join(out_dir, f"{dept}_{base_month}.csv"),
-                   index=False, encoding='utf-8-sig')
-        with pd.ExcelWriter(os.path.join(out_dir, f"{dept}_{base_month}.xlsx"),
-                            engine='xlsxwriter') as w:
-            grp.to_excel(w, index=False, sheet_name='Sheet1')
-            ws = w.sheets['Sheet1']
-            for i, col in enumerate(grp.columns):
-                ws.set_column(i, i, col_widths.get(col, 15))
+    # 同一実行内の未マッチログを畳み込んで書き出す
+    flush_logs()
 
     # ── 月次全社統合出力 ──
     all_mon = os.path.join(OUTPUT_DIR, '_全社統合')
-    os.makedirs(all_mon, exist_ok=True)
-    df_final.to_csv(os.path.join(all_mon, f"全社統合_{ym}_records.csv"),
-                    index=False, encoding='utf-8-sig')
-    with pd.ExcelWriter(os.path.join(all_mon, f"全社統合_{ym}_records.xlsx"),
-                        engine='xlsxwriter') as w:
-        df_final.to_excel(w, index=False, sheet_name='Sheet1')
-        ws = w.sheets['Sheet1']
-        for i, col in enumerate(df_final.columns):
-            ws.set_column(i, i, col_widths.get(col, 15))
-
-    # ── 年次部署別出力 ──
-    for dept, grp in df_final.groupby('部署'):
-        year_dir = os.path.join(OUTPUT_DIR, dept, 'yearly')
-        os.makedirs(year_dir, exist_ok=True)
-        base_year = f"{dept}_{year}_records"
-        grp.to_csv(os.path.join(year_dir, f"{base_year}.csv"),
-                   index=False, encoding='utf-8-sig')
-        with pd.ExcelWriter(os.path.join(year_dir, f"{base_year}.xlsx"),
-                            engine='xlsxwriter') as w:
-            grp.to_excel(w, index=False, sheet_name='Sheet1')
-            ws = w.sheets['Sheet1']
-            for i, col in enumerate(grp.columns):
-                ws.set_column(i, i, col_widths.get(col, 15))
-
-    # ── 年次全社統合出力 ──
-    company_year_dir = os.path.join(OUTPUT_DIR, '_全社統合', 'yearly')
-    os.makedirs(company_year_dir, exist_ok=True)
-    df_final.to_csv(os.path.join(company_year_dir, f"全社統合_{year}_records.csv"),
-                    index=False, encoding='utf-8-sig')
-    with pd.ExcelWriter(os.path.join(company_year_dir, f"全社統合_{year}_records.xlsx"),
-                        engine='xlsxwriter') as w:
-        df_final.to_excel(w, index=False, sheet_name='Sheet1')
-        ws = w.sheets['Sheet1']
-        for i, col in enumerate(df_final.columns):
-            ws.set_column(i, i, col_widths.get(col, 15))
+    write_records(df_final, all_mon, f"全社統合_{ym}_records")
+
+    with year_lock(year):
+        rollup = YearRollup(OUTPUT_DIR, year)
+
+        # ── 月次部署別出力（年次のパーティションとして登録） ──
+        depts = set()
+        for dept, grp in df_final.groupby('部署'):
+            grp = grp.reset_index(drop=True)
+            write_records(grp, os.path.join(OUTPUT_DIR, dept), f"{dept}_{ym}_records")
+            rollup.put(dept, ym, os.path.join(OUTPUT_DIR, dept, f"{dept}_{ym}_records.csv"), grp)
+            depts.add(dept)
+        for dept in rollup.drop_month(ym, depts):
+            print(f"[ROLLUP] {dept}_{ym} は今回の再生成で出力が無いため削除")
+        rollup.save()
+        changed = set(rollup.changed_depts)
+
+    # ── 年次部署別・全社統合・部署別合計（変わった部署だけ差分更新） ──
+    if changed:
+        publish_rollup(year, {(dept, ym) for dept in changed})
 
     print(f"[DONE] 全社再生成完了: 年月={ym}／年次完了")
+    return failed
@@ -0,0 +1,86 @@
+# report_job.py
+
+import time
+import threading
+from typing import Callable
+
+from config import OUTPUT_DIR
+
+
+class ReportJob:
+    """
+    年次集計（全社統合・部署別合計・キューブ）をプロセス内のバックグラウンドで作り直す。
+
+    別プロセスを起動しないので、pandas の読み込みやパーティションのキャッシュは
+    2 回目以降そのまま使われます。実行は同時に 1 本だけ。
+
+        job = ReportJob(on_progress=print, on_done=lambda ok, msg, timings: ...)
+        job.start()        # 実行中なら False
+        job.cancel()       # 部署の区切りで中止
+    """
+
+    def __init__(self, on_progress: Callable[[str], None] | None = None,
+                 on_done: Callable[[bool, str, dict], None] | None = None):
+        self.on_progress = on_progress or (lambda msg: None)
+        self.on_done = on_done or (lambda ok, msg, timings: None)
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, years: list[str] | None = None, force: bool = True) -> bool:
+        with self._lock:
+            if self.is_running():
+                return False
+            self._cancel.clear()
+            self._thread = threading.Thread(target=self._run, args=(years, force),
+                                            name='keiri-report', daemon=True)
+            self._thread.start()
+            return True
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def join(self, timeout: float | None = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, years: list[str] | None, force: bool) -> None:
+        # processor / rollup（pandas 等）は最初の実行時に読み込む（トレイの起動を軽く保つ）
+        from processor import rollup_year, flush_outputs
+        from rollup import Cancelled, list_years
+
+        t0 = time.perf_counter()
+        timings: dict[str, float] = {}
+        years = years or list_years(OUTPUT_DIR)
+        try:
+            if not years:
+                self.on_done(True, '集計対象の月次データがありません', timings)
+                return
+            for i, year in enumerate(years, 1):
+                if self._cancel.is_set():
+                    raise Cancelled(year)
+                self.on_progress(f"集計中 {year} ({i}/{len(years)})")
+                for name, sec in rollup_year(year, force=force, cancel=self._cancel.is_set).items():
+                    timings[name] = timings.get(name, 0.0) + sec
+            # xlsx はバックグラウンドで書くので、完了を知らせる前に待つ
+            t1 = time.perf_counter()
+            flush_outputs()
+            timings['write_xlsx(待ち)'] = time.perf_counter() - t1
+        except Cancelled as e:
+            print(f"[REPORT] 中止: {e}")
+            self.on_done(False, f"{e} の途中で中止しました", timings)
+            return
+        except Exception as e:
+            print(f"[ERROR] 集計に失敗: {e}")
+            self.on_done(False, f"集計に失敗しました: {e}", timings)
+            return
+        timings['(全体)'] = time.perf_counter() - t0
+        print(f"[REPORT] 完了: {', '.join(years)} " + format_timings(timings))
+        self.on_done(True, f"{', '.join(years)} の集計が完了しました", timings)
+
+
+def format_timings(timings: dict[str, float]) -> str:
+    return ' / '.join(f"{name} {sec:.2f}s" for name, sec in timings.items())
@@ -0,0 +1,88 @@
+# retry.py
+
+import time
+import errno
+import zipfile
+import threading
+
+# 一時的とみなす OSError（ロック中・使用中・ネットワーク一時断など）
+_TRANSIENT_ERRNOS = {
+    errno.EACCES, errno.EAGAIN, errno.EBUSY, errno.ETIMEDOUT, errno.EIO,
+    errno.ECONNRESET, errno.ENOLCK,
+}
+# Windows：共有違反 / ロック違反 / ネットワーク名が使えない / セマフォタイムアウト
+_TRANSIENT_WINERRORS = {32, 33, 64, 121}
+
+
+def is_transient(exc: BaseException) -> bool:
+    """
+    読み込み失敗が「待てば直る」ものか。
+    Excel で開いたままのロック、コピー途中で壊れて見える xlsx（zip）、
+    ネットワークドライブの一時エラーなど。pandas 等が包んだ例外も原因をたどって判定します。
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, (PermissionError, TimeoutError, BlockingIOError,
+                            InterruptedError, zipfile.BadZipFile, EOFError)):
+            return True
+        if isinstance(exc, OSError):
+            if getattr(exc, 'winerror', None) in _TRANSIENT_WINERRORS:
+                return True
+            if exc.errno in _TRANSIENT_ERRNOS:
+                return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class RetryQueue:
+    """
+    一時的に失敗したものを指数バックオフで再試行するための待ち行列。
+
+    schedule(key) のたびに試行回数を数え、base × 2^(回数-1) 秒（上限 max_delay）後に
+    pop_due() で取り出せるようになります。max_attempts 回を使い切ったら None を返すので、
+    呼び出し側で隔離（エラー扱い）してください。成功したら clear(key)。
+    """
+
+    def __init__(self, base: float = 5.0, max_delay: float = 300.0, max_attempts: int = 6):
+        self.base = base
+        self.max_delay = max_delay
+        self.max_attempts = max(1, max_attempts)
+        self._attempts: dict[str, int] = {}
+        self._due: dict[str, tuple[float, object]] = {}   # key → (再試行時刻, payload)
+        self._lock = threading.Lock()
+
+    def schedule(self, key: str, payload=None, now: float | None = None) -> float | None:
+        """再試行を予約して待ち秒数を返す（試行回数を使い切ったら None）"""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.get(key, 0) + 1
+            if attempts > self.max_attempts:
+                self._attempts.pop(key, None)
+                self._due.pop(key, None)
+                return None
+            self._attempts[key] = attempts
+            delay = min(self.base * (2 ** (attempts - 1)), self.max_delay)
+            self._due[key] = (now + delay, payload)
+            return delay
+
+    def pop_due(self, now: float | None = None) -> list[tuple[str, object]]:
+        """再試行時刻を過ぎたものを (key, payload) で取り出す"""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            ready = [k for k, (due, _) in self._due.items() if due <= now]
+            return [(k, self._due.pop(k)[1]) for k in ready]
+
+    def attempts(self, key: str) -> int:
+        with self._lock:
+            return self._attempts.get(key, 0)
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._attempts.pop(key, None)
+            self._due.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._due)
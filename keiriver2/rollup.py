@@ -0,0 +1,270 @@
+# rollup.py
+
+import os
+import re
+import json
+import time
+from typing import Callable
+
+import pandas as pd
+
+from state import file_digest
+from config import cache_dir
+import cube as cubes
+
+# 月次部署別ファイル（パーティション）: <OUTPUT_DIR>/<部署>/<部署>_<YYYY-MM>_records.csv
+_PART_RE = re.compile(r'^(?P<dept>.+)_(?P<ym>\d{4}-\d{2})_records\.csv$')
+
+DEPT_SUMMARY_NAME = '部署別_summary'
+
+
+class Cancelled(Exception):
+    """write() の途中で中止された（未反映の部署はマニフェストに残る）"""
+
+
+def list_years(output_dir: str) -> list[str]:
+    """月次部署別 CSV がある年の一覧"""
+    years = set()
+    try:
+        dept_dirs = [e for e in os.scandir(output_dir) if e.is_dir() and not e.name.startswith('_')]
+    except OSError:
+        return []
+    for d in dept_dirs:
+        try:
+            names = os.listdir(d.path)
+        except OSError:
+            continue
+        for name in names:
+            m = _PART_RE.match(name)
+            if m and m.group('dept') == d.name:
+                years.add(m.group('ym')[:4])
+    return sorted(years)
+
+
+class YearRollup:
+    """
+    年次出力（部署別・全社統合・部署別合計）を月次パーティションから差分更新する。
+
+    ・<OUTPUT_DIR>/_rollup/manifest_<年>.json に、パーティションごとの
+      パス / mtime / サイズ / 内容ハッシュ / 行数 / 金額合計 を記録
+    ・パーティションの中身はユーザー専用のキャッシュ（config.cache_dir）の
+      parts/<部署>/<年月>.pkl に置く（pickle は共有の出力フォルダに置かない）
+    ・再生成した月の分は呼び出し側から DataFrame をそのまま受け取り、
+      それ以外は mtime・サイズが変わったものだけ CSV を読み直す
+    ・部署別合計はマニフェストの合計から組み立てるので、全件の集計はしない
+    ・パーティションごとに集計キューブ（cube.py）も持ち、年次のキューブは
+      それらを連結するだけで作る（キャッシュの cube_<年>.*）
+    ・パーティションを登録したが年次をまだ書いていない部署はマニフェストに残すので、
+      集計を後回しにした場合（backfill・通知待ち中の終了）も次の write() で拾えます
+
+    同じ年を同時に更新しないよう、呼び出し側で年ロックを取ってください。
+    """
+
+    def __init__(self, output_dir: str, year: str):
+        self.output_dir = output_dir
+        self.year = year
+        self.root = os.path.join(output_dir, '_rollup')
+        self.cache_root = cache_dir(output_dir)
+        self.manifest_path = os.path.join(self.root, f"manifest_{year}.json")
+        data = self._load_manifest()
+        self.manifest: dict[str, dict] = data.get('partitions', {})
+        # 年次を書き直す必要がある部署（未反映の分はマニフェストに持ち越す）
+        self.changed_depts: set[str] = set(data.get('dirty', []))
+
+    # ─── マニフェスト ───
+    @staticmethod
+    def key(dept: str, ym: str) -> str:
+        return f"{dept}|{ym}"
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'year': self.year, 'updated_at': time.time(),
+                       'dirty': sorted(self.changed_depts),
+                       'partitions': self.manifest}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def _cache_path(self, dept: str, ym: str) -> str:
+        return os.path.join(self.cache_root, 'parts', dept, f"{ym}.pkl")
+
+    def _cube_base(self, dept: str, ym: str) -> str:
+        return os.path.join(self.cache_root, 'cube', dept, ym)
+
+    def _store(self, dept: str, ym: str, df: pd.DataFrame) -> None:
+        """パーティションの中身とキューブをキャッシュへ保存"""
+        cache = self._cache_path(dept, ym)
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        df.to_pickle(cache)
+        cubes.save_cube(cubes.build_cube(df, ym), self._cube_base(dept, ym))
+
+    def _discard(self, dept: str, ym: str) -> None:
+        for p in (self._cache_path(dept, ym), self._cube_base(dept, ym) + cubes.CUBE_EXT):
+            if os.path.exists(p):
+                os.remove(p)
+
+    def _entry(self, dept: str, ym: str, path: str, df: pd.DataFrame, digest: str | None = None) -> dict:
+        st = os.stat(path)
+        amount = pd.to_numeric(df['金額'], errors='coerce').sum() if '金額' in df.columns else 0.0
+        return {
+            'dept': dept, 'ym': ym, 'path': path,
+            'mtime_ns': st.st_mtime_ns, 'size': st.st_size,
+            'digest': digest or file_digest(path),
+            'rows': int(len(df)), 'total': float(amount),
+        }
+
+    # ─── パーティション ───
+    def _discover(self) -> dict[str, tuple[str, str, str]]:
+        """この年の月次部署別 CSV を {key: (部署, 年月, パス)} で列挙"""
+        found = {}
+        try:
+            dept_dirs = [e for e in os.scandir(self.output_dir)
+                         if e.is_dir() and not e.name.startswith('_')]
+        except OSError:
+            return found
+        for d in dept_dirs:
+            try:
+                names = os.listdir(d.path)
+            except OSError:
+                continue
+            for name in names:
+                m = _PART_RE.match(name)
+                if m and m.group('dept') == d.name and m.group('ym').startswith(f"{self.year}-"):
+                    found[self.key(d.name, m.group('ym'))] = (d.name, m.group('ym'), os.path.join(d.path, name))
+        return found
+
+    def put(self, dept: str, ym: str, path: str, df: pd.DataFrame) -> None:
+        """書き出したばかりのパーティションを読み直さずに登録（内容が前回と同じなら変更扱いにしない）"""
+        key = self.key(dept, ym)
+        prev = self.manifest.get(key)
+        entry = self._entry(dept, ym, path, df)
+        cached = (os.path.exists(self._cache_path(dept, ym))
+                  and os.path.exists(self._cube_base(dept, ym) + cubes.CUBE_EXT))
+        self.manifest[key] = entry
+        if prev and prev['digest'] == entry['digest'] and cached:
+            return
+        self._store(dept, ym, df)
+        self.changed_depts.add(dept)
+
+    def drop_month(self, ym: str, keep_depts: set[str]) -> list[str]:
+        """
+        年月 ym の再生成で出なくなった部署のパーティションを削除
+        （古い月次ファイルが残ると年次に混ざるため）。削除した部署を返す
+        """
+        dropped = []
+        for key, e in list(self.manifest.items()):
+            if e['ym'] == ym and e['dept'] not in keep_depts:
+                self._remove(key)
+                dropped.append(e['dept'])
+        for dept, p_ym, path in self._discover().values():
+            if p_ym == ym and dept not in keep_depts and dept not in dropped:
+                self._remove(self.key(dept, p_ym), path)
+                dropped.append(dept)
+        return dropped
+
+    def _remove(self, key: str, path: str | None = None) -> None:
+        e = self.manifest.pop(key, None)
+        dept, ym = key.split('|', 1)
+        path = path or (e or {}).get('path')
+        for p in (path, path and path[:-4] + '.xlsx'):
+            if p and os.path.exists(p):
+                os.remove(p)
+        self._discard(dept, ym)
+        self.changed_depts.add(dept)
+
+    def refresh(self) -> None:
+        """手元にない・変更されたパーティションだけ読み直し、消えたものを外す"""
+        found = self._discover()
+        for key in [k for k in self.manifest if k not in found]:
+            e = self.manifest.pop(key)
+            self._discard(e['dept'], e['ym'])
+            self.changed_depts.add(e['dept'])
+
+        for key, (dept, ym, path) in found.items():
+            e = self.manifest.get(key)
+            cached = (os.path.exists(self._cache_path(dept, ym))
+                      and os.path.exists(self._cube_base(dept, ym) + cubes.CUBE_EXT))
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if e and e['mtime_ns'] == st.st_mtime_ns and e['size'] == st.st_size and cached:
+                continue
+            digest = file_digest(path)
+            if e and e['digest'] == digest and cached:
+                e['mtime_ns'], e['size'] = st.st_mtime_ns, st.st_size
+                continue
+            df = pd.read_csv(path, encoding='utf-8-sig')
+            self._store(dept, ym, df)
+            self.manifest[key] = self._entry(dept, ym, path, df, digest)
+            self.changed_depts.add(dept)
+            print(f"[ROLLUP] 読み直し: {os.path.basename(path)}")
+
+    def frame(self, dept: str | None = None) -> pd.DataFrame:
+        """キャッシュ済みパーティションを 年月→部署 順に連結"""
+        entries = sorted((e for e in self.manifest.values() if dept is None or e['dept'] == dept),
+                         key=lambda e: (e['ym'], e['dept']))
+        parts = [pd.read_pickle(self._cache_path(e['dept'], e['ym'])) for e in entries]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+    def dept_summary(self) -> pd.DataFrame:
+        """年月×部署の件数・金額合計（マニフェストから組み立て）"""
+        rows = sorted(((e['ym'], e['dept'], e['rows'], e['total']) for e in self.manifest.values()))
+        return pd.DataFrame(rows, columns=['年月', '部署', '件数', '部署別合計金額'])
+
+    def cube(self) -> pd.DataFrame:
+        """この年の集計キューブ（パーティションのキューブを連結）"""
+        entries = sorted(self.manifest.values(), key=lambda e: (e['ym'], e['dept']))
+        return cubes.combine([cubes.load_cube(self._cube_base(e['dept'], e['ym']) + cubes.CUBE_EXT)
+                              for e in entries])
+
+    # ─── 出力 ───
+    def write(self, writer: Callable[[pd.DataFrame, str, str], None],
+              cancel: Callable[[], bool] | None = None) -> None:
+        """
+        変更のあった部署の年次と、全社統合・部署別合計の年次を書き出す。
+        cancel() が True を返したら部署の区切りで Cancelled を送出します。
+        """
+        def check():
+            if cancel is not None and cancel():
+                self.save()
+                raise Cancelled(self.year)
+
+        for dept in sorted(self.changed_depts):
+            check()
+            year_dir = os.path.join(self.output_dir, dept, 'yearly')
+            df = self.frame(dept)
+            if df.empty:
+                for ext in ('.csv', '.xlsx'):
+                    p = os.path.join(year_dir, f"{dept}_{self.year}_records{ext}")
+                    if os.path.exists(p):
+                        os.remove(p)
+                continue
+            writer(df, year_dir, f"{dept}_{self.year}_records")
+
+        if self.changed_depts:
+            check()
+            company_year_dir = os.path.join(self.output_dir, '_全社統合', 'yearly')
+            if not self.manifest:
+                # この年のパーティションが全部無くなった
+                for name in (f"全社統合_{self.year}_records", f"{DEPT_SUMMARY_NAME}_{self.year}"):
+                    for ext in ('.csv', '.xlsx'):
+                        p = os.path.join(company_year_dir, name + ext)
+                        if os.path.exists(p):
+                            os.remove(p)
+                p = os.path.join(self.cache_root, f"cube_{self.year}") + cubes.CUBE_EXT
+                if os.path.exists(p):
+                    os.remove(p)
+            else:
+                writer(self.frame(), company_year_dir, f"全社統合_{self.year}_records")
+                writer(self.dept_summary(), company_year_dir, f"{DEPT_SUMMARY_NAME}_{self.year}")
+                cubes.save_cube(self.cube(), os.path.join(self.cache_root, f"cube_{self.year}"))
+        self.changed_depts.clear()
+        self.save()
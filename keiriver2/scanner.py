@@ -0,0 +1,86 @@
+# scanner.py
+
+import os
+import time
+from typing import Callable
+
+
+class DirectoryScanner:
+    """
+    os.scandir ベースの差分ポーリング。
+
+    ・除外フォルダ（processed / output など）へは降りない
+    ・前回から mtime が変わっていないフォルダは一覧を取り直さない
+      （ファイルの追加・削除・リネームでフォルダの mtime は更新される）
+    ・一覧を取り直したフォルダのファイルだけ、DirEntry の stat 付きで返す
+
+    同じ名前のまま上書き保存されたファイルはフォルダ mtime が変わらない場合があるため、
+    full_every 回に 1 回は全フォルダを取り直します。
+    """
+
+    # 直近に更新されたフォルダは mtime の粒度で変更を取りこぼし得るので信用しない
+    RECENT_SECONDS = 2.0
+
+    def __init__(self, root: str,
+                 is_excluded: Callable[[str], bool],
+                 is_valid: Callable[[str], bool],
+                 full_every: int = 30):
+        self.root = root
+        self.is_excluded = is_excluded
+        self.is_valid = is_valid
+        self.full_every = max(1, full_every)
+        # フォルダ → (mtime_ns, サブフォルダ一覧)
+        self._dirs: dict[str, tuple[int, list[str]]] = {}
+        self._passes = 0
+        self.last_listed = 0
+        self.last_skipped = 0
+
+    def scan(self, full: bool = False) -> list[tuple[str, os.stat_result]]:
+        """変化のあったフォルダのファイルを (path, stat) で返す"""
+        self._passes += 1
+        full = full or self._passes % self.full_every == 0 or not self._dirs
+        now_ns = time.time_ns()
+        recent_ns = int(self.RECENT_SECONDS * 1e9)
+
+        results: list[tuple[str, os.stat_result]] = []
+        seen: set[str] = set()
+        listed = skipped = 0
+        stack = [self.root]
+        while stack:
+            d = stack.pop()
+            try:
+                mtime_ns = os.stat(d).st_mtime_ns
+            except OSError:
+                continue
+            seen.add(d)
+
+            cached = self._dirs.get(d)
+            if (not full and cached is not None and cached[0] == mtime_ns
+                    and now_ns - mtime_ns > recent_ns):
+                skipped += 1
+                stack.extend(cached[1])
+                continue
+
+            listed += 1
+            subdirs: list[str] = []
+            try:
+                with os.scandir(d) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if not self.is_excluded(entry.path):
+                                    subdirs.append(entry.path)
+                            elif entry.is_file() and self.is_valid(entry.name):
+                                results.append((entry.path, entry.stat()))
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            self._dirs[d] = (mtime_ns, subdirs)
+            stack.extend(subdirs)
+
+        # 消えたフォルダのキャッシュを捨てる
+        for d in [d for d in self._dirs if d not in seen]:
+            del self._dirs[d]
+        self.last_listed, self.last_skipped = listed, skipped
+        return results
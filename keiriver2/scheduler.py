@@ -0,0 +1,120 @@
+# scheduler.py
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+
+class MonthScheduler:
+    """
+    ウォッチャーと processor の間に入る年月単位のジョブスケジューラ。
+
+    ・submit(ym, item) で年月ごとに保留し、最後の投入から debounce 秒
+      新しいファイルが来なければ 1 ジョブにまとめて実行（coalesce）
+    ・異なる年月は最大 workers 並列、同じ年月は常に 1 本だけ（年月ロック）
+    ・実行中に同じ年月へ届いたファイルは、終了後の次ジョブにまとめる
+    """
+
+    def __init__(self, runner: Callable[[str, list], None],
+                 workers: int = 2, debounce: float = 2.0):
+        self.runner = runner
+        self.debounce = debounce
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers),
+                                            thread_name_prefix='keiri-month')
+        self._cond = threading.Condition()
+        self._pending: dict[str, list] = {}      # ym → 保留中のアイテム
+        self._due: dict[str, float] = {}         # ym → 実行予定時刻
+        self._running: dict[str, float] = {}     # ym → 開始時刻
+        self._month_locks: dict[str, threading.Lock] = {}
+        self._closed = False
+        self.completed = 0
+        self.failed = 0
+        self._dispatcher = threading.Thread(target=self._dispatch_loop,
+                                            name='keiri-scheduler', daemon=True)
+        self._dispatcher.start()
+
+    # ─── 投入 ───
+    def submit(self, ym: str, item, delay: float | None = None) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('scheduler is shut down')
+            self._pending.setdefault(ym, []).append(item)
+            self._due[ym] = time.monotonic() + (self.debounce if delay is None else delay)
+            self._cond.notify()
+
+    def month_lock(self, ym: str) -> threading.Lock:
+        """同じ年月の再生成を直列化するロック（CLI などスケジューラ外からも使用）"""
+        with self._cond:
+            return self._month_locks.setdefault(ym, threading.Lock())
+
+    # ─── 状態 ───
+    def queue_depth(self) -> int:
+        """保留中のアイテム数（全年月合計）"""
+        with self._cond:
+            return sum(len(v) for v in self._pending.values())
+
+    def in_flight(self) -> list[str]:
+        """実行中の年月"""
+        with self._cond:
+            return sorted(self._running)
+
+    def is_busy(self) -> bool:
+        with self._cond:
+            return bool(self._pending or self._running)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._cond:
+            return {
+                'pending_months': sorted(self._pending),
+                'queue_depth':    sum(len(v) for v in self._pending.values()),
+                'in_flight':      {ym: round(now - t, 1) for ym, t in self._running.items()},
+                'completed':      self.completed,
+                'failed':         self.failed,
+            }
+
+    # ─── 実行 ───
+    def _dispatch_loop(self) -> None:
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                ready = [ym for ym, due in self._due.items()
+                         if due <= now and ym not in self._running]
+                for ym in sorted(ready):
+                    items = self._pending.pop(ym)
+                    del self._due[ym]
+                    self._running[ym] = now
+                    self._executor.submit(self._run, ym, items)
+                waiting = [due for ym, due in self._due.items() if ym not in self._running]
+                timeout = max(0.0, min(waiting) - now) if waiting else None
+                self._cond.wait(timeout)
+
+    def _run(self, ym: str, items: list) -> None:
+        ok = False
+        try:
+            with self.month_lock(ym):
+                self.runner(ym, items)
+            ok = True
+        except Exception as e:
+            print(f"[ERROR] 年月ジョブ失敗: {ym}: {e}")
+        finally:
+            with self._cond:
+                self._running.pop(ym, None)
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                # 実行中に届いた分は debounce 後に次のジョブへ
+                self._cond.notify()
+
+    def shutdown(self, wait: bool = True) -> list:
+        """新規投入を止め、未実行の保留アイテムを返す（実行中のジョブは完了を待つ）"""
+        with self._cond:
+            self._closed = True
+            dropped = [item for items in self._pending.values() for item in items]
+            self._pending.clear()
+            self._due.clear()
+            self._cond.notify_all()
+        self._executor.shutdown(wait=wait)
+        return dropped
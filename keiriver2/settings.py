@@ -5,8 +5,8 @@ from tkinter import ttk, messagebox, simpledialog
 import keyring
 import json
 import os
-import openai
-from config import CONFIG_PATH, CHECK_INTERVAL
+from config import CONFIG_PATH, CHECK_INTERVAL, MAX_CHECK_INTERVAL
+from get_api_key import SERVICE, ENTRY, init_api
 
 class SettingsDialog(simpledialog.Dialog):
     """Tkinter標準のDialogを拡張した設定ウィンドウ"""
@@ -14,28 +14,35 @@ class SettingsDialog(simpledialog.Dialog):
     def body(self, master):
         self.title("Keiri システム設定")
 
+        # 設定ファイルから読み込み
+        self.cfg = {}
+        if os.path.exists(CONFIG_PATH):
+            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+                self.cfg = json.load(f)
+
         # APIキー
         ttk.Label(master, text="ChatGPT APIキー:").grid(row=0, column=0, sticky="e")
         self.api_var = tk.StringVar()
-        self.api_var.set(keyring.get_password("keiri", "openai_api_key") or "")
+        self.api_var.set(keyring.get_password(SERVICE, ENTRY) or "")
         ttk.Entry(master, textvariable=self.api_var, width=40, show="*").grid(row=0, column=1, padx=5, pady=5)
 
         # 監視間隔
         ttk.Label(master, text="監視間隔 (秒):").grid(row=1, column=0, sticky="e")
         self.interval_var = tk.IntVar()
-        self.interval_var.set(CHECK_INTERVAL)
+        self.interval_var.set(self.cfg.get("check_interval", CHECK_INTERVAL))
         ttk.Entry(master, textvariable=self.interval_var, width=10).grid(row=1, column=1, sticky="w", padx=5, pady=5)
 
+        # 無変化が続いたときの最大監視間隔
+        ttk.Label(master, text="最大監視間隔 (秒):").grid(row=2, column=0, sticky="e")
+        self.max_interval_var = tk.IntVar()
+        self.max_interval_var.set(self.cfg.get("max_check_interval", MAX_CHECK_INTERVAL))
+        ttk.Entry(master, textvariable=self.max_interval_var, width=10).grid(row=2, column=1, sticky="w", padx=5, pady=5)
+
         # トースト通知のオン／オフ
-        ttk.Label(master, text="トースト通知:").grid(row=2, column=0, sticky="e")
+        ttk.Label(master, text="トースト通知:").grid(row=3, column=0, sticky="e")
         self.notify_var = tk.BooleanVar()
-        # 設定ファイルから読み込み
-        cfg = {}
-        if os.path.exists(CONFIG_PATH):
-            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-                cfg = json.load(f)
-        self.notify_var.set(cfg.get("toast_notification", True))
-        ttk.Checkbutton(master, variable=self.notify_var).grid(row=2, column=1, sticky="w", padx=5, pady=5)
+        self.notify_var.set(self.cfg.get("toast_notification", True))
+        ttk.Checkbutton(master, variable=self.notify_var).grid(row=3, column=1, sticky="w", padx=5, pady=5)
 
         return master
 
@@ -44,6 +51,7 @@ class SettingsDialog(simpledialog.Dialog):
         # 1) APIキーのバリデーション
         key = self.api_var.get().strip()
         if key:
+            import openai
             openai.api_key = key
             try:
                 # 簡単な接続テスト: モデル一覧を取得
@@ -55,20 +63,27 @@ class SettingsDialog(simpledialog.Dialog):
 
         # 2) APIキー保存／削除
         if key:
-            keyring.set_password("keiri", "openai_api_key", key)
+            keyring.set_password(SERVICE, ENTRY, key)
         else:
             try:
-                keyring.delete_password("keiri", "openai_api_key")
+                keyring.delete_password(SERVICE, ENTRY)
             except keyring.errors.PasswordDeleteError:
                 pass
+        # 稼働中のプロセス（監視・名寄せ）にも新しいキーを反映
+        init_api(key)
 
-        # 3) 監視間隔 & 通知フラグの保存
-        cfg = {
+        # 3) 監視間隔 & 通知フラグの保存（他のキーはそのまま残す）
+        cfg = dict(self.cfg)
+        cfg.update({
             "check_interval": self.interval_var.get(),
+            "max_check_interval": max(self.interval_var.get(), self.max_interval_var.get()),
             "toast_notification": self.notify_var.get()
-        }
+        })
         os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
-        with open(CONFIG_PATH, "w", encoding="utf-8") as f:
+        # 監視中のプロセスが書きかけを読まないよう、一時ファイルから置き換える
+        tmp_path = CONFIG_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(cfg, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, CONFIG_PATH)
 
-        messagebox.showinfo("設定保存", "設定を保存しました。\n再起動後に反映されます。")
+        messagebox.showinfo("設定保存", "設定を保存しました。\n監視中の場合は次のチェックから反映されます。")
@@ -0,0 +1,116 @@
+# sources.py
+
+import os
+import json
+import time
+import hashlib
+
+import pandas as pd
+
+from state import file_digest
+from config import cache_dir
+
+
+class SourceCache:
+    """
+    元ファイル 1 つ分の抽出レコード（パーティション）を年月ごとにキャッシュする。
+
+    ・ユーザー専用のキャッシュ（config.cache_dir）の sources/<年月>/index.json に
+      ファイル名 / 内容ハッシュ / 抽出設定の指紋 → キャッシュファイル を記録
+      （中身は pickle なので、共有の出力フォルダには置かない）
+    ・キーは「ファイル名 + 内容ハッシュ」なので、processed/ へ移動しても再利用できる
+      （パスごとの mtime・サイズも覚えておき、変わっていなければハッシュも取らない。
+        ただし更新直後のファイルは mtime の粒度で書き換えを見落とし得るので毎回ハッシュを取る）
+    ・月の再生成で対象に入らなくなったファイル（削除・リネーム）は prune() で外す
+
+    同じ年月を同時に再生成しない前提です（年月ジョブは月ごとに直列）。
+    """
+
+    # 最終更新からこの秒数以内のファイルは mtime・サイズを信用しない
+    # （SMB・FAT の mtime は粒度が粗く、同じサイズの上書きを見分けられない）
+    RECENT_SECONDS = 2.0
+
+    def __init__(self, output_dir: str, ym: str, fingerprint: str = ''):
+        self.ym = ym
+        self.fingerprint = fingerprint
+        self.root = os.path.join(cache_dir(output_dir), 'sources', ym)
+        self.index_path = os.path.join(self.root, 'index.json')
+        data = self._load_index()
+        self.entries: dict[str, dict] = data.get('entries', {})   # key → エントリ
+        self.paths: dict[str, dict] = data.get('paths', {})       # パス → {mtime_ns, size, key}
+        self._used: set[str] = set()
+        self._dirty = False
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'ym': self.ym, 'updated_at': time.time(),
+                       'entries': self.entries, 'paths': self.paths}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.index_path)
+        self._dirty = False
+
+    def _key(self, path: str) -> str:
+        """ファイル名 + 内容ハッシュ（パスの mtime・サイズが同じで、更新直後でなければ前回のキー）"""
+        st = os.stat(path)
+        recent = time.time() - st.st_mtime < self.RECENT_SECONDS
+        p = self.paths.get(path)
+        if p and not recent and p['mtime_ns'] == st.st_mtime_ns and p['size'] == st.st_size:
+            return p['key']
+        key = f"{os.path.basename(path)}|{file_digest(path)}"
+        # 更新直後に取ったハッシュは、同じ mtime のまま書き換わり得るので次回の近道に使わない
+        entry = None if recent else {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'key': key}
+        if self.paths.get(path) != entry:
+            if entry is None:
+                self.paths.pop(path, None)
+            else:
+                self.paths[path] = entry
+            self._dirty = True
+        return key
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pkl')
+
+    def get(self, path: str) -> pd.DataFrame | None:
+        """path の抽出結果がキャッシュにあれば返す"""
+        key = self._key(path)
+        self._used.add(key)
+        e = self.entries.get(key)
+        if not e or e.get('fingerprint') != self.fingerprint:
+            return None
+        try:
+            return pd.read_pickle(self._file(key))
+        except (OSError, ValueError, EOFError):
+            return None
+
+    def put(self, path: str, df: pd.DataFrame) -> None:
+        key = self._key(path)
+        self._used.add(key)
+        os.makedirs(self.root, exist_ok=True)
+        df.to_pickle(self._file(key))
+        self.entries[key] = {'file': os.path.basename(path), 'rows': int(len(df)),
+                             'fingerprint': self.fingerprint}
+        self._dirty = True
+
+    def prune(self, paths) -> list[str]:
+        """今回の対象 paths に無いファイルのパーティションを外し、外したファイル名を返す"""
+        keep_paths = set(paths)
+        for p in [p for p in self.paths if p not in keep_paths]:
+            del self.paths[p]
+            self._dirty = True
+        dropped = []
+        for key in [k for k in self.entries if k not in self._used]:
+            dropped.append(self.entries.pop(key)['file'])
+            if os.path.exists(self._file(key)):
+                os.remove(self._file(key))
+            self._dirty = True
+        return dropped
@@ -0,0 +1,49 @@
+# stability.py
+
+import time
+import threading
+
+
+class StabilityTracker:
+    """
+    ファイルの (サイズ, 更新時刻) をスキャン／イベントのたびに記録し、
+    同じ値が required 回続いたら「書き込み完了（ready）」とみなす。
+    スリープせずに観測を積み上げるだけなので、多数のファイルを同時に追跡できます。
+
+    最後の更新から quiet_seconds 以上経っているファイルは、2 回続けて同じ値なら
+    required に達していなくても ready とします。コピー元の mtime を引き継ぐコピー
+    （エクスプローラー・robocopy）は書き込み中でも mtime が古いので、初回の観測だけでは決めません。
+    """
+
+    def __init__(self, required: int = 2, quiet_seconds: float = 2.0):
+        self.required = max(1, required)
+        self.quiet_seconds = quiet_seconds
+        # path → [size, mtime, 連続一致回数]
+        self._obs: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, path: str, size: int, mtime: float, now: float | None = None) -> bool:
+        """観測を 1 回記録し、ready なら True"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            prev = self._obs.get(path)
+            if prev is not None and prev[0] == size and prev[1] == mtime:
+                prev[2] += 1
+                streak = prev[2]
+            else:
+                self._obs[path] = [size, mtime, 1]
+                streak = 1
+        return streak >= self.required or (streak >= 2 and now - mtime >= self.quiet_seconds)
+
+    def forget(self, path: str) -> None:
+        with self._lock:
+            self._obs.pop(path, None)
+
+    def pending(self) -> list[str]:
+        """観測中（まだ ready になっていない）のパス"""
+        with self._lock:
+            return list(self._obs)
+
+    def __len__(self) -> int:
+        return len(self._obs)
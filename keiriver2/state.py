@@ -0,0 +1,164 @@
+# state.py
+
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """ファイル内容の SHA-1（変更検出用）"""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ファイルの状態遷移（journal テーブルの phase）
+#   detected → processing → archiving → （files へ確定して journal から削除）
+PHASES = ('detected', 'processing', 'archiving')
+
+
+class WatcherState:
+    """
+    ウォッチャーの処理済み状態を SQLite に永続化する小さなストア。
+    path ごとに size / mtime / 内容ハッシュ / 最終結果 / 更新時刻 を保持し、
+    書き込みはトランザクション単位で行います（再起動・クラッシュ後も再利用可）。
+
+    処理中のファイルは journal テーブルに先に状態を書いてから動かす（write-ahead）ため、
+    途中で落ちても再起動時に journal を見て移動の続きや再処理ができます。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._tx():
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path       TEXT PRIMARY KEY,
+                    size       INTEGER NOT NULL,
+                    mtime      REAL    NOT NULL,
+                    digest     TEXT,
+                    outcome    TEXT    NOT NULL,
+                    updated_at REAL    NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS journal (
+                    path       TEXT PRIMARY KEY,
+                    phase      TEXT    NOT NULL,
+                    dest       TEXT,
+                    size       INTEGER,
+                    mtime      REAL,
+                    digest     TEXT,
+                    outcome    TEXT,
+                    updated_at REAL    NOT NULL
+                )
+            """)
+
+    def _tx(self):
+        return _Transaction(self._conn, self._lock)
+
+    def load(self) -> dict[str, dict]:
+        """全件を {path: {...}} で返す（起動時の復元用）"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT path, size, mtime, digest, outcome, updated_at FROM files'
+            ).fetchall()
+        return {r[0]: _row_dict(r) for r in rows}
+
+    def get(self, path: str) -> dict | None:
+        with self._lock:
+            r = self._conn.execute(
+                'SELECT path, size, mtime, digest, outcome, updated_at FROM files WHERE path = ?',
+                (path,)
+            ).fetchone()
+        return _row_dict(r) if r else None
+
+    def record(self, path: str, size: int, mtime: float, digest: str | None, outcome: str) -> None:
+        """最終結果を確定し、journal の処理中エントリを消す"""
+        with self._tx():
+            self._conn.execute('DELETE FROM journal WHERE path = ?', (path,))
+            self._conn.execute("""
+                INSERT INTO files (path, size, mtime, digest, outcome, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    size = excluded.size, mtime = excluded.mtime,
+                    digest = excluded.digest, outcome = excluded.outcome,
+                    updated_at = excluded.updated_at
+            """, (path, size, mtime, digest, outcome, time.time()))
+
+    def forget(self, path: str) -> None:
+        with self._tx():
+            self._conn.execute('DELETE FROM files WHERE path = ?', (path,))
+            self._conn.execute('DELETE FROM journal WHERE path = ?', (path,))
+
+    # ─── journal（処理中ファイルの状態遷移） ───
+    def transition(self, path: str, phase: str, dest: str | None = None,
+                   size: int | None = None, mtime: float | None = None,
+                   digest: str | None = None, outcome: str | None = None) -> None:
+        """path の状態を phase へ進める（ファイル操作の前に呼ぶ）"""
+        if phase not in PHASES:
+            raise ValueError(f'unknown phase: {phase}')
+        with self._tx():
+            self._conn.execute("""
+                INSERT INTO journal (path, phase, dest, size, mtime, digest, outcome, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    phase = excluded.phase,
+                    dest = COALESCE(excluded.dest, journal.dest),
+                    size = COALESCE(excluded.size, journal.size),
+                    mtime = COALESCE(excluded.mtime, journal.mtime),
+                    digest = COALESCE(excluded.digest, journal.digest),
+                    outcome = COALESCE(excluded.outcome, journal.outcome),
+                    updated_at = excluded.updated_at
+            """, (path, phase, dest, size, mtime, digest, outcome, time.time()))
+
+    def in_flight(self) -> list[dict]:
+        """journal に残っている（確定していない）エントリ"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT path, phase, dest, size, mtime, digest, outcome, updated_at FROM journal'
+            ).fetchall()
+        keys = ('path', 'phase', 'dest', 'size', 'mtime', 'digest', 'outcome', 'updated_at')
+        return [dict(zip(keys, r)) for r in rows]
+
+    def discard(self, path: str) -> None:
+        """journal のエントリだけを消す（確定させずに再処理へ回す）"""
+        with self._tx():
+            self._conn.execute('DELETE FROM journal WHERE path = ?', (path,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.lock.release()
+        return False
+
+
+def _row_dict(r) -> dict:
+    return {
+        'path': r[0], 'size': r[1], 'mtime': r[2],
+        'digest': r[3], 'outcome': r[4], 'updated_at': r[5],
+    }
@@ -0,0 +1,29 @@
+# conftest.py
+
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+PKG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# keiriver2 のモジュールは互いに素の名前で import し合うので、フォルダごとパスに入れる
+if PKG_DIR not in sys.path:
+    sys.path.insert(0, PKG_DIR)
+
+# config は import 時にホーム配下のパス（監視フォルダ・キャッシュなど）を決めるので、
+# モジュールを読み込む前にテスト用のホームへ差し替える
+TEST_HOME = tempfile.mkdtemp(prefix='keiri_test_home_')
+os.environ['HOME'] = os.environ['USERPROFILE'] = os.environ['LOCALAPPDATA'] = TEST_HOME
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(TEST_HOME, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cwd(tmp_path, monkeypatch):
+    """log/ など作業フォルダ相対の出力をテストごとの一時フォルダへ"""
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,28 @@
+# test_cli.py
+
+import cli
+import processor
+
+
+def test_regen_reports_files_that_could_not_be_read(monkeypatch, capsys):
+    failed = {'/in/営業部_株式会社A_2025年1月.xlsx': PermissionError('開いたまま'),
+              '/in/総務部_株式会社B_2025年1月.csv': ValueError('日付列が見つかりません')}
+    monkeypatch.setattr(processor, 'regenerate_month', lambda ym: failed)
+    monkeypatch.setattr(processor, 'flush_outputs', lambda timeout=None: True)
+
+    ym, _, error = cli._regen_one('2025-01')
+    assert ym == '2025-01'
+    assert error.startswith('2 ファイルを読み込めず')
+    assert '営業部_株式会社A_2025年1月.xlsx: 開いたまま（一時的なエラー' in error
+    assert '総務部_株式会社B_2025年1月.csv: 日付列が見つかりません\n' in error + '\n'
+
+
+def test_regen_succeeds_when_every_file_was_read(monkeypatch):
+    monkeypatch.setattr(processor, 'regenerate_month', lambda ym: {})
+    monkeypatch.setattr(processor, 'flush_outputs', lambda timeout=None: True)
+    assert cli._regen_one('2025-01')[2] is None
+
+
+def test_month_range_spans_years():
+    assert cli.month_range('2024-11', '2025-02') == ['2024-11', '2024-12', '2025-01', '2025-02']
+    assert cli.month_range('2025-03', '2025-02') == []
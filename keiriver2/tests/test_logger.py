@@ -0,0 +1,69 @@
+# test_logger.py
+
+import csv
+import logging
+
+import logger
+from logger import UnmatchedCsvHandler, CSV_HEADER
+
+
+def _record(category: str, value: str, note: str = '') -> logging.LogRecord:
+    return logging.makeLogRecord({'levelno': logging.WARNING, 'levelname': 'WARNING',
+                                  'msg': f"{category} | {value}", 'category': category,
+                                  'value': value, 'note': note})
+
+
+def _rows(path) -> list[list[str]]:
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return list(csv.reader(f))
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages: list[str] = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_same_event_on_many_rows_collapses_into_one_line(tmp_path):
+    path = tmp_path / 'unmatched.csv'
+    text = _Collect()
+    h = UnmatchedCsvHandler(str(path), forward_to=[text])
+    for row in range(5):
+        h.handle(_record('日付抽出失敗', f"a.csv#行{row}: 元値=x"))
+    h.handle(_record('日付抽出失敗', 'a.csv#行9: 元値=y'))
+    h.handle(_record('列検出エラー', 'b.csv: 金額列が見つかりません'))
+    assert not path.exists()       # flush まではバッファのまま
+
+    h.flush()
+    assert _rows(path) == [
+        CSV_HEADER,
+        ['日付抽出失敗', 'a.csv: 元値=x', '', '5'],
+        ['日付抽出失敗', 'a.csv#行9: 元値=y', '', '1'],
+        ['列検出エラー', 'b.csv: 金額列が見つかりません', '', '1'],
+    ]
+    assert text.messages[0] == '日付抽出失敗 | a.csv: 元値=x |  (×5)'
+    assert len(text.messages) == 3
+
+
+def test_row_limit_flushes_early(tmp_path):
+    path = tmp_path / 'unmatched.csv'
+    h = UnmatchedCsvHandler(str(path), forward_to=[], max_rows=3)
+    for i in range(3):
+        h.handle(_record('ファイル名', f"file{i}.csv"))
+    assert len(_rows(path)) == 4
+    h.handle(_record('ファイル名', 'file9.csv'))
+    assert len(_rows(path)) == 4
+
+
+def test_flush_logs_drains_without_restarting_the_listener():
+    logger.init_logging()
+    thread = logger._listener._thread
+    for row in range(3):
+        logger.log_unmatched('日付抽出失敗', f"c.csv#行{row}: 元値=?")
+    assert logger.flush_logs(timeout=5)
+    assert logger._listener._thread is thread
+    rows = _rows(logger.csvh.path)
+    assert ['日付抽出失敗', 'c.csv: 元値=?', '', '3'] in rows
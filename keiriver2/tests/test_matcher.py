@@ -0,0 +1,55 @@
+# test_matcher.py
+
+import random
+
+from matcher import KeywordMatcher
+from processor import AMOUNT_KEYWORDS, COLUMN_ALIASES, get_matcher, normalize_header
+
+HEADERS = [
+    '金額', 'ご請求金額', '税込金額（円）', '小計', '支払額', '売売上', '合計', '単価', '数量',
+    '納品日', '作業日', '配達完了日時', '店舗名', '納品先', 'お届け先住所', '取引先名', '品名',
+    '商品コード', 'サービス項目', '区分', '分類名', 'Unnamed: 3', '', ' 金 額 ', 'ＡＭＯＵＮＴ',
+]
+
+
+def _random_headers(n: int = 500, seed: int = 0) -> list[str]:
+    """キーワードの断片とノイズを混ぜた見出し（部分一致・重なりの境界を突く）"""
+    rng = random.Random(seed)
+    words = list(AMOUNT_KEYWORDS) + [a for aliases in COLUMN_ALIASES.values() for a in aliases]
+    pieces = words + [w[:len(w) // 2] for w in words] + [w[1:] for w in words] + ['円', '（', '税', 'A', ' ']
+    return [''.join(rng.choice(pieces) for _ in range(rng.randint(1, 4))) for _ in range(n)]
+
+
+def test_amount_matches_like_the_old_loop():
+    matcher = get_matcher('amount')
+    for header in HEADERS + _random_headers():
+        h = normalize_header(header)
+        assert matcher.matches(h) == any(kw in h for kw in AMOUNT_KEYWORDS), header
+
+
+def test_column_roles_match_the_old_loop():
+    # 旧 normalize_columns：COLUMN_ALIASES を順に見て、一致した標準列の後勝ち
+    matcher = get_matcher('columns')
+    for header in HEADERS + _random_headers(seed=1):
+        h = normalize_header(header)
+        expected = None
+        for std_col, aliases in COLUMN_ALIASES.items():
+            if any(normalize_header(a) in h for a in aliases):
+                expected = std_col
+        assert matcher.last_role(h) == expected, header
+
+
+def test_overlapping_keywords_report_every_role_in_table_order():
+    m = KeywordMatcher({'a': ['he', 'hers'], 'b': ['she'], 'c': ['his', 'x']})
+    assert m.roles('ushers') == ('a', 'b')
+    assert m.roles('this') == ('c',)
+    assert m.roles('') == ()
+    assert m.last_role('shers') == 'b'
+    assert m.matches('shers', 'c') is False
+
+
+def test_normalizer_is_applied_to_keywords_and_text():
+    m = KeywordMatcher({'金額': ['ご請求 金額']}, normalizer=lambda s: s.replace(' ', ''))
+    assert m.matches('ご請求金額（税込）')
+    assert m.matches('ご 請求金額')
+    assert not m.matches('請求')
@@ -0,0 +1,64 @@
+# test_metrics.py
+
+import os
+import json
+import threading
+
+import metrics
+from outputs import BackgroundWriter
+
+
+def _report(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_run_does_not_wait_for_background_writes(tmp_path):
+    out = str(tmp_path)
+    writer = BackgroundWriter('test-writer')
+    gate = threading.Event()
+
+    def write_xlsx():
+        gate.wait(5)
+        with metrics.stage('write_xlsx'):
+            pass
+
+    with metrics.run('regen', out, 年月='2025-01') as rep:
+        with metrics.stage('extract'):
+            pass
+        writer.submit('a.xlsx', write_xlsx, on_done=metrics.hold())
+
+    # run はすぐ終わり、レポートは書き出し待ちのまま保存される（履歴はまだ）
+    saved = _report(rep._path)
+    assert set(saved['stages']) == {'extract'}
+    assert saved['pending_writes'] == 1
+    assert metrics.load_history(out) == []
+
+    gate.set()
+    assert writer.flush(timeout=5)
+    saved = _report(rep._path)
+    assert set(saved['stages']) == {'extract', 'write_xlsx'}
+    assert 'pending_writes' not in saved
+    history = metrics.load_history(out)
+    assert len(history) == 1
+    assert set(history[0]['stages']) == {'extract', 'write_xlsx'}
+
+
+def test_run_without_background_work_saves_history_at_once(tmp_path):
+    with metrics.run('archive', str(tmp_path)) as rep:
+        release = metrics.hold()
+        release()
+        release()      # 2 回呼んでも 1 回分
+    assert rep.pending == 0
+    assert len(metrics.load_history(str(tmp_path))) == 1
+
+
+def test_report_files_are_pruned_to_the_history_limit(tmp_path):
+    report_dir = tmp_path / '_reports'
+    report_dir.mkdir()
+    for i in range(5):
+        p = report_dir / f"regen_old{i}.json"
+        p.write_text('{}', encoding='utf-8')
+        os.utime(p, (i, i))
+    metrics._prune_reports(str(report_dir), keep=3)
+    assert sorted(os.listdir(report_dir)) == ['regen_old2.json', 'regen_old3.json', 'regen_old4.json']
@@ -0,0 +1,87 @@
+# test_normalize_fields.py
+
+import re
+import json
+
+import pytest
+
+import processor
+
+
+@pytest.fixture
+def mapping(tmp_path):
+    """名寄せ辞書をテスト用の空ファイルに差し替える"""
+    original = processor.MAPPING_STORE_PATH
+    path = str(tmp_path / 'mapping_store.csv')
+    processor.init_mapping_store(path)
+    yield path
+    processor.init_mapping_store(original)
+
+
+class _FakeLLM:
+    """候補の JSON 配列を受け取り『正式_<候補>』の配列を返す。max_items を超える塊には数を間違える"""
+
+    def __init__(self, max_items: int = 1000, wrap: str = '{}'):
+        self.max_items = max_items
+        self.wrap = wrap
+        self.prompts: list[list[str]] = []
+
+    def __call__(self, prompt: str, **kwargs) -> str:
+        m = re.search(r'候補: (\[.*\])', prompt)
+        chunk = json.loads(m.group(1))
+        self.prompts.append(chunk)
+        if len(chunk) == 1 and '一つだけ' in prompt:
+            return f"正式_{chunk[0]}"
+        names = [f"正式_{c}" for c in chunk]
+        if len(chunk) > self.max_items:
+            names = names[:-1]
+        return self.wrap.format(json.dumps(names, ensure_ascii=False))
+
+
+def test_batch_answers_are_parsed_from_surrounding_text(monkeypatch):
+    llm = _FakeLLM(wrap='結果は次のとおりです：\n{}\n以上')
+    monkeypatch.setattr(processor, 'call_chatgpt_api', llm)
+    answers = processor.call_chatgpt_batch(['ａ店', 'ｂ店', 'ｃ店'], '店舗名')
+    assert answers == {'ａ店': '正式_ａ店', 'ｂ店': '正式_ｂ店', 'ｃ店': '正式_ｃ店'}
+    assert len(llm.prompts) == 1
+
+
+def test_mismatched_chunk_is_split_until_answers_line_up(monkeypatch):
+    llm = _FakeLLM(max_items=2)
+    monkeypatch.setattr(processor, 'call_chatgpt_api', llm)
+    candidates = [f"店{i}" for i in range(7)]
+    answers = processor.call_chatgpt_batch(candidates, '店舗名')
+    assert answers == {c: f"正式_{c}" for c in candidates}
+    assert llm.prompts[0] == candidates
+
+
+def test_unparseable_reply_falls_back_to_one_by_one(monkeypatch):
+    def llm(prompt, **kwargs):
+        if '一つだけ' in prompt:
+            return '正式_' + re.search(r'候補: \["(.+)"\]', prompt).group(1)
+        return 'すみません、分かりません'
+    monkeypatch.setattr(processor, 'call_chatgpt_api', llm)
+    assert processor.call_chatgpt_batch(['x', 'y'], '店舗名') == {'x': '正式_x', 'y': '正式_y'}
+
+
+def test_chunks_respect_the_batch_size(monkeypatch):
+    llm = _FakeLLM()
+    monkeypatch.setattr(processor, 'call_chatgpt_api', llm)
+    monkeypatch.setattr(processor, 'LLM_BATCH_SIZE', 3)
+    processor.call_chatgpt_batch([f"店{i}" for i in range(7)], '店舗名')
+    assert [len(c) for c in llm.prompts] == [3, 3, 1]
+
+
+def test_normalize_fields_queries_unknown_values_once_and_records_them(monkeypatch, mapping):
+    llm = _FakeLLM()
+    monkeypatch.setattr(processor, 'call_chatgpt_api', llm)
+    values = ['ABC店', 'ABC店', 'DEF店']
+    result = processor.normalize_fields(values, '店舗名')
+    assert result == {v: f"正式_{processor.clean_string(v)}" for v in set(values)}
+    assert len(llm.prompts) == 1
+
+    # 2 回目は辞書から（問い合わせない）
+    assert processor.normalize_fields(['DEF店'], '店舗名') == {'DEF店': result['DEF店']}
+    assert len(llm.prompts) == 1
+    with open(mapping, encoding='utf-8-sig') as f:
+        assert len(f.read().strip().splitlines()) == 3
@@ -0,0 +1,67 @@
+# test_notifier.py
+
+import time
+import threading
+
+from notifier import ChangeNotifier
+
+
+class _Recorder:
+    def __init__(self, delay: float = 0.0):
+        self.calls: list[tuple[str, set]] = []
+        self.delay = delay
+        self.started = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, key: str, changes: set) -> None:
+        self.started.set()
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls.append((key, changes))
+
+
+def _wait_for(cond, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_publishes_within_cooldown_are_coalesced():
+    rec = _Recorder()
+    notifier = ChangeNotifier(rec, cooldown=0.2)
+    try:
+        for change in ('営業部', '総務部', '営業部'):
+            notifier.publish('2025', {change})
+            time.sleep(0.05)
+        notifier.publish('2024', {'経理部'})
+        _wait_for(lambda: len(rec.calls) == 2)
+        time.sleep(0.3)
+        assert sorted(rec.calls) == [('2024', {'経理部'}), ('2025', {'営業部', '総務部'})]
+        assert notifier.pending() == {}
+    finally:
+        notifier.close()
+
+
+def test_publish_during_handler_runs_once_more_afterwards():
+    rec = _Recorder(delay=0.3)
+    notifier = ChangeNotifier(rec, cooldown=0.05)
+    try:
+        notifier.publish('2025', {'営業部'})
+        assert rec.started.wait(5)
+        notifier.publish('2025', {'総務部'})
+        notifier.publish('2025', {'経理部'})
+        _wait_for(lambda: len(rec.calls) == 2)
+        assert rec.calls == [('2025', {'営業部'}), ('2025', {'総務部', '経理部'})]
+    finally:
+        notifier.close()
+
+
+def test_close_runs_pending_without_waiting_for_cooldown():
+    rec = _Recorder()
+    notifier = ChangeNotifier(rec, cooldown=60)
+    notifier.publish('2025', {'営業部'})
+    t0 = time.monotonic()
+    notifier.close(timeout=5)
+    assert time.monotonic() - t0 < 5
+    assert rec.calls == [('2025', {'営業部'})]
@@ -0,0 +1,115 @@
+# test_outputs.py
+
+import os
+import threading
+
+import pandas as pd
+
+from outputs import BackgroundWriter, OutputIndex, frame_digest, replace_with_link
+
+
+def _df(**overrides) -> pd.DataFrame:
+    data = {'店舗名': ['ABC店', 'DEF店'], '金額': [1000, 2000]}
+    data.update(overrides)
+    return pd.DataFrame(data)
+
+
+def test_frame_digest_follows_content_columns_and_dtypes():
+    base = frame_digest(_df())
+    assert frame_digest(_df()) == base
+    # 行番号（index）は出力に出ないので指紋にも入れない
+    assert frame_digest(_df().set_axis([10, 11])) == base
+    assert frame_digest(_df(金額=[1000, 2001])) != base
+    assert frame_digest(_df(金額=[1000.0, 2000.0])) != base
+    assert frame_digest(_df().rename(columns={'金額': '合計'})) != base
+
+
+def test_output_index_skips_unchanged_and_notices_edits(tmp_path):
+    index = OutputIndex(str(tmp_path / '_rollup' / 'outputs.json'))
+    path = str(tmp_path / 'a.csv')
+    (tmp_path / 'a.csv').write_text('x\n1\n', encoding='utf-8')
+    index.record(path, 'd1')
+    assert index.unchanged(path, 'd1')
+    assert not index.unchanged(path, 'd2')
+
+    # 手で編集された（mtime・サイズが変わった）ファイルは書き直し対象
+    (tmp_path / 'a.csv').write_text('x\n1\n2\n', encoding='utf-8')
+    assert not index.unchanged(path, 'd1')
+
+    index.record(path, 'd1')
+    index.save()
+    assert OutputIndex(index.path).unchanged(path, 'd1')
+
+
+def test_same_content_is_linked_instead_of_rewritten(tmp_path):
+    index = OutputIndex(str(tmp_path / 'outputs.json'))
+    src = str(tmp_path / 'dept' / 'a_2025-01_records.csv')
+    os.makedirs(os.path.dirname(src))
+    with open(src, 'w', encoding='utf-8') as f:
+        f.write('x\n1\n')
+    index.record(src, 'd1')
+
+    dest = str(tmp_path / 'a_2025-01_copy.csv')
+    assert index.same_content(dest, 'd1') == src
+    assert index.same_content(dest, 'd2') is None
+    # 拡張子が違えば中身も違う
+    assert index.same_content(str(tmp_path / 'a.xlsx'), 'd1') is None
+
+    replace_with_link(src, dest)
+    with open(dest, encoding='utf-8') as f:
+        assert f.read() == 'x\n1\n'
+    assert os.path.samefile(src, dest)
+    assert [n for n in os.listdir(tmp_path) if n.endswith('.tmp')] == []
+
+
+def test_background_writer_coalesces_writes_to_the_same_path():
+    writer = BackgroundWriter('test-writer')
+    gate = threading.Event()
+    ran, done = [], []
+    writer.submit('busy', gate.wait)
+    for i in range(3):
+        writer.submit('a.xlsx', lambda i=i: ran.append(i), on_done=lambda i=i: done.append(i))
+    gate.set()
+    assert writer.flush(timeout=5)
+    # 待ち行列に残っていた分は最新の 1 回だけ実行し、完了はすべてに知らせる
+    assert ran == [2]
+    assert sorted(done) == [0, 1, 2]
+    assert writer.pending() == 0
+
+
+def test_background_writer_reports_failures_and_keeps_going(capsys):
+    writer = BackgroundWriter('test-writer')
+    done = []
+
+    def boom():
+        raise OSError('locked')
+
+    writer.submit('a.xlsx', boom, on_done=lambda: done.append('a'))
+    writer.submit('b.xlsx', lambda: None, on_done=lambda: done.append('b'))
+    assert writer.flush(timeout=5)
+    assert done == ['a', 'b']
+    assert '書き出し失敗: a.xlsx' in capsys.readouterr().out
+
+
+def test_output_index_save_keeps_entries_written_by_another_process(tmp_path):
+    """backfill のワーカーが同じ索引をそれぞれ保存しても、互いの分を消さない"""
+    path = str(tmp_path / '_rollup' / 'outputs.json')
+    for name in ('a.csv', 'b.csv', 'c.csv'):
+        (tmp_path / name).write_text(name, encoding='utf-8')
+    first, second = OutputIndex(path), OutputIndex(path)
+    first.record(str(tmp_path / 'c.csv'), 'dc')
+    first.save()
+    second.unchanged(str(tmp_path / 'a.csv'), 'da')     # 保存前の内容を読み込んだ状態
+
+    first.record(str(tmp_path / 'a.csv'), 'da')
+    second.record(str(tmp_path / 'b.csv'), 'db')
+    second.forget(str(tmp_path / 'c.csv'))
+    first.save()
+    second.save()
+
+    merged = OutputIndex(path)
+    assert merged.unchanged(str(tmp_path / 'a.csv'), 'da')
+    assert merged.unchanged(str(tmp_path / 'b.csv'), 'db')
+    assert not merged.unchanged(str(tmp_path / 'c.csv'), 'dc')
+    # 保存したプロセスの手元にも他プロセスの分が入る
+    assert second.unchanged(str(tmp_path / 'a.csv'), 'da')
@@ -0,0 +1,131 @@
+# test_retry.py
+
+import os
+import errno
+import zipfile
+
+import pytest
+
+import config
+import processor
+import watch_folder
+from retry import RetryQueue, is_transient
+from state import WatcherState
+
+
+def test_backoff_doubles_up_to_the_limit():
+    q = RetryQueue(base=1.0, max_delay=5.0, max_attempts=5)
+    delays = [q.schedule('a.csv', now=0.0) for _ in range(5)]
+    assert delays == [1.0, 2.0, 4.0, 5.0, 5.0]
+    assert q.attempts('a.csv') == 5
+    # 回数を使い切ったら None（呼び出し側で隔離）
+    assert q.schedule('a.csv', now=0.0) is None
+    assert q.attempts('a.csv') == 0
+    assert len(q) == 0
+
+
+def test_pop_due_returns_only_expired_entries():
+    q = RetryQueue(base=10.0)
+    q.schedule('a.csv', payload='A', now=0.0)
+    q.schedule('b.csv', payload='B', now=5.0)
+    assert q.pop_due(now=9.0) == []
+    assert q.pop_due(now=10.0) == [('a.csv', 'A')]
+    assert q.pop_due(now=15.0) == [('b.csv', 'B')]
+    assert len(q) == 0
+
+
+def test_clear_resets_attempts():
+    q = RetryQueue(base=1.0, max_attempts=2)
+    q.schedule('a.csv', now=0.0)
+    q.clear('a.csv')
+    assert q.attempts('a.csv') == 0
+    assert q.schedule('a.csv', now=0.0) == 1.0
+
+
+@pytest.mark.parametrize('exc, expected', [
+    (PermissionError('locked'), True),
+    (OSError(errno.EBUSY, 'busy'), True),
+    (zipfile.BadZipFile('truncated'), True),
+    (ValueError('no date column'), False),
+    (FileNotFoundError(errno.ENOENT, 'gone'), False),
+])
+def test_is_transient(exc, expected):
+    assert is_transient(exc) is expected
+
+
+def test_is_transient_follows_the_cause():
+    try:
+        try:
+            raise PermissionError('locked')
+        except PermissionError as e:
+            raise ValueError('Excel file format cannot be determined') from e
+    except ValueError as wrapped:
+        assert is_transient(wrapped)
+
+
+# ─── ウォッチャーの年月ジョブ：再試行と隔離 ───
+@pytest.fixture
+def watcher(tmp_path, monkeypatch):
+    """状態ストアと再試行キューをテスト用に差し替え、監視フォルダに 1 ファイル置く"""
+    state = WatcherState(str(tmp_path / 'state.sqlite3'))
+    monkeypatch.setattr(watch_folder, '_state', state)
+    monkeypatch.setattr(watch_folder, '_retries', RetryQueue(base=1.0, max_attempts=2))
+    os.makedirs(config.WATCH_DIR, exist_ok=True)
+    path = os.path.join(config.WATCH_DIR, '営業部_株式会社A_2025年1月.csv')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('日付,金額\n1/1,100\n')
+    st = os.stat(path)
+    item = {'path': path, 'size': st.st_size, 'mtime': st.st_mtime, 'digest': 'x'}
+    yield state, item
+    state.close()
+    for p in (path, os.path.join(config.ERROR_DIR, os.path.basename(path)),
+              os.path.join(config.PROCESSED_DIR, '営業部', os.path.basename(path))):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def _fail_with(monkeypatch, item: dict, exc: Exception) -> None:
+    """再生成で item のファイルだけが exc で失敗したことにする"""
+    monkeypatch.setattr(processor, 'regenerate_month', lambda ym: {item['path']: exc})
+
+
+def test_transient_failure_is_retried_then_quarantined(watcher, monkeypatch):
+    state, item = watcher
+    _fail_with(monkeypatch, item, PermissionError('開いたまま'))
+    error_dest = os.path.join(config.ERROR_DIR, os.path.basename(item['path']))
+
+    for attempt in (1, 2):
+        watch_folder._run_month_job('2025-01', [item])
+        assert os.path.exists(item['path'])
+        assert watch_folder._retries.attempts(item['path']) == attempt
+        assert [e['phase'] for e in state.in_flight()] == ['detected']
+
+    watch_folder._run_month_job('2025-01', [item])
+    assert not os.path.exists(item['path'])
+    assert os.path.exists(error_dest)
+    assert state.get(item['path'])['outcome'] == 'error'
+    assert state.in_flight() == []
+    assert len(watch_folder._retries) == 0
+
+
+def test_permanent_failure_is_quarantined_at_once(watcher, monkeypatch):
+    state, item = watcher
+    _fail_with(monkeypatch, item, ValueError('日付列が見つかりません'))
+
+    watch_folder._run_month_job('2025-01', [item])
+    assert os.path.exists(os.path.join(config.ERROR_DIR, os.path.basename(item['path'])))
+    assert state.get(item['path'])['outcome'] == 'error'
+    assert watch_folder._retries.attempts(item['path']) == 0
+
+
+def test_success_after_retry_clears_the_attempts(watcher, monkeypatch):
+    state, item = watcher
+    _fail_with(monkeypatch, item, PermissionError('開いたまま'))
+    watch_folder._run_month_job('2025-01', [item])
+    assert watch_folder._retries.attempts(item['path']) == 1
+
+    monkeypatch.setattr(processor, 'regenerate_month', lambda ym: {})
+    watch_folder._run_month_job('2025-01', [item])
+    assert os.path.exists(os.path.join(config.PROCESSED_DIR, '営業部', os.path.basename(item['path'])))
+    assert state.get(item['path'])['outcome'] == 'success'
+    assert watch_folder._retries.attempts(item['path']) == 0
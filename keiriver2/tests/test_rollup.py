@@ -0,0 +1,174 @@
+# test_rollup.py
+
+import os
+
+import pandas as pd
+
+from rollup import YearRollup, DEPT_SUMMARY_NAME
+
+
+def _records(dept: str, ym: str, amounts: list) -> pd.DataFrame:
+    return pd.DataFrame({
+        '年月': ym, '部署': dept, '元請け': '株式会社A',
+        '店舗名': [f"店{i}" for i in range(len(amounts))],
+        '数量': 1, '金額': amounts,
+    })
+
+
+def _write_part(out: str, dept: str, ym: str, df: pd.DataFrame) -> str:
+    """月次部署別 CSV（パーティション）を出力フォルダに置く"""
+    path = os.path.join(out, dept, f"{dept}_{ym}_records.csv")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path, index=False, encoding='utf-8-sig')
+    return path
+
+
+def _csv_writer(df: pd.DataFrame, out_dir: str, base_name: str) -> None:
+    os.makedirs(out_dir, exist_ok=True)
+    df.to_csv(os.path.join(out_dir, f"{base_name}.csv"), index=False, encoding='utf-8-sig')
+
+
+def _read_yearly(out: str, dept: str | None, year: str = '2025') -> pd.DataFrame:
+    if dept is None:
+        path = os.path.join(out, '_全社統合', 'yearly', f"全社統合_{year}_records.csv")
+    else:
+        path = os.path.join(out, dept, 'yearly', f"{dept}_{year}_records.csv")
+    return pd.read_csv(path, encoding='utf-8-sig')
+
+
+def test_refresh_reads_only_changed_partitions(tmp_path):
+    out = str(tmp_path)
+    _write_part(out, '営業部', '2025-01', _records('営業部', '2025-01', [100, 200]))
+    _write_part(out, '総務部', '2025-01', _records('総務部', '2025-01', [300]))
+
+    rollup = YearRollup(out, '2025')
+    rollup.refresh()
+    assert set(rollup.manifest) == {'営業部|2025-01', '総務部|2025-01'}
+    assert rollup.changed_depts == {'営業部', '総務部'}
+    rollup.write(_csv_writer)
+
+    # マニフェストどおりなら読み直さない
+    rollup = YearRollup(out, '2025')
+    rollup.refresh()
+    assert rollup.changed_depts == set()
+
+    # 中身が変わった部署だけ変更扱い
+    _write_part(out, '総務部', '2025-01', _records('総務部', '2025-01', [300, 4000]))
+    rollup.refresh()
+    assert rollup.changed_depts == {'総務部'}
+    assert rollup.manifest['総務部|2025-01']['rows'] == 2
+    assert rollup.manifest['総務部|2025-01']['total'] == 4300
+
+
+def test_refresh_drops_deleted_partition(tmp_path):
+    out = str(tmp_path)
+    path = _write_part(out, '営業部', '2025-01', _records('営業部', '2025-01', [100]))
+    _write_part(out, '営業部', '2025-02', _records('営業部', '2025-02', [200]))
+    rollup = YearRollup(out, '2025')
+    rollup.refresh()
+    rollup.write(_csv_writer)
+
+    os.remove(path)
+    rollup = YearRollup(out, '2025')
+    rollup.refresh()
+    assert set(rollup.manifest) == {'営業部|2025-02'}
+    assert rollup.changed_depts == {'営業部'}
+
+
+def test_drop_month_removes_departments_missing_from_regeneration(tmp_path):
+    out = str(tmp_path)
+    rollup = YearRollup(out, '2025')
+    for dept in ('営業部', '総務部'):
+        df = _records(dept, '2025-01', [100])
+        rollup.put(dept, '2025-01', _write_part(out, dept, '2025-01', df), df)
+    # マニフェストに無くても、出力フォルダに残っている古いパーティションも消す
+    _write_part(out, '経理部', '2025-01', _records('経理部', '2025-01', [1]))
+    rollup.write(_csv_writer)
+
+    dropped = rollup.drop_month('2025-01', {'営業部'})
+
+    assert set(dropped) == {'総務部', '経理部'}
+    assert set(rollup.manifest) == {'営業部|2025-01'}
+    assert not os.path.exists(os.path.join(out, '総務部', '総務部_2025-01_records.csv'))
+    assert not os.path.exists(os.path.join(out, '経理部', '経理部_2025-01_records.csv'))
+    assert rollup.changed_depts == {'総務部', '経理部'}
+
+
+def test_yearly_output_contains_every_month(tmp_path):
+    out = str(tmp_path)
+    months = ['2025-01', '2025-02', '2025-03']
+    for i, ym in enumerate(months, 1):
+        _write_part(out, '営業部', ym, _records('営業部', ym, [100 * i, 10 * i]))
+        _write_part(out, '総務部', ym, _records('総務部', ym, [1000 * i]))
+    rollup = YearRollup(out, '2025')
+    rollup.refresh()
+    rollup.write(_csv_writer)
+
+    assert sorted(_read_yearly(out, '営業部')['年月'].unique()) == months
+    assert sorted(_read_yearly(out, '総務部')['年月'].unique()) == months
+    company = _read_yearly(out, None)
+    assert len(company) == 9
+    assert sorted(company['年月'].unique()) == months
+
+    # 1 か月分だけ差し替えても、年次には全ての月が残る
+    df = _records('営業部', '2025-02', [999])
+    rollup = YearRollup(out, '2025')
+    rollup.put('営業部', '2025-02', _write_part(out, '営業部', '2025-02', df), df)
+    rollup.refresh()
+    assert rollup.changed_depts == {'営業部'}
+    rollup.write(_csv_writer)
+
+    sales = _read_yearly(out, '営業部')
+    assert sorted(sales['年月'].unique()) == months
+    assert sales.loc[sales['年月'] == '2025-02', '金額'].tolist() == [999]
+    assert len(_read_yearly(out, None)) == 8
+    summary = pd.read_csv(os.path.join(out, '_全社統合', 'yearly', f"{DEPT_SUMMARY_NAME}_2025.csv"),
+                          encoding='utf-8-sig')
+    assert len(summary) == 6
+
+
+def test_put_same_content_is_not_a_change(tmp_path):
+    out = str(tmp_path)
+    df = _records('営業部', '2025-01', [100, 200])
+    rollup = YearRollup(out, '2025')
+    rollup.put('営業部', '2025-01', _write_part(out, '営業部', '2025-01', df), df)
+    rollup.write(_csv_writer)
+
+    rollup = YearRollup(out, '2025')
+    rollup.put('営業部', '2025-01', _write_part(out, '営業部', '2025-01', df), df)
+    assert rollup.changed_depts == set()
+
+    df = _records('営業部', '2025-01', [100, 201])
+    rollup.put('営業部', '2025-01', _write_part(out, '営業部', '2025-01', df), df)
+    assert rollup.changed_depts == {'営業部'}
+
+
+def test_write_removes_yearly_outputs_when_year_is_empty(tmp_path):
+    out = str(tmp_path)
+    df = _records('営業部', '2025-01', [100])
+    rollup = YearRollup(out, '2025')
+    rollup.put('営業部', '2025-01', _write_part(out, '営業部', '2025-01', df), df)
+    rollup.write(_csv_writer)
+    company = os.path.join(out, '_全社統合', 'yearly', '全社統合_2025_records.csv')
+    assert os.path.exists(company)
+
+    assert rollup.drop_month('2025-01', set()) == ['営業部']
+    rollup.write(_csv_writer)
+
+    assert rollup.manifest == {}
+    assert not os.path.exists(os.path.join(out, '営業部', 'yearly', '営業部_2025_records.csv'))
+    assert not os.path.exists(company)
+
+
+def test_caches_stay_out_of_the_output_folder(tmp_path):
+    """pickle のキャッシュは共有の出力フォルダに置かない"""
+    out = str(tmp_path / 'output')
+    df = _records('営業部', '2025-01', [100])
+    rollup = YearRollup(out, '2025')
+    rollup.put('営業部', '2025-01', _write_part(out, '営業部', '2025-01', df), df)
+    rollup.write(_csv_writer)
+
+    found = [os.path.join(d, n) for d, _, names in os.walk(out) for n in names]
+    assert not [p for p in found if p.endswith(('.pkl', '.parquet'))]
+    assert not rollup.cache_root.startswith(out)
+    assert os.path.exists(rollup._cache_path('営業部', '2025-01'))
@@ -0,0 +1,94 @@
+# test_scanner.py
+
+import os
+import time
+
+from scanner import DirectoryScanner
+
+
+def _touch(path: str, age: float = 60.0) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('x')
+    _age(path, age)
+
+
+def _age(path: str, age: float = 60.0) -> None:
+    """mtime を過去にずらす（RECENT_SECONDS より古いフォルダだけがスキップ対象）"""
+    t = time.time() - age
+    os.utime(path, (t, t))
+
+
+def _tree(root: str) -> None:
+    for rel in ('営業部/a.csv', '営業部/2025/b.xlsx', '総務部/c.csv', '総務部/memo.txt',
+                'processed/done.csv'):
+        _touch(os.path.join(root, rel))
+    for d in ('営業部/2025', '営業部', '総務部', 'processed', ''):
+        _age(os.path.join(root, d))
+
+
+def _scanner(root: str, full_every: int = 30) -> DirectoryScanner:
+    excluded = os.path.join(root, 'processed')
+    return DirectoryScanner(root, lambda p: p.startswith(excluded),
+                            lambda n: n.endswith(('.csv', '.xlsx')), full_every=full_every)
+
+
+def _names(results) -> set[str]:
+    return {os.path.basename(p) for p, _ in results}
+
+
+def test_first_scan_lists_everything_except_excluded(tmp_path):
+    root = str(tmp_path)
+    _tree(root)
+    scanner = _scanner(root)
+    assert _names(scanner.scan()) == {'a.csv', 'b.xlsx', 'c.csv'}
+    assert (scanner.last_listed, scanner.last_skipped) == (4, 0)
+
+
+def test_unchanged_folders_are_skipped(tmp_path):
+    root = str(tmp_path)
+    _tree(root)
+    scanner = _scanner(root)
+    scanner.scan()
+
+    assert scanner.scan() == []
+    assert (scanner.last_listed, scanner.last_skipped) == (0, 4)
+
+    # 追加されたフォルダだけ一覧を取り直す
+    _touch(os.path.join(root, '総務部', 'd.csv'))
+    _age(os.path.join(root, '総務部'))
+    assert _names(scanner.scan()) == {'c.csv', 'd.csv'}
+    assert (scanner.last_listed, scanner.last_skipped) == (1, 3)
+
+
+def test_recently_modified_folder_is_not_trusted(tmp_path):
+    root = str(tmp_path)
+    _tree(root)
+    scanner = _scanner(root)
+    os.utime(os.path.join(root, '営業部'))      # いま更新された
+    scanner.scan()
+    assert _names(scanner.scan()) == {'a.csv'}
+    assert scanner.last_listed == 1
+
+
+def test_full_rescan_every_n_passes(tmp_path):
+    root = str(tmp_path)
+    _tree(root)
+    scanner = _scanner(root, full_every=3)
+    scanner.scan()
+    scanner.scan()
+    # 同じ名前で上書きされてもフォルダ mtime は変わらない → 定期的な全件で拾う
+    assert _names(scanner.scan()) == {'a.csv', 'b.xlsx', 'c.csv'}
+    assert _names(scanner.scan(full=True)) == {'a.csv', 'b.xlsx', 'c.csv'}
+
+
+def test_removed_folder_is_forgotten(tmp_path):
+    root = str(tmp_path)
+    _tree(root)
+    scanner = _scanner(root)
+    scanner.scan()
+    os.remove(os.path.join(root, '営業部', '2025', 'b.xlsx'))
+    os.rmdir(os.path.join(root, '営業部', '2025'))
+    _age(os.path.join(root, '営業部'))
+    assert _names(scanner.scan()) == {'a.csv'}
+    assert os.path.join(root, '営業部', '2025') not in scanner._dirs
@@ -0,0 +1,97 @@
+# test_scheduler.py
+
+import time
+import threading
+from collections import defaultdict
+
+from scheduler import MonthScheduler
+
+
+class _Runner:
+    """年月ごとの同時実行数を記録する"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls: list[tuple[str, list]] = []
+        self.active: dict[str, int] = defaultdict(int)
+        self.max_active: dict[str, int] = defaultdict(int)
+        self.max_total = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, ym: str, items: list) -> None:
+        with self._lock:
+            self.active[ym] += 1
+            self.max_active[ym] = max(self.max_active[ym], self.active[ym])
+            self.max_total = max(self.max_total, sum(self.active.values()))
+        time.sleep(self.delay)
+        with self._lock:
+            self.active[ym] -= 1
+            self.calls.append((ym, items))
+
+
+def _wait_idle(sched: MonthScheduler, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while sched.is_busy():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_items_for_a_month_are_coalesced():
+    runner = _Runner()
+    sched = MonthScheduler(runner, workers=2, debounce=0.2)
+    try:
+        for name in ('a.csv', 'b.csv', 'c.csv'):
+            sched.submit('2025-01', name)
+        assert sched.queue_depth() == 3
+        _wait_idle(sched)
+        assert runner.calls == [('2025-01', ['a.csv', 'b.csv', 'c.csv'])]
+        assert sched.stats()['completed'] == 1
+    finally:
+        sched.shutdown()
+
+
+def test_same_month_runs_one_at_a_time():
+    runner = _Runner(delay=0.2)
+    sched = MonthScheduler(runner, workers=4, debounce=0.0)
+    try:
+        sched.submit('2025-01', 'a.csv')
+        sched.submit('2025-02', 'x.csv')
+        time.sleep(0.05)
+        # 実行中に届いた分は終わってから次のジョブにまとめる
+        sched.submit('2025-01', 'b.csv')
+        sched.submit('2025-01', 'c.csv')
+        _wait_idle(sched)
+    finally:
+        sched.shutdown()
+
+    assert runner.max_active['2025-01'] == 1
+    assert runner.max_total == 2     # 異なる年月は並列
+    jan = [items for ym, items in runner.calls if ym == '2025-01']
+    assert jan == [['a.csv'], ['b.csv', 'c.csv']]
+
+
+def test_failed_job_is_counted_and_does_not_block_the_month():
+    calls = []
+
+    def runner(ym, items):
+        calls.append(items)
+        if items == ['bad.csv']:
+            raise RuntimeError('boom')
+
+    sched = MonthScheduler(runner, workers=1, debounce=0.0)
+    try:
+        sched.submit('2025-01', 'bad.csv')
+        _wait_idle(sched)
+        sched.submit('2025-01', 'good.csv')
+        _wait_idle(sched)
+        assert calls == [['bad.csv'], ['good.csv']]
+        assert sched.stats()['failed'] == 1
+        assert sched.stats()['completed'] == 1
+    finally:
+        sched.shutdown()
+
+
+def test_shutdown_returns_pending_items():
+    sched = MonthScheduler(lambda ym, items: None, workers=1, debounce=60)
+    sched.submit('2025-01', 'a.csv')
+    assert sched.shutdown() == ['a.csv']
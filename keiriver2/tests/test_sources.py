@@ -0,0 +1,118 @@
+# test_sources.py
+
+import os
+import time
+import shutil
+
+import pandas as pd
+
+from sources import SourceCache
+
+
+def _source(tmp_path, name: str, body: str, age: float = 60.0) -> str:
+    """監視フォルダ相当の元ファイル（既定では 1 分前に更新されたもの）"""
+    path = tmp_path / 'watch' / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(body, encoding='utf-8')
+    t = time.time() - age
+    os.utime(path, (t, t))
+    return str(path)
+
+
+def test_cached_partition_is_reused(tmp_path):
+    out = str(tmp_path / 'output')
+    path = _source(tmp_path, '営業部_株式会社A_2025年1月.csv', 'a,b\n1,2\n')
+    df = pd.DataFrame({'金額': [1, 2]})
+
+    cache = SourceCache(out, '2025-01', 'fp')
+    assert cache.get(path) is None
+    cache.put(path, df)
+    cache.save()
+
+    cache = SourceCache(out, '2025-01', 'fp')
+    pd.testing.assert_frame_equal(cache.get(path), df)
+
+
+def test_content_change_invalidates(tmp_path):
+    out = str(tmp_path / 'output')
+    path = _source(tmp_path, '営業部_株式会社A_2025年1月.csv', 'a,b\n1,2\n')
+    cache = SourceCache(out, '2025-01', 'fp')
+    cache.get(path)
+    cache.put(path, pd.DataFrame({'金額': [1]}))
+    cache.save()
+
+    _source(tmp_path, '営業部_株式会社A_2025年1月.csv', 'a,b\n1,2\n3,4\n')
+    assert SourceCache(out, '2025-01', 'fp').get(path) is None
+
+
+def test_fingerprint_change_invalidates(tmp_path):
+    out = str(tmp_path / 'output')
+    path = _source(tmp_path, '営業部_株式会社A_2025年1月.csv', 'a,b\n1,2\n')
+    cache = SourceCache(out, '2025-01', 'fp1')
+    cache.put(path, pd.DataFrame({'金額': [1]}))
+    cache.save()
+
+    assert SourceCache(out, '2025-01', 'fp2').get(path) is None
+
+
+def test_moved_file_keeps_its_partition(tmp_path):
+    """processed/ へ移動しても、同じ名前・同じ内容ならキャッシュを使う"""
+    out = str(tmp_path / 'output')
+    path = _source(tmp_path, '営業部_株式会社A_2025年1月.csv', 'a,b\n1,2\n')
+    cache = SourceCache(out, '2025-01', 'fp')
+    cache.put(path, pd.DataFrame({'金額': [1]}))
+    cache.save()
+
+    moved = tmp_path / 'processed' / '営業部' / os.path.basename(path)
+    moved.parent.mkdir(parents=True)
+    shutil.move(path, moved)
+    cache = SourceCache(out, '2025-01', 'fp')
+    assert cache.get(str(moved)) is not None
+    assert cache.prune([str(moved)]) == []
+
+
+def test_prune_drops_files_no_longer_in_the_month(tmp_path):
+    out = str(tmp_path / 'output')
+    keep = _source(tmp_path, '営業部_株式会社A_2025年1月.csv', 'a\n1\n')
+    gone = _source(tmp_path, '総務部_株式会社B_2025年1月.csv', 'a\n2\n')
+    cache = SourceCache(out, '2025-01', 'fp')
+    for p in (keep, gone):
+        cache.put(p, pd.DataFrame({'金額': [1]}))
+    cache.save()
+    pickles = set(os.listdir(cache.root))
+
+    os.remove(gone)
+    cache = SourceCache(out, '2025-01', 'fp')
+    assert cache.get(keep) is not None
+    assert cache.prune([keep]) == [os.path.basename(gone)]
+    cache.save()
+
+    cache = SourceCache(out, '2025-01', 'fp')
+    assert list(cache.paths) == [keep]
+    assert len(cache.entries) == 1
+    assert len(pickles - set(os.listdir(cache.root))) == 1
+
+
+def test_same_size_rewrite_of_a_recent_file_is_noticed(tmp_path):
+    """更新直後のファイルは mtime・サイズが同じでもハッシュを取り直す"""
+    out = str(tmp_path / 'output')
+    path = _source(tmp_path, '営業部_株式会社A_2025年1月.csv', 'a,b\n1,2\n', age=0)
+    st = os.stat(path)
+    cache = SourceCache(out, '2025-01', 'fp')
+    cache.put(path, pd.DataFrame({'金額': [1]}))
+    cache.save()
+
+    # mtime の粒度の中で同じサイズに上書きされた
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('a,b\n9,9\n')
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert SourceCache(out, '2025-01', 'fp').get(path) is None
+
+
+def test_cache_stays_out_of_the_output_folder(tmp_path):
+    out = str(tmp_path / 'output')
+    path = _source(tmp_path, '営業部_株式会社A_2025年1月.csv', 'a\n1\n')
+    cache = SourceCache(out, '2025-01', 'fp')
+    cache.put(path, pd.DataFrame({'金額': [1]}))
+    cache.save()
+    assert not os.path.exists(out)
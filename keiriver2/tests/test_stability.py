@@ -0,0 +1,36 @@
+# test_stability.py
+
+from stability import StabilityTracker
+
+
+def test_ready_after_required_identical_observations():
+    t = StabilityTracker(required=3, quiet_seconds=60)
+    now = 1000.0
+    assert not t.observe('a.csv', 10, now, now=now)
+    assert not t.observe('a.csv', 10, now, now=now + 0.5)
+    assert t.observe('a.csv', 10, now, now=now + 1.0)
+
+
+def test_growing_file_is_never_ready():
+    t = StabilityTracker(required=2, quiet_seconds=2)
+    for i in range(5):
+        assert not t.observe('a.csv', 100 * (i + 1), 1000.0 + i, now=1000.0 + i)
+    assert t.pending() == ['a.csv']
+
+
+def test_old_mtime_alone_is_not_enough():
+    """mtime を引き継ぐコピーは、書き込み中でも mtime が古い"""
+    t = StabilityTracker(required=5, quiet_seconds=2)
+    old = 100.0
+    assert not t.observe('a.csv', 10, old, now=1000.0)
+    assert not t.observe('a.csv', 20, old, now=1000.5)      # まだ伸びている
+    # 同じ値が 2 回続けば、静かな時間の近道で required を待たない
+    assert t.observe('a.csv', 20, old, now=1001.0)
+
+
+def test_forget_restarts_the_streak():
+    t = StabilityTracker(required=2, quiet_seconds=60)
+    t.observe('a.csv', 10, 1.0, now=1.0)
+    t.forget('a.csv')
+    assert len(t) == 0
+    assert not t.observe('a.csv', 10, 1.0, now=2.0)
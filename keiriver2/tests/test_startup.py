@@ -0,0 +1,117 @@
+# test_startup.py
+"""
+起動時間の予算チェック。
+
+各モジュールを新しいプロセスで import し、
+  ・import 時間（数回のうちの最良値）が予算内か
+  ・重い依存（pandas / openai / tkinter など）を読み込んでいないか
+  ・ホームや作業フォルダ、パッケージのフォルダにファイル／フォルダを作っていないか
+を確認します。遅いマシンでは KEIRI_STARTUP_SCALE=2 などで予算を広げてください。
+tray は pystray・PIL を import するので、テスト用の空モジュールに差し替えて計ります。
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+from .conftest import PKG_DIR
+
+SCALE = float(os.environ.get('KEIRI_STARTUP_SCALE', '1'))
+REPEAT = 3
+
+# モジュール → import 時間の予算（秒）
+BUDGETS = {
+    'config':       0.05,
+    'logger':       0.05,
+    'get_api_key':  0.05,
+    'report_job':   0.05,
+    'watch_folder': 0.30,
+    'cli':          0.30,
+    'tray':         0.30,
+    'main':         0.05,
+}
+
+# import しただけでは読み込まれてはいけないモジュール
+HEAVY_MODULES = ('pandas', 'numpy', 'openai', 'tkinter', 'keyring', 'pystray', 'PIL', 'rapidfuzz')
+
+# トレイの UI 部品は import 時に必要なので、重い依存の判定から外す
+UI_MODULES = {'tray': ('pystray', 'PIL')}
+
+_PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{'seconds': elapsed,
+                  'heavy': sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+_STUBS = {
+    'pystray.py': (
+        "class Icon:\n"
+        "    def __init__(self, *a, **k): pass\n"
+        "    def run(self, *a, **k): pass\n"
+        "    def stop(self): pass\n"
+        "class Menu:\n"
+        "    SEPARATOR = None\n"
+        "    def __init__(self, *items): self.items = items\n"
+        "class MenuItem:\n"
+        "    def __init__(self, *a, **k): pass\n"
+    ),
+    os.path.join('PIL', '__init__.py'): '',
+    os.path.join('PIL', 'Image.py'): (
+        "def open(path): raise OSError(path)\n"
+        "def new(*a, **k): return None\n"
+    ),
+}
+
+
+def _snapshot(*roots: str) -> set[str]:
+    found = set()
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d != '__pycache__']
+            for name in dirnames + filenames:
+                found.add(os.path.join(dirpath, name))
+    return found
+
+
+@pytest.fixture(scope='module')
+def stubs(tmp_path_factory) -> str:
+    """pystray / PIL の空モジュール（import 時の依存だけを満たす）"""
+    root = tmp_path_factory.mktemp('stubs')
+    for name, body in _STUBS.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(body, encoding='utf-8')
+    return str(root)
+
+
+def probe(module: str, home: str, cwd: str, stubs: str) -> dict:
+    env = dict(os.environ, HOME=home, USERPROFILE=home,
+               PYTHONPATH=os.pathsep.join([PKG_DIR, stubs]))
+    out = subprocess.run([sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                         cwd=cwd, env=env, capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, f"{module} の import に失敗: {out.stderr.strip()}"
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize('module', list(BUDGETS))
+def test_import_budget(module, tmp_path, stubs):
+    home, cwd = tmp_path / 'home', tmp_path / 'cwd'
+    home.mkdir()
+    cwd.mkdir()
+    pkg_before = _snapshot(PKG_DIR)
+
+    runs = [probe(module, str(home), str(cwd), stubs) for _ in range(REPEAT)]
+
+    heavy = [m for m in runs[0]['heavy'] if m not in UI_MODULES.get(module, ())]
+    assert not heavy, f"{module} が重い依存を読み込んでいます: {', '.join(heavy)}"
+    best = min(r['seconds'] for r in runs)
+    budget = BUDGETS[module] * SCALE
+    assert best <= budget, f"{module} の import に {best * 1000:.1f}ms（予算 {budget * 1000:.0f}ms）"
+    created = sorted(_snapshot(str(home), str(cwd)) | (_snapshot(PKG_DIR) - pkg_before))
+    assert not created, f"{module} の import 時に作成されたファイル／フォルダ: {created}"
@@ -0,0 +1,139 @@
+# test_state.py
+
+import os
+
+import pytest
+
+import watch_folder
+from state import WatcherState, file_digest
+
+
+@pytest.fixture
+def state(tmp_path):
+    s = WatcherState(str(tmp_path / 'state.sqlite3'))
+    yield s
+    s.close()
+
+
+def _write(path: str, body: str = '日付,金額\n1/1,100\n') -> os.stat_result:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(body)
+    return os.stat(path)
+
+
+def test_record_survives_reopen(tmp_path, state):
+    state.record('a.csv', 10, 1.5, 'abc', 'success')
+    state.record('a.csv', 12, 2.5, 'def', 'error')
+    state.close()
+
+    reopened = WatcherState(state.db_path)
+    try:
+        row = reopened.get('a.csv')
+        assert (row['size'], row['mtime'], row['digest'], row['outcome']) == (12, 2.5, 'def', 'error')
+        assert set(reopened.load()) == {'a.csv'}
+        reopened.forget('a.csv')
+        assert reopened.get('a.csv') is None
+    finally:
+        reopened.close()
+
+
+def test_get_state_restores_only_successful_files(tmp_path, monkeypatch):
+    db = str(tmp_path / 'state.sqlite3')
+    seed = WatcherState(db)
+    seed.record('ok.csv', 10, 1.0, 'abc', 'success')
+    seed.record('ng.csv', 20, 2.0, 'def', 'error')
+    seed.close()
+
+    monkeypatch.setattr(watch_folder, 'STATE_DB_PATH', db)
+    monkeypatch.setattr(watch_folder, '_state', None)
+    monkeypatch.setattr(watch_folder, 'processed_time', {})
+    try:
+        watch_folder.get_state()
+        # 隔離したファイルは監視フォルダへ戻されたら再処理させる
+        assert watch_folder.processed_time == {'ok.csv': (1.0, 10, 'abc')}
+    finally:
+        watch_folder._state.close()
+
+
+def test_already_processed_checks_mtime_size_then_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch_folder, 'processed_time', {})
+    path = str(tmp_path / 'watch' / 'a.csv')
+    st = _write(path)
+    assert not watch_folder._already_processed(path, st)
+
+    watch_folder.processed_time[path] = (st.st_mtime, st.st_size, file_digest(path))
+    assert watch_folder._already_processed(path, st)
+    # 1 回照合したら以後はハッシュを読まない
+    assert watch_folder.processed_time[path][2] is None
+
+    # 同じサイズ・同じ mtime でも中身が違えば新しい入力
+    watch_folder.processed_time[path] = (st.st_mtime, st.st_size, file_digest(path))
+    st = _write(path, '日付,金額\n1/1,900\n')
+    os.utime(path, (st.st_atime, watch_folder.processed_time[path][0]))
+    assert not watch_folder._already_processed(path, os.stat(path))
+    assert watch_folder._already_processed(path, os.stat(path), verify=False)
+
+    st = _write(path, '日付,金額\n1/1,9000\n')
+    assert not watch_folder._already_processed(path, st, verify=False)
+
+
+# ─── journal（処理中ファイルの状態遷移） ───
+def test_transition_keeps_earlier_details_and_record_clears_it(state):
+    state.transition('a.csv', 'detected', size=10, mtime=1.0, digest='abc')
+    state.transition('a.csv', 'processing')
+    state.transition('a.csv', 'archiving', dest='processed/a.csv', outcome='success')
+    [entry] = state.in_flight()
+    assert (entry['phase'], entry['dest'], entry['size'], entry['digest'], entry['outcome']) == \
+        ('archiving', 'processed/a.csv', 10, 'abc', 'success')
+
+    state.record('a.csv', 10, 1.0, 'abc', 'success')
+    assert state.in_flight() == []
+    assert state.get('a.csv')['outcome'] == 'success'
+
+
+def test_transition_rejects_unknown_phase(state):
+    with pytest.raises(ValueError):
+        state.transition('a.csv', 'done')
+
+
+def test_discard_drops_only_the_journal(state):
+    state.record('a.csv', 10, 1.0, 'abc', 'success')
+    state.transition('a.csv', 'processing')
+    state.discard('a.csv')
+    assert state.in_flight() == []
+    assert state.get('a.csv') is not None
+
+
+def test_recover_journal_finishes_interrupted_moves(tmp_path, state):
+    watch, done = tmp_path / 'watch', tmp_path / 'processed'
+    # 移動前に落ちた
+    pending = str(watch / 'pending.csv')
+    st = _write(pending)
+    state.transition(pending, 'archiving', dest=str(done / 'pending.csv'),
+                     size=st.st_size, mtime=st.st_mtime, digest='p', outcome='success')
+    # 移動後・確定前に落ちた
+    moved = str(watch / 'moved.csv')
+    _write(str(done / 'moved.csv'))
+    state.transition(moved, 'archiving', dest=str(done / 'moved.csv'),
+                     size=1, mtime=1.0, digest='m', outcome='error')
+    # 再生成の途中で落ちた（監視フォルダに残っているので再処理）
+    processing = str(watch / 'processing.csv')
+    _write(processing)
+    state.transition(processing, 'processing', size=1, mtime=1.0)
+    # 元ファイルも移動先も無い
+    gone = str(watch / 'gone.csv')
+    state.transition(gone, 'archiving', dest=str(done / 'gone.csv'), size=1, mtime=1.0)
+
+    watch_folder._recover_journal(state)
+
+    assert state.in_flight() == []
+    assert not os.path.exists(pending) and os.path.exists(done / 'pending.csv')
+    assert state.get(pending)['outcome'] == 'success'
+    assert state.get(moved)['outcome'] == 'error'
+    assert os.path.exists(processing) and state.get(processing) is None
+    assert state.get(gone) is None
+
+    # もう一度走らせても何も起きない（冪等）
+    watch_folder._recover_journal(state)
+    assert os.path.exists(done / 'pending.csv')
@@ -0,0 +1,89 @@
+# test_watch_folder.py
+
+import queue
+
+import pytest
+
+import watch_folder
+from watch_folder import AdaptiveInterval
+
+
+def test_adaptive_interval_backs_off_and_resets():
+    pace = AdaptiveInterval(1, 10, 60)
+    assert [pace.next(busy=False) for _ in range(5)] == [10, 20, 40, 60, 60]
+    assert pace.next(busy=True) == 1
+    assert pace.next(busy=False) == 10
+
+
+class _FakeObserver:
+    def is_alive(self):
+        return True
+
+    def stop(self):
+        pass
+
+    def join(self, timeout=None):
+        pass
+
+
+class _RecordingQueue:
+    """get の待ち時間を記録し、呼ばれた回数が limit に達したら監視を止める"""
+
+    def __init__(self, limit: int, events: dict | None = None):
+        self.limit = limit
+        self.events = events or {}
+        self.timeouts: list[float] = []
+
+    def get(self, timeout=None):
+        self.timeouts.append(timeout)
+        if len(self.timeouts) >= self.limit:
+            watch_folder.stop_batch_watcher()
+        if len(self.timeouts) in self.events:
+            return self.events[len(self.timeouts)]
+        raise queue.Empty
+
+    def put(self, item):
+        pass
+
+
+@pytest.fixture
+def loop(monkeypatch):
+    monkeypatch.setattr(watch_folder, 'MIN_CHECK_INTERVAL', 1)
+    monkeypatch.setattr(watch_folder, 'CHECK_INTERVAL', 10)
+    monkeypatch.setattr(watch_folder, 'MAX_CHECK_INTERVAL', 60)
+    monkeypatch.setattr(watch_folder, 'RECONCILE_INTERVAL', 300)
+    monkeypatch.setattr(watch_folder, 'WATCH_BACKEND', 'auto')
+    monkeypatch.setattr(watch_folder, '_reload_settings', lambda pace: None)
+    monkeypatch.setattr(watch_folder, 'scan_once', lambda full=False: 0)
+    monkeypatch.setattr(watch_folder, 'tick_pending', lambda: None)
+    monkeypatch.setattr(watch_folder, '_drain_queue', lambda first: [first])
+    watch_folder._stop_event.clear()
+    yield
+    watch_folder._stop_event.clear()
+
+
+def test_event_watcher_sleeps_longer_while_idle(loop, monkeypatch):
+    q = _RecordingQueue(limit=6, events={3: 'nothing.csv'})
+    monkeypatch.setattr(watch_folder, '_work_queue', q)
+    watch_folder._run_event_watcher(_FakeObserver())
+    # 起動直後は短く、無変化が続くと伸び、イベントが来たら最短に戻る
+    assert q.timeouts == [1, 10, 20, 1, 10, 20]
+
+
+def test_event_watcher_ticks_while_files_are_settling(loop, monkeypatch):
+    q = _RecordingQueue(limit=3)
+    monkeypatch.setattr(watch_folder, '_work_queue', q)
+    watch_folder._stability.observe('settling.csv', 10, 0.0, now=0.0)
+    try:
+        watch_folder._run_event_watcher(_FakeObserver())
+    finally:
+        watch_folder._stability.forget('settling.csv')
+    assert q.timeouts == [watch_folder.STABLE_TICK] * 3
+
+
+def test_stop_wakes_the_event_wait():
+    watch_folder.stop_batch_watcher()
+    try:
+        assert watch_folder._work_queue.get(timeout=1) == ''
+    finally:
+        watch_folder._stop_event.clear()
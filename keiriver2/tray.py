@@ -1,15 +1,16 @@
 # tray.py
 
-import os, sys, threading, tkinter as tk, csv
-import tkinter.messagebox as mb
+import os, sys, threading, csv
 from pystray import Icon, Menu, MenuItem
 from PIL import Image
 from watch_folder import run_batch_watcher_loop, stop_batch_watcher
 from get_api_key import get_openai_api_key
-from settings import SettingsDialog
 from config import UNMATCHED_LOG, WATCH_LOG
+from report_job import ReportJob, format_timings
 
 watcher_thread: threading.Thread | None = None
+report_job: ReportJob | None = None
+TRAY_TITLE = "帳簿アップロード監視"
 
 def start_watcher():
     global watcher_thread
@@ -39,20 +40,50 @@ def clear_logs():
     # テキストログを空に
     if os.path.exists(WATCH_LOG):
         open(WATCH_LOG, 'w', encoding='utf-8').close()
+    import tkinter.messagebox as mb
     mb.showinfo("ログクリア完了", "ログがクリアされました。")
 
 def on_open_settings(icon, item):
+    # tkinter / 設定画面はメニューから開いたときに初めて読み込む
+    import tkinter as tk
+    from settings import SettingsDialog
     root = tk.Tk(); root.withdraw()
     SettingsDialog(root)
     root.destroy()
     icon.update_menu()
 
+def start_report(icon, item):
+    # 集計は同じプロセス内のスレッドで実行（トレイは固まらず、キャッシュも使い回す）
+    global report_job
+    if report_job is None:
+        def on_progress(msg):
+            icon.title = f"{TRAY_TITLE} - {msg}"
+
+        def on_done(ok, msg, timings):
+            icon.title = TRAY_TITLE
+            icon.update_menu()
+            detail = format_timings(timings)
+            icon.notify(f"{msg}\n{detail}" if detail else msg, "集計" if ok else "集計（未完了）")
+
+        report_job = ReportJob(on_progress, on_done)
+    if report_job.start():
+        icon.update_menu()
+
+def cancel_report(icon, item):
+    if report_job is not None:
+        report_job.cancel()
+
+def report_running() -> bool:
+    return report_job is not None and report_job.is_running()
+
 def restart_app(icon, item):
+    cancel_report(icon, item)
     stop_watcher(); icon.stop()
     python = sys.executable
     os.execv(python, [python] + sys.argv)
 
 def quit_app(icon, item):
+    cancel_report(icon, item)
     stop_watcher(); icon.stop()
     sys.exit(0)
 
@@ -73,9 +104,11 @@ def show_tray_icon():
     menu = Menu(
         MenuItem("📝ログを見る", lambda i, _: open_log()),
         MenuItem("🗑️ログをクリア",   lambda i, _: clear_logs()),
+        MenuItem("📊集計を更新", start_report, enabled=lambda i: not report_running()),
+        MenuItem("⏹集計を中止", cancel_report, enabled=lambda i: report_running()),
         MenuItem("⚙️設定", on_open_settings),
         MenuItem("🔄再起動", restart_app),
         MenuItem("❌終了", quit_app),
     )
-    icon = Icon("keiri_system", icon_image, "帳簿アップロード監視", menu=menu)
+    icon = Icon("keiri_system", icon_image, TRAY_TITLE, menu=menu)
     icon.run()
@@ -1,16 +1,10 @@
 # utils.py
-import unicodedata
-import re
-import pandas as pd
-from rapidfuzz import process, fuzz
 from logger import log_unmatched
+from normalization import clean_text
 
 def clean_string(s: str) -> str:
-    if not isinstance(s, str):
-        return ""
-    s = unicodedata.normalize("NFKC", s)
-    s = s.replace("‐","-").replace("–","-").replace("—","-").replace("―","-")
-    return re.sub(r'\s+', ' ', s).strip()
+    # NFKC 正規化＋ダッシュ統一＋連続空白圧縮（normalization でメモ化）
+    return clean_text(s, unify_dashes=True)
 
 def call_chatgpt(prompt: str, category: str) -> str | None:
     import openai
@@ -34,7 +28,8 @@ def normalize_field(orig: str, mapping: dict, dict_path: str, field_name: str) -
     # 辞書完全一致
     if s in mapping:
         return mapping[s]
-    # ファジーマッチ
+    # ファジーマッチ（rapidfuzz は使うときに読み込む）
+    from rapidfuzz import process, fuzz
     cand, score, _ = process.extractOne(s, mapping.keys(), scorer=fuzz.token_set_ratio)
     if score >= 90:
         return mapping[cand]
@@ -2,38 +2,185 @@
 
 import os
 import time
+import queue
 import shutil
 import threading
+import metrics
 from logger import log_info
-from processor import handle_new_file
 from parser import parse_filename
+from stability import StabilityTracker
+from state import WatcherState, file_digest
+from scheduler import MonthScheduler
+from scanner import DirectoryScanner
+from retry import RetryQueue, is_transient
 from config import (
     WATCH_DIR,
     OUTPUT_DIR,
     PROCESSED_DIR,
     ERROR_DIR,
     CHECK_INTERVAL,
+    MIN_CHECK_INTERVAL,
+    MAX_CHECK_INTERVAL,
     VALID_EXTENSIONS,
-    CONFIG_PATH
+    CONFIG_PATH,
+    WATCH_BACKEND,
+    RECONCILE_INTERVAL,
+    EVENT_SETTLE_SECONDS,
+    STABLE_OBSERVATIONS,
+    STABLE_QUIET_SECONDS,
+    STABLE_TICK,
+    STATE_DB_PATH,
+    SCHEDULER_WORKERS,
+    SCHEDULER_DEBOUNCE,
+    POLL_FULL_RESCAN_EVERY,
+    RETRY_BASE_SECONDS,
+    RETRY_MAX_SECONDS,
+    RETRY_MAX_ATTEMPTS,
+    ROLLUP_COOLDOWN,
+    ensure_dirs
 )
 import json
 
-# ファイルパス → 最終処理時刻（mtime）を記録
-processed_time: dict[str, float] = {}
+# ファイルパス → 最後に受け付けたときの (mtime, サイズ, 内容ハッシュ)
+# （起動時に、成功して確定した分だけ永続状態から復元）
+processed_time: dict[str, tuple[float, int, str | None]] = {}
+
+# 永続化された処理済み状態（path / size / mtime / ハッシュ / 結果）
+_state: WatcherState | None = None
+
+def get_state() -> WatcherState:
+    """状態ストアを開き、初回だけ中断分の復旧と processed_time の復元を行う"""
+    global _state
+    if _state is None:
+        _state = WatcherState(STATE_DB_PATH)
+        _recover_journal(_state)
+        for path, row in _state.load().items():
+            # エラーで隔離したファイルは、手で監視フォルダへ戻せばそのまま再処理させる
+            if row['outcome'] == 'success':
+                processed_time[path] = (row['mtime'], row['size'], row['digest'])
+    return _state
+
+def _already_processed(path: str, st: os.stat_result, verify: bool = True) -> bool:
+    """
+    前回受け付けたときから変わっていないか。mtime が新しい・サイズが違えば新しい入力。
+    どちらも同じでも、ハッシュが分かっていれば 1 回だけ中身を照合します（以後は照合済み）
+    """
+    seen = processed_time.get(path)
+    if seen is None:
+        return False
+    mtime, size, digest = seen
+    if st.st_mtime > mtime or st.st_size != size:
+        return False
+    if digest is None or not verify:
+        return True
+    try:
+        current = file_digest(path)
+    except OSError:
+        return True     # 読めなければ次のスキャンで照合し直す
+    if current != digest:
+        return False
+    processed_time[path] = (mtime, size, None)
+    return True
+
+def _recover_journal(state: WatcherState) -> None:
+    """
+    前回の実行で確定しなかったファイルを片付ける。
+    ・detected / processing … 監視フォルダに残っているので、次のスキャンで再処理
+    ・archiving … 移動の途中。元ファイルが残っていれば移動をやり直し、移動済みなら確定
+    """
+    for entry in state.in_flight():
+        path = entry['path']
+        if entry['phase'] != 'archiving':
+            print(f"[復旧] 処理途中のファイルを再処理します: {path}")
+            state.discard(path)
+            continue
+        if _move(path, entry['dest']):
+            print(f"[復旧] アーカイブを完了: {path} → {entry['dest']}")
+            state.record(path, entry['size'], entry['mtime'], entry['digest'], entry['outcome'])
+        else:
+            state.discard(path)
+
+# 年月単位のジョブスケジューラ（run_batch_watcher の開始時に作成）
+_scheduler: MonthScheduler | None = None
+
+def get_scheduler() -> MonthScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = MonthScheduler(_run_month_job, SCHEDULER_WORKERS, SCHEDULER_DEBOUNCE)
+    return _scheduler
+
+# 書き込み中ファイルの安定判定（スリープせず観測を積み上げる）
+_stability = StabilityTracker(STABLE_OBSERVATIONS, STABLE_QUIET_SECONDS)
+
+# 一時的な失敗（Excel で開いたまま・ネットワーク断など）の再試行待ち
+#   payload が None … ハッシュ計算から process_path をやり直す
+#   payload が item … 同じ年月の次の再生成にまとめて投入し直す
+_retries = RetryQueue(RETRY_BASE_SECONDS, RETRY_MAX_SECONDS, RETRY_MAX_ATTEMPTS)
 
 # 停止フラグ
 _stop_event = threading.Event()
 
-def _load_settings():
-    """CONFIG_PATH があれば読み込み、CHECK_INTERVAL を更新"""
-    global CHECK_INTERVAL
-    if os.path.exists(CONFIG_PATH):
+# イベント（作成・更新・移動）で受け取ったパスの作業キュー
+_work_queue: "queue.Queue[str]" = queue.Queue()
+
+# 最後に読み込んだ設定ファイルの mtime（変更検知用）
+_settings_mtime: float | None = None
+
+def _load_settings() -> bool:
+    """
+    CONFIG_PATH が前回読み込み以降に変わっていれば読み込み、
+    CHECK_INTERVAL / MAX_CHECK_INTERVAL / WATCH_BACKEND を更新。更新したら True
+    """
+    global CHECK_INTERVAL, MAX_CHECK_INTERVAL, WATCH_BACKEND, _settings_mtime
+    try:
+        mtime = os.path.getmtime(CONFIG_PATH)
+    except OSError:
+        return False
+    if mtime == _settings_mtime:
+        return False
+    try:
         with open(CONFIG_PATH, "r", encoding="utf-8") as f:
             cfg = json.load(f)
-        CHECK_INTERVAL = cfg.get("check_interval", CHECK_INTERVAL)
+    except (OSError, ValueError) as e:
+        # 保存途中の可能性があるので mtime は記録せず、次の周回で読み直す
+        print(f"[WARN] 設定ファイルを読み込めません: {e}")
+        return False
+    _settings_mtime = mtime
+    CHECK_INTERVAL = cfg.get("check_interval", CHECK_INTERVAL)
+    MAX_CHECK_INTERVAL = max(CHECK_INTERVAL, cfg.get("max_check_interval", MAX_CHECK_INTERVAL))
+    WATCH_BACKEND = cfg.get("watch_backend", WATCH_BACKEND)
+    return True
+
+def _reload_settings(pace: "AdaptiveInterval") -> None:
+    """監視ループの各周回で呼ぶ：設定が変わっていれば間隔へ即時反映"""
+    if _load_settings():
+        pace.configure(CHECK_INTERVAL, MAX_CHECK_INTERVAL)
+        print(f"[設定] 再読み込み: 監視間隔={CHECK_INTERVAL}秒（最大 {MAX_CHECK_INTERVAL}秒）")
+
+class AdaptiveInterval:
+    """
+    ポーリング間隔の自動調整。
+    ファイル到着中・安定待ち・ジョブ待ちがある間は floor 秒、
+    何も無い周回が続くと base 秒から 2 倍ずつ伸ばし、ceiling 秒で頭打ち。
+    """
 
-# 初回設定読み込み
-_load_settings()
+    def __init__(self, floor: float, base: float, ceiling: float):
+        self.floor = floor
+        self.configure(base, ceiling)
+        self.idle_passes = 0
+
+    def configure(self, base: float, ceiling: float) -> None:
+        self.base = max(self.floor, base)
+        self.ceiling = max(self.base, ceiling)
+
+    def next(self, busy: bool) -> float:
+        if busy:
+            self.idle_passes = 0
+            return self.floor
+        interval = min(self.base * (2 ** self.idle_passes), self.ceiling)
+        if interval < self.ceiling:
+            self.idle_passes += 1
+        return interval
 
 def is_valid_file(name: str) -> bool:
     return (
@@ -41,69 +188,346 @@ def is_valid_file(name: str) -> bool:
         and not name.startswith('~$')
     )
 
-def wait_until_stable(path: str, interval: float = 1.0, retries: int = 3) -> bool:
+def archive_dest(path: str, success: bool) -> str:
+    """アーカイブ先のファイルパス（成功は processed/<部署>/、失敗は processed/errors/）"""
+    if success:
+        dept = parse_filename(path).get('部署', 'unknown')
+        dest_dir = os.path.join(PROCESSED_DIR, dept)
+    else:
+        dest_dir = ERROR_DIR
+    return os.path.join(dest_dir, os.path.basename(path))
+
+def _move(src: str, dest: str) -> bool:
+    """
+    src を dest へ移動（冪等）。移動済み・同じ場所なら何もしない。
+    dest に置かれた状態になっていれば True
+    """
+    if os.path.abspath(src) == os.path.abspath(dest):
+        return os.path.exists(dest)
+    if not os.path.exists(src):
+        return os.path.exists(dest)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with metrics.stage('archive', file=src) as st:
+        try:
+            st.bytes_written = os.path.getsize(src)
+            # 別ドライブへの移動が途中で止まった残骸は上書き
+            if os.path.exists(dest):
+                os.remove(dest)
+            shutil.move(src, dest)
+            print(f"[ARCHIVE] {src} → {os.path.dirname(dest)}")
+            return True
+        except Exception as e:
+            print(f"[WARN] アーカイブ失敗: {e}")
+            return False
+
+def archive_file(path: str, success: bool) -> bool:
+    """path をアーカイブ先へ移動（既に移動済みなら何もしない）"""
+    return _move(path, archive_dest(path, success))
+
+def is_excluded_dir(path: str) -> bool:
+    """アーカイブや出力フォルダ配下か"""
+    return path.startswith(PROCESSED_DIR) or path.startswith(OUTPUT_DIR)
+
+def process_path(path: str, st: os.stat_result | None = None) -> None:
+    """
+    1 ファイル分：更新判定 → 安定判定 → 処理＆アーカイブ。
+    書き込み中なら待たずに戻り、次の tick（tick_pending）で再観測します。
+    st を渡せば（scandir の結果など）stat を取り直しません。
+    """
+    if st is None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            _stability.forget(path)
+            return
+
+    mtime = st.st_mtime
+    if _already_processed(path, st):
+        _stability.forget(path)
+        return
+
+    if not _stability.observe(path, st.st_size, mtime):
+        return
+    _stability.forget(path)
+
+    state = get_state()
     try:
-        prev = os.path.getsize(path)
-        for _ in range(retries):
-            time.sleep(interval)
-            curr = os.path.getsize(path)
-            if curr == prev:
-                return True
-            prev = curr
-    except OSError:
-        return False
-    return False
+        digest = file_digest(path)
+    except OSError as e:
+        if is_transient(e):
+            delay = _retries.schedule(path)
+            if delay is not None:
+                print(f"[再試行] 読み取り不可のため {delay:g}秒後に再試行: {path}: {e}")
+                return
+        print(f"[スキップ] 読み取り不可: {path}: {e}")
+        return
+
+    # 内容が前回成功時と同じなら再生成しない（タイムスタンプだけ更新された等）
+    prev = state.get(path)
+    if prev and prev['digest'] == digest and prev['outcome'] == 'success':
+        print(f"[スキップ] 内容に変更なし: {path}")
+        processed_time[path] = (mtime, st.st_size, digest)
+        _finish_items([{'path': path, 'size': st.st_size, 'mtime': mtime, 'digest': digest}],
+                      success=True)
+        return
 
-def archive_file(path: str, success: bool) -> None:
+    item = {'path': path, 'size': st.st_size, 'mtime': mtime, 'digest': digest}
+    processed_time[path] = (mtime, st.st_size, digest)
+    _retries.clear(path)
+    state.transition(path, 'detected', size=st.st_size, mtime=mtime, digest=digest)
     meta = parse_filename(path)
-    dept = meta.get('部署', 'unknown')
-    dest_dir = PROCESSED_DIR if success else ERROR_DIR
-    dest = os.path.join(dest_dir, dept) if success else dest_dir
-    os.makedirs(dest, exist_ok=True)
+    if 'エラー' in meta:
+        # ファイル名不正はその場で記録してアーカイブ（再生成は不要）
+        print(f"[処理] {path}")
+        from processor import handle_new_file
+        handle_new_file(path)
+        _finish_items([item], success=True)
+        return
+
+    # 同じ年月のファイルはスケジューラで 1 回の再生成にまとめる
+    print(f"[受付] {path} → 年月={meta['年月']}")
+    get_scheduler().submit(meta['年月'], item)
+
+def _run_month_job(ym: str, items: list[dict]) -> None:
+    """スケジューラのワーカーから呼ばれる：年月 ym を 1 回だけ再生成"""
+    print(f"[処理] 年月={ym}（{len(items)} ファイル）")
+    from processor import regenerate_month   # pandas ごと読み込むので初回ジョブまで遅らせる
+    # 書き込み中に何度か受け付けた同じファイルは最新の 1 件にまとめる
+    items = list({it['path']: it for it in items}.values())
+    state = get_state()
+    for it in items:
+        state.transition(it['path'], 'processing')
     try:
-        shutil.move(path, os.path.join(dest, os.path.basename(path)))
-        print(f"[ARCHIVE] {path} → {dest}")
+        failed = regenerate_month(ym) or {}
     except Exception as e:
-        print(f"[WARN] アーカイブ失敗: {e}")
+        # 出力先の xlsx が開かれている等、一時的なら全ファイルを再試行へ
+        print(f"[エラー] 年月={ym}: {e}")
+        failed = {it['path']: e for it in items}
+    _finish_items([it for it in items if it['path'] not in failed], success=True, ym=ym)
+    quarantine = [it for it in items
+                  if it['path'] in failed and not _schedule_retry(ym, it, failed[it['path']])]
+    _finish_items(quarantine, success=False, ym=ym)
 
-def run_batch_watcher() -> None:
+def _schedule_retry(ym: str, item: dict, exc: Exception) -> bool:
+    """一時的な失敗なら再試行を予約して True（回数を使い切った・恒久的な失敗なら False）"""
+    if not is_transient(exc):
+        return False
+    delay = _retries.schedule(item['path'], payload=(ym, item))
+    if delay is None:
+        print(f"[隔離] 再試行の上限に達しました: {item['path']}")
+        return False
+    print(f"[再試行] {delay:g}秒後に年月={ym} の再生成へ再投入: {item['path']}（{exc}）")
+    get_state().transition(item['path'], 'detected')
+    return True
+
+def _finish_items(items: list[dict], success: bool, ym: str | None = None) -> None:
+    """
+    処理済みファイルをアーカイブし、結果を状態ストアへ確定。
+    移動の前に journal へ行き先を書くので、途中で落ちても再起動時に続きから移動できる
+    """
+    if not items:
+        return
+    outcome = 'success' if success else 'error'
+    meta = {'年月': ym} if ym else {}
+    # 再生成の run とは別に、アーカイブの所要時間を計測レポートへ残す
+    with metrics.run('archive', OUTPUT_DIR, **meta, 結果=outcome):
+        _archive_items(items, outcome)
+
+def _archive_items(items: list[dict], outcome: str) -> None:
+    state = get_state()
+    success = outcome == 'success'
+    for it in items:
+        _retries.clear(it['path'])
+        dest = archive_dest(it['path'], success)
+        state.transition(it['path'], 'archiving', dest=dest, size=it['size'],
+                         mtime=it['mtime'], digest=it['digest'], outcome=outcome)
+        if not _move(it['path'], dest):
+            # 元ファイルが消えた等。確定はするが移動はしていない
+            print(f"[WARN] アーカイブ対象が見つかりません: {it['path']}")
+        state.record(it['path'], it['size'], it['mtime'], it['digest'], outcome)
+        if not success:
+            # 隔離先から戻されたら（内容が同じでも）もう一度処理する
+            processed_time.pop(it['path'], None)
+
+def tick_pending() -> None:
+    """安定待ちのファイルと、再試行時刻になったファイルだけを処理（フォルダ全体は走査しない）"""
+    for path in _stability.pending():
+        process_path(path)
+    for path, payload in _retries.pop_due():
+        if payload is None:
+            process_path(path)
+        elif os.path.exists(path):
+            ym, item = payload
+            get_scheduler().submit(ym, item)
+        else:
+            _retries.clear(path)
+            get_state().discard(path)
+
+# フォルダ mtime を使った差分スキャナ（除外フォルダへは降りない）
+_scanner = DirectoryScanner(WATCH_DIR, is_excluded_dir, is_valid_file,
+                            full_every=POLL_FULL_RESCAN_EVERY)
+
+def scan_once(full: bool = False) -> int:
     """
-    永続ループ：WATCH_DIR を再帰スキャンし、
-    新規／更新ファイルを処理＆アーカイブ。
+    WATCH_DIR をスキャンして対象ファイルを処理し、新規／更新ファイル数を返す。
+    通常は前回から変化したフォルダだけ一覧を取り直し、full=True なら全フォルダ。
     """
-    print(f"[監視開始] {WATCH_DIR} を {CHECK_INTERVAL}秒ごとに再帰チェック")
+    changed = 0
+    for path, st in _scanner.scan(full=full):
+        if not _already_processed(path, st, verify=False):
+            changed += 1
+        process_path(path, st)
+    return changed
+
+def _is_busy() -> bool:
+    """安定待ちのファイルか、保留・実行中の年月ジョブがあるか"""
+    return bool(len(_stability) or (_scheduler is not None and _scheduler.is_busy()))
+
+# ─── イベント駆動バックエンド（watchdog があれば使用） ───
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+class _QueueingHandler(FileSystemEventHandler):
+    """作成・更新・移動イベントのパスを作業キューへ積むだけのハンドラ"""
+
+    def _enqueue(self, path: str) -> None:
+        if not path or is_excluded_dir(os.path.dirname(path)):
+            return
+        if is_valid_file(os.path.basename(path)):
+            _work_queue.put(path)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._enqueue(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._enqueue(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._enqueue(event.dest_path)
+
+def _drain_queue(first: str) -> list[str]:
+    """
+    最初のイベント後 EVENT_SETTLE_SECONDS 待って続くイベントをまとめ、
+    重複を除いたパス一覧を返す（保存中の連続 modified を 1 回に畳む）
+    """
+    paths = {first: None}
+    deadline = time.monotonic() + EVENT_SETTLE_SECONDS
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            paths[_work_queue.get(timeout=remaining)] = None
+        except queue.Empty:
+            break
+    return list(paths)
+
+def _start_observer():
+    """watchdog の Observer を起動。使えなければ None"""
+    if Observer is None:
+        print("[監視] watchdog が見つからないためポーリングで監視します")
+        return None
+    try:
+        observer = Observer()
+        observer.schedule(_QueueingHandler(), WATCH_DIR, recursive=True)
+        observer.start()
+        return observer
+    except Exception as e:
+        print(f"[WARN] イベント監視を開始できません（ポーリングへ切替）: {e}")
+        return None
+
+def _run_event_watcher(observer) -> None:
+    """イベントで即時処理しつつ、RECONCILE_INTERVAL ごとに全体スキャンで取りこぼしを補う"""
+    print(f"[監視開始] {WATCH_DIR} をイベント監視（{RECONCILE_INTERVAL}秒ごとに再スキャン）")
+    try:
+        scan_once(full=True)
+        next_reconcile = time.monotonic() + RECONCILE_INTERVAL
+        next_tick = time.monotonic() + STABLE_TICK
+        pace = AdaptiveInterval(MIN_CHECK_INTERVAL, CHECK_INTERVAL, MAX_CHECK_INTERVAL)
+        busy = True
+        while not _stop_event.is_set():
+            _reload_settings(pace)
+            if WATCH_BACKEND == 'polling' or not observer.is_alive():
+                print("[WARN] イベント監視を停止し、ポーリングへ切替")
+                _run_polling_watcher()
+                return
+            # 安定待ち・再試行待ちがある間は STABLE_TICK ごと、無ければ何も無い周回ほど長く待つ
+            if len(_stability) or len(_retries):
+                wait = STABLE_TICK
+            else:
+                wait = pace.next(busy=busy or _is_busy())
+            timeout = max(0.0, min(wait, next_reconcile - time.monotonic()))
+            try:
+                first = _work_queue.get(timeout=timeout)
+            except queue.Empty:
+                first = None
+            busy = bool(first)
+            if first is not None:
+                for path in _drain_queue(first):
+                    if path and os.path.isfile(path):
+                        process_path(path)
+            if time.monotonic() >= next_tick:
+                tick_pending()
+                next_tick = time.monotonic() + STABLE_TICK
+            if time.monotonic() >= next_reconcile:
+                busy = scan_once(full=True) > 0 or busy
+                next_reconcile = time.monotonic() + RECONCILE_INTERVAL
+    finally:
+        observer.stop()
+        observer.join(timeout=5)
+
+def _run_polling_watcher() -> None:
+    print(f"[監視開始] {WATCH_DIR} を {CHECK_INTERVAL}秒ごと（無変化時は最大 {MAX_CHECK_INTERVAL}秒）に再帰チェック")
+    pace = AdaptiveInterval(MIN_CHECK_INTERVAL, CHECK_INTERVAL, MAX_CHECK_INTERVAL)
     while not _stop_event.is_set():
-        for root, _, files in os.walk(WATCH_DIR):
-            # アーカイブや出力フォルダはスキップ
-            if root.startswith(PROCESSED_DIR) or root.startswith(OUTPUT_DIR):
-                continue
-
-            for fname in files:
-                if not is_valid_file(fname):
-                    continue
-                path = os.path.join(root, fname)
-
-                if not wait_until_stable(path):
-                    print(f"[スキップ] 書き込み中: {path}")
-                    continue
-
-                try:
-                    mtime = os.path.getmtime(path)
-                except OSError:
-                    continue
-
-                prev = processed_time.get(path, 0.0)
-                if mtime > prev:
-                    print(f"[処理] {path}")
-                    try:
-                        handle_new_file(path)
-                        archive_file(path, success=True)
-                    except Exception as e:
-                        print(f"[エラー] {path}: {e}")
-                        archive_file(path, success=False)
-                    finally:
-                        processed_time[path] = mtime
-        time.sleep(CHECK_INTERVAL)
+        _reload_settings(pace)
+        changed = scan_once()
+        interval = pace.next(busy=changed > 0 or _is_busy())
+        deadline = time.monotonic() + interval
+        # 安定待ちがある間だけ STABLE_TICK ごとに再観測
+        while (len(_stability) or len(_retries)) and not _stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _stop_event.wait(min(STABLE_TICK, remaining))
+            tick_pending()
+        _stop_event.wait(max(0.0, deadline - time.monotonic()))
+
+def run_batch_watcher() -> None:
+    """
+    永続ループ：WATCH_DIR を監視し、新規／更新ファイルを処理＆アーカイブ。
+    WATCH_BACKEND が 'auto' / 'events' ならイベント駆動（watchdog）、
+    'polling' か watchdog が使えない場合は従来のポーリング。
+    """
+    global _scheduler
+    ensure_dirs()
+    _load_settings()
+    get_state()
+    get_scheduler()
+    # 年次集計は月次ジョブからの変更通知でまとめて実行
+    import processor
+    processor.start_rollup_notifier(ROLLUP_COOLDOWN)
+    observer = _start_observer() if WATCH_BACKEND != 'polling' else None
+    try:
+        if observer is not None:
+            _run_event_watcher(observer)
+        else:
+            _run_polling_watcher()
+    finally:
+        # 未実行の保留分は次回のスキャンで拾い直せるよう処理済み扱いを外す
+        for item in _scheduler.shutdown(wait=True):
+            processed_time.pop(item['path'], None)
+            get_state().discard(item['path'])
+        _scheduler = None
+        processor.stop_rollup_notifier()
+        processor.flush_outputs()
 
 def run_batch_watcher_loop():
     """タスクトレイから呼び出す用：停止フラグをクリアして永続ループを起動"""
@@ -123,6 +547,8 @@ def run_batch_watcher_loop():
 def stop_batch_watcher():
     """run_batch_watcher のループを抜けさせるフラグを立てる"""
     _stop_event.set()
+    # イベント待ちで長く眠っているループを起こす（空文字はパスとして扱わない）
+    _work_queue.put('')
 
 if __name__ == "__main__":
     run_batch_watcher()